@@ -0,0 +1,124 @@
+import time
+from collections import deque
+
+import numpy as np
+
+"""
+自适应分辨率控制
+根据实测的每帧处理耗时，在一组从省到费的 (采集分辨率, 模型输入尺寸) 档位之间逐级切换，使处理能力保持在目标帧率附近：
+处理能力低于目标的 lower 倍时降一档，高于目标的 upper 倍时升一档（两个阈值之间不动作，避免来回切换）；
+每次切换后等待 hold_frames 帧、重新积累耗时样本后再判断，升档后很快又降回来时，下一次升档的等待时间加倍。
+同一个程序因此可以在性能强弱不同的设备上自动选择合适的档位
+"""
+
+# 档位：(采集宽, 采集高, 模型输入尺寸 imgsz)，从最省到最清晰
+DEFAULT_LADDER = [(320, 240, 160), (640, 480, 224), (640, 480, 320), (1280, 720, 416)]
+
+
+def parse_ladder(values):
+    """解析命令行中的档位列表，如 ["320x240@160", "640x480@320"]"""
+    ladder = []
+    for value in values:
+        try:
+            size, imgsz = value.split("@")
+            width, height = size.lower().split("x")
+            ladder.append((int(width), int(height), int(imgsz)))
+        except ValueError:
+            raise ValueError(f"无效的档位: {value}（格式为 宽x高@imgsz，如 640x480@320）")
+    return ladder
+
+
+def describe_level(level):
+    width, height, imgsz = level
+    return f"{width}x{height} / imgsz {imgsz}"
+
+
+class AdaptiveController:
+    def __init__(self, target_fps=24.0, ladder=None, level=None, window=30, lower=0.9, upper=1.3,
+                 hold_frames=60, max_backoff=16):
+        """target_fps 为目标帧率，ladder 为档位列表（默认 DEFAULT_LADDER），level 为初始档位序号
+        （默认为 640x480 / imgsz 320，即原来的固定配置）；window 为计算处理能力的耗时样本数，
+        lower/upper 为降档/升档阈值（相对目标帧率），hold_frames 为切换后至少保持的帧数，
+        max_backoff 为升档失败后等待时间的最大倍数"""
+        self.target_fps = target_fps
+        self.ladder = list(ladder or DEFAULT_LADDER)
+        if level is None:
+            level = self.ladder.index((640, 480, 320)) if (640, 480, 320) in self.ladder else len(self.ladder) // 2
+        self.level = min(max(level, 0), len(self.ladder) - 1)
+        self.lower = lower
+        self.upper = upper
+        self.hold_frames = hold_frames
+        self.max_backoff = max_backoff
+
+        # 当前档位下最近的处理耗时（秒）
+        self.samples = deque(maxlen=window)
+        self.frames_at_level = 0
+        # 升档前需要保持的帧数（升档失败后加倍）
+        self.upgrade_wait = hold_frames
+        self.last_change = None
+
+        # 切换记录：(时间, 原档位, 新档位, 处理能力FPS)
+        self.changes = []
+
+    def current(self):
+        """当前档位 (采集宽, 采集高, imgsz)"""
+        return self.ladder[self.level]
+
+    def capacity(self):
+        """当前档位的处理能力（帧/秒），用耗时中位数计算以忽略偶发的卡顿"""
+        if not self.samples:
+            return 0.0
+        latency = float(np.median(self.samples))
+        return 1.0 / latency if latency > 0 else float("inf")
+
+    def update(self, latency):
+        """记录一帧的处理耗时（秒，不含等待摄像头的时间）；需要切换档位时返回新档位，否则返回 None"""
+        self.samples.append(latency)
+        self.frames_at_level += 1
+        if self.frames_at_level < self.hold_frames or len(self.samples) < self.samples.maxlen:
+            return None
+
+        capacity = self.capacity()
+        if capacity < self.target_fps * self.lower and self.level > 0:
+            # 刚升档就跟不上：说明上一档是合适的，下次升档前等待更久
+            if self.last_change == "up" and self.frames_at_level < self.upgrade_wait * 2:
+                self.upgrade_wait = min(self.upgrade_wait * 2, self.hold_frames * self.max_backoff)
+            return self._change(self.level - 1, capacity, "down")
+        if (capacity > self.target_fps * self.upper and self.level < len(self.ladder) - 1
+                and self.frames_at_level >= self.upgrade_wait):
+            return self._change(self.level + 1, capacity, "up")
+        if self.last_change == "up" and self.frames_at_level >= self.upgrade_wait * 2:
+            # 升档后稳定运行，恢复正常的等待时间
+            self.upgrade_wait = self.hold_frames
+        return None
+
+    def _change(self, level, capacity, direction):
+        old = self.ladder[self.level]
+        self.level = level
+        self.samples.clear()
+        self.frames_at_level = 0
+        self.last_change = direction
+        self.changes.append((time.time(), old, self.ladder[level], capacity))
+        action = "降低" if direction == "down" else "提高"
+        print(f"🎚️  自适应{action}档位：处理能力 {capacity:.1f} FPS（目标 {self.target_fps:g}），"
+              f"{describe_level(old)} → {describe_level(self.ladder[level])}")
+        return self.ladder[level]
+
+    def print_stats(self):
+        print(f"🎚️  自适应档位：共切换 {len(self.changes)} 次，最终 {describe_level(self.current())}")
+
+
+def add_adaptive_arguments(parser):
+    """为命令行添加自适应档位参数（目标帧率使用 --target-fps）"""
+    parser.add_argument("--adaptive", action="store_true",
+                        help="根据处理耗时自动切换采集分辨率和模型输入尺寸，使帧率保持在 --target-fps（默认 24）")
+    parser.add_argument("--adaptive-ladder", nargs="+", default=None,
+                        help="自适应档位列表（从省到费），格式为 宽x高@imgsz，如 320x240@160 640x480@320")
+
+
+def controller_from_args(args):
+    """根据命令行参数创建 AdaptiveController，未启用时返回 None"""
+    if not args.adaptive:
+        return None
+    ladder = parse_ladder(args.adaptive_ladder) if args.adaptive_ladder else None
+    return AdaptiveController(target_fps=args.target_fps or 24.0, ladder=ladder)
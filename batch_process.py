@@ -0,0 +1,308 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+"""
+离线批处理脚本
+对视频文件、通配符或图片目录进行无界面手势识别，
+以生成器流水线解码帧，不做 imshow/waitKey 限速，
+逐帧把识别结果写入 JSONL 或 CSV 文件，并报告端到端帧率
+"""
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"}
+VIDEO_EXTENSIONS = {".mp4", ".avi", ".mov", ".mkv", ".wmv", ".flv", ".webm", ".m4v"}
+
+# 可选的识别器
+RECOGNIZERS = ["yolo", "mediapipe", "opencv", "yolo-basic", "cascade-yolo", "cascade-mediapipe"]
+
+
+def expand_inputs(inputs):
+    """展开输入参数（文件、通配符、目录），按顺序生成媒体文件路径"""
+    for item in inputs:
+        if os.path.isdir(item):
+            for name in sorted(os.listdir(item)):
+                path = os.path.join(item, name)
+                ext = os.path.splitext(name)[1].lower()
+                if os.path.isfile(path) and (ext in IMAGE_EXTENSIONS or ext in VIDEO_EXTENSIONS):
+                    yield path
+        elif os.path.isfile(item):
+            yield item
+        else:
+            matches = sorted(glob.glob(item, recursive=True))
+            if not matches:
+                print(f"⚠️  未找到匹配的输入: {item}")
+            for path in matches:
+                if os.path.isfile(path):
+                    yield path
+
+
+def iter_frames(paths):
+    """逐帧解码，生成 (文件路径, 帧序号, 时间戳毫秒, 帧)"""
+    for path in paths:
+        ext = os.path.splitext(path)[1].lower()
+        if ext in IMAGE_EXTENSIONS:
+            frame = cv2.imread(path)
+            if frame is None:
+                print(f"⚠️  无法读取图片: {path}")
+                continue
+            yield path, 0, 0.0, frame
+            continue
+
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            print(f"⚠️  无法打开视频: {path}")
+            continue
+        frame_index = 0
+        try:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                yield path, frame_index, cap.get(cv2.CAP_PROP_POS_MSEC), frame
+                frame_index += 1
+        finally:
+            cap.release()
+
+
+def prefetch(iterable, size=8):
+    """在后台线程中预先取出元素，使解码与推理并行"""
+    items = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    end = object()
+
+    def put(item):
+        # 消费者提前退出时不再阻塞
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def producer():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        finally:
+            put(end)
+
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is end:
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def iter_batches(iterable, batch_size):
+    """将元素按 batch_size 分组"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class JsonlResultWriter:
+    """每帧写一行JSON"""
+
+    def __init__(self, path):
+        self.file = open(path, "w", encoding="utf-8")
+
+    def write(self, source, frame_index, timestamp_ms, detections):
+        record = {
+            "source": source,
+            "frame": frame_index,
+            "timestamp_ms": round(timestamp_ms, 3),
+            "detections": detections
+        }
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class CsvResultWriter:
+    """每个检测结果写一行CSV，没有检测结果的帧写一行空结果"""
+
+    FIELDS = ["source", "frame", "timestamp_ms", "class_id", "gesture", "confidence",
+              "x1", "y1", "x2", "y2"]
+
+    def __init__(self, path):
+        self.file = open(path, "w", encoding="utf-8-sig", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(self.FIELDS)
+
+    def write(self, source, frame_index, timestamp_ms, detections):
+        prefix = [source, frame_index, round(timestamp_ms, 3)]
+        if not detections:
+            self.writer.writerow(prefix + [""] * 7)
+        for d in detections:
+            self.writer.writerow(prefix + [d["class_id"], d["gesture"], f"{d['confidence']:.4f}"] + d["bbox"])
+
+    def close(self):
+        self.file.close()
+
+
+def create_result_writer(path, output_format=None):
+    """根据输出格式（或文件扩展名）创建结果写入器"""
+    if output_format is None:
+        output_format = "csv" if path.lower().endswith(".csv") else "jsonl"
+    if output_format == "csv":
+        return CsvResultWriter(path)
+    return JsonlResultWriter(path)
+
+
+def create_recognizer(name, model_path=None):
+    """创建不打开摄像头的识别器实例（按需导入对应依赖）"""
+    if name == "yolo":
+        from hand_gesture_recognition import HandGestureRecognizer
+        return HandGestureRecognizer(model_path=model_path, sources=None)
+    if name == "yolo-basic":
+        from yolo_hand_gesture import YOLOHandGestureRecognizer
+        return YOLOHandGestureRecognizer(model_path=model_path or 'yolov8n.pt', source=None)
+    if name == "mediapipe":
+        from optimized_hand_gesture import OptimizedHandGestureRecognizer
+        return OptimizedHandGestureRecognizer(source=None)
+    if name == "opencv":
+        from opencv_hand_gesture import OpenCVHandGestureRecognizer
+        return OpenCVHandGestureRecognizer(source=None)
+    if name.startswith("cascade-"):
+        from cascade_recognizer import CascadeRecognizer
+        return CascadeRecognizer(backend=name[len("cascade-"):], source=None, model_path=model_path)
+    raise ValueError(f"未知的识别器: {name}")
+
+
+def process_batch(recognizer, batch):
+    """处理一组帧，支持批量推理的识别器一次处理整组"""
+    frames = [item[3] for item in batch]
+    if hasattr(recognizer, "process_frames"):
+        return recognizer.process_frames(frames)
+    return [recognizer.process_frame(frame) for frame in frames]
+
+
+def iter_results(recognizer, frames, batch_size):
+    """在当前进程中按批处理帧，生成 (帧信息, 检测结果)"""
+    for batch in iter_batches(frames, batch_size):
+        yield from zip(batch, process_batch(recognizer, batch))
+
+
+def iter_pool_results(pool, frames):
+    """通过多进程推理池处理帧，按输入顺序生成 (帧信息, 检测结果)"""
+    # 帧信息在父进程中按序保存，只有像素经共享内存传给工作进程
+    infos = []
+
+    def submit_frames():
+        for item in frames:
+            infos.append(item)
+            yield item[3]
+
+    for index, detections in enumerate(pool.imap(submit_frames())):
+        yield infos[index], detections
+        infos[index] = None
+
+
+def run_batch(inputs, output, recognizer_name="yolo", model_path=None, batch_size=8,
+              output_format=None, report_interval=5.0, workers=0, server=None, threads_per_worker=1):
+    """运行离线批处理，返回 (处理帧数, 耗时秒)；workers 大于 1 时使用多进程推理池，
+    server 为本地推理服务（inference_server.py）的 socket 路径时不在本进程加载模型"""
+    pool = None
+    if server:
+        from inference_server import InferenceClient
+        recognizer = InferenceClient(server, backend=recognizer_name, slots=batch_size)
+        print(f"🔗 使用本地推理服务: {server}")
+    elif workers > 1:
+        from worker_pool import WorkerPool
+        pool = WorkerPool(recognizer_name, model_path, workers, threads_per_worker=threads_per_worker)
+        print(f"🚀 使用 {workers} 个推理进程")
+    else:
+        recognizer = create_recognizer(recognizer_name, model_path)
+    writer = create_result_writer(output, output_format)
+
+    frames = prefetch(iter_frames(expand_inputs(inputs)), size=batch_size * 2)
+
+    total_frames = 0
+    start_time = time.time()
+    last_report = start_time
+    try:
+        results = iter_pool_results(pool, frames) if pool else iter_results(recognizer, frames, batch_size)
+        for (source, frame_index, timestamp_ms, _), detections in results:
+            writer.write(source, frame_index, timestamp_ms, detections)
+            total_frames += 1
+
+            # 定期报告进度
+            now = time.time()
+            if now - last_report >= report_interval:
+                print(f"[{time.strftime('%H:%M:%S')}] 已处理 {total_frames} 帧 | "
+                      f"{total_frames / (now - start_time):.1f} 帧/秒")
+                last_report = now
+    finally:
+        frames.close()
+        writer.close()
+        if pool:
+            pool.close()
+        if server:
+            recognizer.close()
+
+    return total_frames, time.time() - start_time
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="离线批量手势识别")
+    parser.add_argument("inputs", nargs="+", help="视频文件、图片文件、通配符或图片目录")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="输出文件（.jsonl 或 .csv）")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None, help="输出格式（默认按扩展名判断）")
+    parser.add_argument("--recognizer", choices=RECOGNIZERS, default="yolo", help="使用的识别器")
+    parser.add_argument("--model", default=None, help="YOLO模型文件路径")
+    parser.add_argument("--batch-size", type=int, default=8, help="批量推理的帧数")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="推理进程数（大于 1 时每个进程加载一个模型，帧经共享内存传递）")
+    parser.add_argument("--threads-per-worker", type=int, default=1,
+                        help="每个推理进程的计算线程数（0 表示不限制，默认 1，避免多个进程争抢CPU核心）")
+    parser.add_argument("--server", default=None,
+                        help="使用本地推理服务（inference_server.py 的 socket 路径），识别器只能为 yolo 或 mediapipe")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("离线批量手势识别")
+    print("=" * 60)
+    print()
+
+    try:
+        total_frames, elapsed = run_batch(args.inputs, args.output, args.recognizer, args.model,
+                                          args.batch_size, args.format, workers=args.workers,
+                                          server=args.server, threads_per_worker=args.threads_per_worker or None)
+    except KeyboardInterrupt:
+        print()
+        print("🔄 已中断批处理")
+        return
+    except RuntimeError as e:
+        print(f"❌ 批处理失败: {e}")
+        return
+
+    fps = total_frames / elapsed if elapsed > 0 else 0
+    print()
+    print(f"✅ 批处理完成：共 {total_frames} 帧，耗时 {elapsed:.1f} 秒，端到端 {fps:.1f} 帧/秒")
+    print(f"📋 结果已写入：{args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from opencv_hand_gesture import OpenCVHandGestureRecognizer
+
+"""
+肤色分割性能测试脚本
+不需要摄像头，使用合成的测试帧对比原始 preprocess_frame 与快速肤色分割模式
+（预处理+查找轮廓）每帧的耗时和临时内存分配量
+"""
+
+
+def make_test_frames(count=30, width=640, height=480, seed=0):
+    """生成带有肤色椭圆（模拟手部）和噪声背景的测试帧"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(count):
+        frame = rng.integers(0, 80, (height, width, 3), dtype=np.uint8)
+        center = (width // 2 + int(60 * np.sin(i / 5)), height // 2 + int(40 * np.cos(i / 7)))
+        cv2.ellipse(frame, center, (90, 130), 0, 0, 360, (120, 150, 200), -1)
+        frames.append(frame)
+    return frames
+
+
+def measure(recognizer, frames, repeat=200):
+    """测试 预处理+查找轮廓，返回 (每帧平均耗时ms, P95耗时ms, 每帧峰值临时内存字节数)"""
+    def process(frame):
+        return recognizer.find_hand_contour(recognizer.preprocess_frame(frame))
+
+    # 预热（快速模式在第一帧分配缓冲区）
+    for frame in frames[:3]:
+        process(frame)
+
+    latencies = []
+    for i in range(repeat):
+        frame = frames[i % len(frames)]
+        start = time.perf_counter()
+        process(frame)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    # 统计内存分配：tracemalloc 只记录开始跟踪之后的分配，预先分配的缓冲区不计入，
+    # 每帧新建的掩码、HSV图像等临时数组都会体现在峰值内存中
+    peak_bytes = 0
+    samples = min(len(frames), 20)
+    tracemalloc.start()
+    for frame in frames[:samples]:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        process(frame)
+        peak_bytes += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    latencies = np.array(latencies)
+    return float(latencies.mean()), float(np.percentile(latencies, 95)), peak_bytes / samples
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="肤色分割性能测试")
+    parser.add_argument("--scales", nargs="+", type=float, default=[1.0, 0.5, 0.25],
+                        help="快速模式测试的缩放比例")
+    parser.add_argument("--repeat", type=int, default=200, help="每种模式的测试帧数")
+    args = parser.parse_args()
+
+    frames = make_test_frames()
+
+    print("=" * 72)
+    print("肤色分割性能测试（640x480 合成帧）")
+    print("=" * 72)
+    print(f"{'模式':<20}{'平均(ms)':>10}{'P95(ms)':>10}{'每帧临时分配(KB)':>18}")
+    print("-" * 72)
+
+    baseline = OpenCVHandGestureRecognizer(source=None)
+    rows = [("原始", baseline)]
+    for scale in args.scales:
+        fast = OpenCVHandGestureRecognizer(source=None, fast_segmentation=True, segmentation_scale=scale)
+        rows.append((f"快速 scale={scale}", fast))
+
+    for name, recognizer in rows:
+        mean_ms, p95_ms, peak_bytes = measure(recognizer, frames, args.repeat)
+        print(f"{name:<20}{mean_ms:>10.3f}{p95_ms:>10.3f}{peak_bytes / 1024:>18.1f}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+
+import cv2
+import numpy as np
+
+from batch_process import expand_inputs, iter_frames
+from benchmark_segmentation import make_test_frames
+from threaded_capture import FixtureCapture
+
+"""
+无摄像头性能评测套件
+把录制好的帧（视频文件、图片目录，或合成测试帧）通过 FixtureCapture 注入各个识别器（包括级联模式），
+逐帧测量 采集 → 预处理 → 推理 → 后处理 → 渲染 各阶段和端到端的延迟分位数与吞吐量，
+结果保存为JSON（附带机器信息和提交号），可以与之前的结果对比
+"""
+
+RECOGNIZERS = ["yolo", "mediapipe", "opencv", "yolo-basic", "cascade-yolo", "cascade-mediapipe"]
+
+
+def create_recognizer(name, source, model_path=None):
+    """创建以 source（FixtureCapture）为视频源的识别器（按需导入对应依赖）"""
+    if name == "yolo":
+        from hand_gesture_recognition import HandGestureRecognizer
+        return HandGestureRecognizer(model_path=model_path, sources=[source])
+    if name == "yolo-basic":
+        from yolo_hand_gesture import YOLOHandGestureRecognizer
+        return YOLOHandGestureRecognizer(model_path=model_path or 'yolov8n.pt', source=source)
+    if name == "mediapipe":
+        from optimized_hand_gesture import OptimizedHandGestureRecognizer
+        return OptimizedHandGestureRecognizer(source=source)
+    if name == "opencv":
+        from opencv_hand_gesture import OpenCVHandGestureRecognizer
+        return OpenCVHandGestureRecognizer(source=source)
+    if name.startswith("cascade-"):
+        from cascade_recognizer import CascadeRecognizer
+        return CascadeRecognizer(backend=name[len("cascade-"):], source=source, model_path=model_path)
+    raise ValueError(f"未知的识别器: {name}")
+
+
+def build_stages(name, recognizer):
+    """返回识别器的处理阶段 [(阶段名称, 函数)]，每个函数接收并返回同一个数据字典，
+    后处理阶段之后 item["detections"] 为检测结果字典列表"""
+    if name == "yolo":
+        def preprocess(item):
+            item["input"] = recognizer.preprocess_frame(item["frame"])
+            return item
+
+        def inference(item):
+            item["results"] = recognizer.detect_gestures([item["input"]])
+            return item
+
+        def postprocess(item):
+            item["detections"] = recognizer.parse_results(item["results"])
+            return item
+
+        def render(item):
+            recognizer.draw_detections(item["frame"].copy(), item["detections"])
+            return item
+
+        return [("preprocess", preprocess), ("inference", inference),
+                ("postprocess", postprocess), ("render", render)]
+
+    if name == "yolo-basic":
+        def inference(item):
+            item["results"] = recognizer.detect_gestures(item["frame"])
+            return item
+
+        def postprocess(item):
+            item["detections"] = recognizer.parse_results(item["results"])
+            return item
+
+        def render(item):
+            recognizer.draw_results(item["frame"].copy(), item["results"])
+            return item
+
+        return [("inference", inference), ("postprocess", postprocess), ("render", render)]
+
+    if name == "mediapipe":
+        def preprocess(item):
+            item["rgb"] = cv2.cvtColor(item["frame"], cv2.COLOR_BGR2RGB)
+            return item
+
+        def inference(item):
+            item["results"] = recognizer.hands.process(item["rgb"])
+            return item
+
+        def postprocess(item):
+            from optimized_hand_gesture import detections_from_features
+            item["features"] = recognizer.analyze_results(item["frame"], item["results"])
+            item["detections"] = detections_from_features(item["features"])
+            return item
+
+        def render(item):
+            recognizer.draw_results(item["frame"].copy(), item["results"], item["features"])
+            return item
+
+        return [("preprocess", preprocess), ("inference", inference),
+                ("postprocess", postprocess), ("render", render)]
+
+    if name == "opencv":
+        def preprocess(item):
+            item["mask"] = recognizer.preprocess_frame(item["frame"])
+            return item
+
+        def inference(item):
+            # 轮廓查找和凸缺陷分析相当于该识别器的"推理"
+            contour = recognizer.find_hand_contour(item["mask"])
+            item["contour"] = contour
+            if contour is not None:
+                item["fingers"] = recognizer.count_fingers(contour)
+            return item
+
+        def postprocess(item):
+            item["detections"] = []
+            if item["contour"] is not None:
+                item["gesture"] = recognizer.recognize_gesture(item["fingers"].count, item["contour"],
+                                                               item["frame"])
+                item["detections"].append(recognizer.make_detection(item["contour"], *item["gesture"]))
+            return item
+
+        def render(item):
+            if item["contour"] is not None:
+                display_frame = item["frame"].copy()
+                recognizer.draw_finger_defects(display_frame, item["fingers"])
+                recognizer.draw_finger_contour(display_frame, item["contour"], item["fingers"].tips)
+            return item
+
+        return [("preprocess", preprocess), ("inference", inference),
+                ("postprocess", postprocess), ("render", render)]
+
+    if name.startswith("cascade-"):
+        def proposal(item):
+            item["regions"] = recognizer.propose_regions(item["frame"])
+            return item
+
+        def inference(item):
+            # 没有候选区域时跳过第二级推理
+            item["outputs"] = recognizer.infer_regions(item["frame"], item["regions"])
+            return item
+
+        def postprocess(item):
+            item["detections"], item["features"] = recognizer.parse_regions(item["frame"], item["regions"],
+                                                                             item["outputs"])
+            return item
+
+        def render(item):
+            recognizer.draw_results(item["frame"].copy(), item["regions"], item["detections"], item["features"])
+            return item
+
+        return [("proposal", proposal), ("inference", inference),
+                ("postprocess", postprocess), ("render", render)]
+
+    raise ValueError(f"未知的识别器: {name}")
+
+
+def summarize(latencies_ms):
+    """延迟列表（毫秒）的统计：平均值和 P50/P95/P99"""
+    values = np.asarray(latencies_ms, dtype=np.float64)
+    if len(values) == 0:
+        return {"mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    return {
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99))
+    }
+
+
+def benchmark_recognizer(name, frames, repeat=1, warmup=5, model_path=None):
+    """用录制的帧评测一个识别器，返回统计结果字典"""
+    capture = FixtureCapture(frames, repeat=repeat)
+    recognizer = create_recognizer(name, capture, model_path)
+    stages = build_stages(name, recognizer)
+
+    # 预热（模型初始化、缓冲区分配等不计入统计）
+    for frame in frames[:warmup]:
+        item = {"frame": frame}
+        for _, func in stages:
+            item = func(item)
+
+    stage_latencies = {"capture": []}
+    stage_latencies.update({stage_name: [] for stage_name, _ in stages})
+    end_to_end = []
+
+    start_time = time.perf_counter()
+    while True:
+        frame_start = time.perf_counter()
+        item = capture.read_latest(timeout=0)
+        if item is None:
+            break
+        stage_latencies["capture"].append((time.perf_counter() - frame_start) * 1000)
+
+        item = {"frame": item[0]}
+        for stage_name, func in stages:
+            stage_start = time.perf_counter()
+            item = func(item)
+            stage_latencies[stage_name].append((time.perf_counter() - stage_start) * 1000)
+        end_to_end.append((time.perf_counter() - frame_start) * 1000)
+    elapsed = time.perf_counter() - start_time
+
+    capture.release()
+    return {
+        "frames": len(end_to_end),
+        "elapsed_s": elapsed,
+        "throughput_fps": len(end_to_end) / elapsed if elapsed > 0 else 0.0,
+        "end_to_end": summarize(end_to_end),
+        "stages": {stage_name: summarize(values) for stage_name, values in stage_latencies.items()}
+    }
+
+
+def load_fixture_frames(inputs, max_frames=None, width=640, height=480):
+    """读取录制的帧（视频、图片、目录），没有输入时生成合成测试帧"""
+    if not inputs:
+        return make_test_frames(count=max_frames or 60, width=width, height=height), "synthetic"
+
+    frames = []
+    for _, _, _, frame in iter_frames(expand_inputs(inputs)):
+        frames.append(frame)
+        if max_frames and len(frames) >= max_frames:
+            break
+    return frames, ",".join(inputs)
+
+
+def git_commit():
+    """当前代码的提交号（不在git仓库中时返回 None）"""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def machine_info():
+    """记录运行评测的机器和库版本，便于跨机器对比"""
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__
+    }
+
+
+def print_report(report):
+    """打印各识别器的端到端和分阶段延迟"""
+    print()
+    print(f"{'识别器/阶段':<22}{'平均(ms)':>10}{'P50(ms)':>10}{'P95(ms)':>10}{'P99(ms)':>10}{'吞吐(帧/秒)':>14}")
+    print("-" * 80)
+    for name, result in report["recognizers"].items():
+        if "skipped" in result:
+            print(f"{name:<22}已跳过：{result['skipped']}")
+            continue
+        e2e = result["end_to_end"]
+        print(f"{name:<22}{e2e['mean_ms']:>10.2f}{e2e['p50_ms']:>10.2f}{e2e['p95_ms']:>10.2f}"
+              f"{e2e['p99_ms']:>10.2f}{result['throughput_fps']:>14.1f}")
+        for stage_name, s in result["stages"].items():
+            print(f"  - {stage_name:<18}{s['mean_ms']:>10.2f}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}"
+                  f"{s['p99_ms']:>10.2f}")
+    print()
+
+
+def print_comparison(baseline, report):
+    """与之前保存的结果对比端到端延迟和吞吐量"""
+    print(f"📊 与基线对比（基线提交 {baseline.get('commit')}，当前提交 {report.get('commit')}）：")
+    if baseline.get("machine") != report.get("machine"):
+        print("⚠️  基线在不同的机器或库版本上运行，结果仅供参考")
+    print(f"{'识别器':<14}{'P50(ms)':>20}{'P95(ms)':>20}{'吞吐(帧/秒)':>22}")
+    print("-" * 80)
+    for name, result in report["recognizers"].items():
+        old = baseline.get("recognizers", {}).get(name)
+        if "skipped" in result or not old or "skipped" in old:
+            continue
+
+        def change(old_value, new_value):
+            ratio = (new_value - old_value) / old_value if old_value else 0.0
+            return f"{old_value:.2f}→{new_value:.2f} ({ratio:+.0%})"
+
+        print(f"{name:<14}"
+              f"{change(old['end_to_end']['p50_ms'], result['end_to_end']['p50_ms']):>20}"
+              f"{change(old['end_to_end']['p95_ms'], result['end_to_end']['p95_ms']):>20}"
+              f"{change(old['throughput_fps'], result['throughput_fps']):>22}")
+    print()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="无摄像头的手势识别性能评测")
+    parser.add_argument("inputs", nargs="*", help="录制的视频文件、图片或目录（默认使用合成测试帧）")
+    parser.add_argument("--recognizers", nargs="+", choices=RECOGNIZERS, default=RECOGNIZERS,
+                        help="参与评测的识别器")
+    parser.add_argument("--model", default=None, help="YOLO模型文件路径")
+    parser.add_argument("--max-frames", type=int, default=None, help="最多使用的录制帧数")
+    parser.add_argument("--repeat", type=int, default=3, help="录制帧循环播放的次数")
+    parser.add_argument("--warmup", type=int, default=5, help="预热帧数（不计入统计）")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="结果JSON文件")
+    parser.add_argument("--compare", default=None, help="与之前保存的结果JSON对比")
+    args = parser.parse_args()
+
+    frames, fixture_name = load_fixture_frames(args.inputs, args.max_frames)
+    if not frames:
+        print("❌ 没有可用的录制帧")
+        return
+    h, w = frames[0].shape[:2]
+
+    print("=" * 80)
+    print(f"手势识别性能评测：{len(frames)} 帧（{w}x{h}）× {args.repeat} 次，来源 {fixture_name}")
+    print("=" * 80)
+
+    report = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": git_commit(),
+        "machine": machine_info(),
+        "fixture": {"source": fixture_name, "frames": len(frames), "width": w, "height": h,
+                    "repeat": args.repeat},
+        "recognizers": {}
+    }
+
+    for name in args.recognizers:
+        print(f"▶️  正在评测 {name} ...")
+        try:
+            report["recognizers"][name] = benchmark_recognizer(name, frames, args.repeat, args.warmup,
+                                                               args.model)
+        except Exception as e:
+            # 缺少依赖（ultralytics / mediapipe）或模型无法加载时跳过该识别器
+            print(f"⚠️  跳过 {name}: {e}")
+            report["recognizers"][name] = {"skipped": str(e)}
+
+    print_report(report)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"📋 结果已保存：{args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print_comparison(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
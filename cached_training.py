@@ -0,0 +1,108 @@
+import argparse
+import os
+import tempfile
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+from ultralytics.data.dataset import YOLODataset
+from ultralytics.models.yolo.detect import DetectionTrainer
+
+from dataset_cache import make_cached_trainer, prepare_dataset
+
+"""
+使用数据集缓存训练
+CachedYOLODataset 从 dataset_cache.py 生成的内存映射缓存读取图像，代替解码和缩放JPEG，
+其余行为（训练时的图像缓冲区、Mosaic 等数据增强）与 ultralytics 的 YOLODataset 相同；
+两个类都定义在模块顶层，DataLoader 工作进程以 spawn 方式启动（Windows）时也能序列化数据集
+"""
+
+
+class CachedYOLODataset(YOLODataset):
+    """从缓存读取图像的 YOLODataset（cached[i] 为第 i 张图像的 (DatasetCache, 缓存序号)，不在缓存中时为 None）"""
+
+    def load_image(self, i, rect_mode=True):
+        found = self.cached[i]
+        if found is None or self.ims[i] is not None:
+            return super().load_image(i, rect_mode)
+
+        cache, index = found
+        h0, w0 = cache.entries[index]["orig_shape"]
+        # 数据增强会原地修改图像，复制一份（相比解码JPEG开销很小）
+        im = np.array(cache.resized_image(index))
+        if not rect_mode and im.shape[:2] != (self.imgsz, self.imgsz):
+            im = cv2.resize(im, (self.imgsz, self.imgsz), interpolation=cv2.INTER_LINEAR)
+
+        # 与 BaseDataset.load_image 相同：训练时放入图像缓冲区，Mosaic 从缓冲区中抽取其余图像
+        if self.augment:
+            self.ims[i], self.im_hw0[i], self.im_hw[i] = im, (h0, w0), im.shape[:2]
+            self.buffer.append(i)
+            if 1 < len(self.buffer) >= self.max_buffer_length:
+                j = self.buffer.pop(0)
+                if self.cache != "ram":
+                    self.ims[j], self.im_hw0[j], self.im_hw[j] = None, None, None
+        return im, (h0, w0), im.shape[:2]
+
+
+class CachedDetectionTrainer(DetectionTrainer):
+    """构建数据集时改用 CachedYOLODataset；caches 为 DatasetCache 列表，由 make_cached_trainer 设置"""
+    caches = []
+
+    def build_dataset(self, img_path, mode="train", batch=None):
+        dataset = super().build_dataset(img_path, mode, batch)
+        if type(dataset) is not YOLODataset:
+            return dataset
+        caches = [cache for cache in self.caches if cache.imgsz == dataset.imgsz]
+        if self.caches and not caches:
+            print(f"⚠️  训练尺寸 {dataset.imgsz} 与缓存尺寸 {self.caches[0].imgsz} 不一致，不使用缓存")
+            return dataset
+
+        cached = []
+        for path in dataset.im_files:
+            found = None
+            for cache in caches:
+                index = cache.find(path)
+                if index is not None:
+                    found = (cache, index)
+                    break
+            cached.append(found)
+        hits = sum(found is not None for found in cached)
+        print(f"📦 {mode} 数据集从缓存读取 {hits}/{len(dataset.im_files)} 张图像")
+        if hits:
+            # 数据集已按训练配置构建好，只替换类（CachedYOLODataset 只覆盖 load_image），不重复构建参数
+            dataset.__class__ = CachedYOLODataset
+            dataset.cached = cached
+        return dataset
+
+
+def check_training(data_yaml, model_path="yolov8n.pt", imgsz=640, cache_dir=None, workers=0, batch=16):
+    """用缓存训练一个 epoch（开启 Mosaic），检查缓存训练能否正常运行"""
+    trainer = make_cached_trainer(prepare_dataset(data_yaml, imgsz, cache_dir))
+    with tempfile.TemporaryDirectory() as project:
+        YOLO(model_path).train(trainer=trainer, data=data_yaml, epochs=1, imgsz=imgsz, batch=batch,
+                               workers=workers, cache=False, mosaic=1.0, val=False, plots=False,
+                               project=project, name="cache_check")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="用数据集缓存训练一个 epoch，检查缓存训练能否正常运行")
+    parser.add_argument("data", nargs="?", default="hand_gesture_data.yaml", help="数据配置文件")
+    parser.add_argument("--model", default="yolov8n.pt", help="模型文件或配置（如 yolov8n.yaml 不加载权重）")
+    parser.add_argument("--imgsz", type=int, default=640, help="训练输入尺寸")
+    parser.add_argument("--cache-dir", default=None, help="缓存目录（默认为数据配置文件旁的 .dataset_cache）")
+    parser.add_argument("--workers", type=int, default=min(2, os.cpu_count() or 1),
+                        help="DataLoader 工作进程数（大于 0 时同时检查数据集能否传给工作进程）")
+    parser.add_argument("--batch", type=int, default=16, help="批大小")
+    args = parser.parse_args()
+
+    try:
+        check_training(args.data, args.model, args.imgsz, args.cache_dir, args.workers, args.batch)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    print("✅ 缓存训练检查通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import cv2
+
+"""
+视频采集配置
+统一各识别器打开视频源的方式：可选择采集后端（V4L2 / DirectShow / MSMF / GStreamer），
+按请求的分辨率和帧率协商解码开销最低的像素格式（FOURCC），让摄像头在设备端完成缩放，
+把驱动缓冲区设为最小以减少排队延迟，并输出设备实际提供的格式
+"""
+
+# 采集后端
+BACKENDS = {
+    "auto": cv2.CAP_ANY,
+    "v4l2": cv2.CAP_V4L2,
+    "dshow": cv2.CAP_DSHOW,
+    "msmf": cv2.CAP_MSMF,
+    "gstreamer": cv2.CAP_GSTREAMER,
+    "ffmpeg": cv2.CAP_FFMPEG
+}
+
+# 自动协商时尝试的像素格式，按CPU解码开销从低到高排列：
+# YUYV 为未压缩格式，只需颜色转换；MJPG 需要逐帧JPEG解码，但在USB带宽受限时能提供更高的分辨率/帧率
+FOURCC_CANDIDATES = ("YUYV", "MJPG")
+
+
+def fourcc_to_str(value):
+    """CAP_PROP_FOURCC 的数值 -> 四字符编码"""
+    value = int(value)
+    if value <= 0:
+        return ""
+    return "".join(chr((value >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00 ")
+
+
+class CaptureConfig:
+    def __init__(self, width=640, height=480, fps=None, fourcc="auto", backend="auto", driver_buffer=1):
+        """fourcc 为 "auto"（自动协商）、"none"（不设置）或四字符编码（如 "MJPG"）；
+        driver_buffer 为驱动缓冲区帧数（CAP_PROP_BUFFERSIZE），0 表示不设置"""
+        if backend not in BACKENDS:
+            raise ValueError(f"不支持的采集后端: {backend}")
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.fourcc = fourcc
+        self.backend = backend
+        self.driver_buffer = driver_buffer
+
+    @classmethod
+    def from_args(cls, args):
+        """根据 add_capture_arguments 添加的命令行参数创建配置"""
+        return cls(width=args.width, height=args.height, fps=args.fps, fourcc=args.fourcc,
+                   backend=args.capture_backend, driver_buffer=args.driver_buffer)
+
+    def gstreamer_pipeline(self, device_index):
+        """为摄像头索引生成 GStreamer 管道：设备端输出请求的分辨率，appsink 只保留最新帧"""
+        caps = "image/jpeg" if self.fourcc.upper() == "MJPG" else "video/x-raw"
+        if self.width and self.height:
+            caps += f",width={self.width},height={self.height}"
+        if self.fps:
+            caps += f",framerate={int(self.fps)}/1"
+        decode = " ! jpegdec" if caps.startswith("image/jpeg") else ""
+        return (f"v4l2src device=/dev/video{device_index} ! {caps}{decode} ! videoconvert ! "
+                f"video/x-raw,format=BGR ! appsink drop=true max-buffers=1 sync=false")
+
+    def open(self, source):
+        """打开视频源，返回已配置好的 cv2.VideoCapture"""
+        # 包含 "!" 的字符串视为 GStreamer 管道
+        if isinstance(source, str) and "!" in source:
+            cap = cv2.VideoCapture(source, cv2.CAP_GSTREAMER)
+        elif isinstance(source, int) and self.backend == "gstreamer":
+            cap = cv2.VideoCapture(self.gstreamer_pipeline(source), cv2.CAP_GSTREAMER)
+        else:
+            cap = cv2.VideoCapture(source, BACKENDS[self.backend])
+        if not cap.isOpened():
+            raise Exception("无法打开摄像头")
+
+        # 视频文件、流地址和 GStreamer 管道的格式由来源决定，只对摄像头做协商
+        if isinstance(source, int) and self.backend != "gstreamer":
+            self.configure_camera(cap)
+            self.log_delivered(cap, source)
+        return cap
+
+    def configure_camera(self, cap):
+        """设置驱动缓冲区、帧率，并协商像素格式和分辨率"""
+        if self.driver_buffer:
+            # 驱动缓冲区越小，读取到的帧越新（部分后端不支持，设置失败时忽略）
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, self.driver_buffer)
+
+        fourcc = self.fourcc.upper() if self.fourcc else "NONE"
+        if fourcc == "NONE":
+            self.apply_format(cap, None)
+        elif fourcc == "AUTO":
+            self.negotiate(cap)
+        else:
+            self.apply_format(cap, fourcc)
+
+    def apply_format(self, cap, fourcc):
+        """按顺序设置像素格式、分辨率和帧率（V4L2 需要先设置格式再设置分辨率），返回设备实际提供的格式"""
+        if fourcc:
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+        if self.width:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        if self.height:
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        if self.fps:
+            cap.set(cv2.CAP_PROP_FPS, self.fps)
+        return self.delivered(cap)
+
+    def satisfies(self, delivered, fourcc):
+        """设备实际提供的格式是否满足请求（分辨率一致，帧率不低于请求值的 90%）"""
+        if fourcc and delivered["fourcc"] and delivered["fourcc"] != fourcc:
+            return False
+        if self.width and self.height and (delivered["width"], delivered["height"]) != (self.width, self.height):
+            return False
+        # 部分后端不报告帧率（返回 0），此时不按帧率判断
+        if self.fps and delivered["fps"] and delivered["fps"] < self.fps * 0.9:
+            return False
+        return True
+
+    def negotiate(self, cap):
+        """依次尝试解码开销从低到高的格式，选择第一个在请求的分辨率和帧率下可用的格式"""
+        tried = []
+        for fourcc in FOURCC_CANDIDATES:
+            delivered = self.apply_format(cap, fourcc)
+            if self.satisfies(delivered, fourcc):
+                return fourcc
+            tried.append((fourcc, delivered))
+
+        # 没有完全满足请求的格式时，在分辨率符合的格式中（设备端缩放，避免CPU缩放）选择帧率最高的
+        matching = [(delivered["fps"], -i, fourcc) for i, (fourcc, delivered) in enumerate(tried)
+                    if (delivered["width"], delivered["height"]) == (self.width, self.height)]
+        fourcc = max(matching)[2] if matching else tried[-1][0]
+        if fourcc != tried[-1][0]:
+            self.apply_format(cap, fourcc)
+        print(f"⚠️  没有格式完全满足 {self.describe_request()}，使用 {fourcc}")
+        return fourcc
+
+    def describe_request(self):
+        fps = f" @ {self.fps:g}fps" if self.fps else ""
+        return f"{self.width}x{self.height}{fps}"
+
+    @staticmethod
+    def delivered(cap):
+        """读取设备实际提供的格式"""
+        return {
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": cap.get(cv2.CAP_PROP_FPS),
+            "fourcc": fourcc_to_str(cap.get(cv2.CAP_PROP_FOURCC)),
+            "buffer": int(cap.get(cv2.CAP_PROP_BUFFERSIZE))
+        }
+
+    def log_delivered(self, cap, source):
+        """输出设备实际提供的格式，与请求不一致时给出提示"""
+        delivered = self.delivered(cap)
+        try:
+            backend = cap.getBackendName()
+        except cv2.error:
+            backend = self.backend
+        print(f"📷 摄像头 {source} 实际输出: {delivered['width']}x{delivered['height']} @ {delivered['fps']:g}fps "
+              f"{delivered['fourcc'] or '?'} | 驱动缓冲 {delivered['buffer']} | 后端 {backend}")
+        if self.width and self.height and (delivered["width"], delivered["height"]) != (self.width, self.height):
+            print(f"⚠️  摄像头不支持请求的分辨率 {self.width}x{self.height}")
+        return delivered
+
+
+def add_capture_arguments(parser):
+    """为命令行添加采集配置参数"""
+    parser.add_argument("--width", type=int, default=640, help="请求的采集宽度（由摄像头在设备端缩放）")
+    parser.add_argument("--height", type=int, default=480, help="请求的采集高度")
+    parser.add_argument("--fps", type=float, default=None, help="请求的采集帧率")
+    parser.add_argument("--fourcc", default="auto",
+                        help="像素格式：auto（按解码开销自动协商）、none（不设置）或四字符编码如 MJPG/YUYV")
+    parser.add_argument("--capture-backend", choices=sorted(BACKENDS), default="auto",
+                        help="采集后端；gstreamer 时摄像头索引会转换为 v4l2src 管道，也可直接把管道字符串作为视频源")
+    parser.add_argument("--driver-buffer", type=int, default=1,
+                        help="驱动缓冲区帧数（CAP_PROP_BUFFERSIZE），越小延迟越低，0 表示不设置")
@@ -0,0 +1,297 @@
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from threaded_capture import open_capture
+from opencv_hand_gesture import OpenCVHandGestureRecognizer
+from capture_config import CaptureConfig, add_capture_arguments
+from metrics import FrameMetrics, add_metrics_arguments, print_summary, start_exporters
+
+"""
+级联手势识别
+第一级用缩小分辨率的快速肤色分割和轮廓查找（OpenCV 识别器的 find_hand_contours）提出候选手部区域，
+几乎不耗时；第二级只把扩展成正方形的候选区域裁剪出来送入 YOLO（detect_gestures）或 MediaPipe（hands.process），
+再把检测框和关键点映射回整帧坐标。没有候选区域的帧直接跳过神经网络推理
+"""
+
+# 可选的第二级识别器
+BACKENDS = ["yolo", "mediapipe"]
+
+
+class CascadeRecognizer:
+    def __init__(self, backend="yolo", source=0, model_path=None, padding=0.25, max_regions=2, crop_imgsz=224,
+                 segmentation_scale=0.5, classifier_path=None, target_fps=None, capture_config=None, warmup=True):
+        """backend 为第二级识别器（yolo 或 mediapipe），source 为 None 时不打开摄像头；
+
+        padding 为候选区域每边向外扩展的比例（相对边长），max_regions 为每帧最多处理的候选区域数；
+        crop_imgsz 为 YOLO 对裁剪区域推理时的输入尺寸；classifier_path 为 MediaPipe 后端的关键点分类器权重；
+        warmup 为 True 时用 crop_imgsz 大小的空白裁剪区域预热第二级识别器
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"未知的级联后端: {backend}")
+        self.backend_name = backend
+        self.padding = padding
+        self.max_regions = max_regions
+        self.crop_imgsz = crop_imgsz
+
+        # 第一级：快速肤色分割和轮廓查找（同时复用其中文文字渲染器）
+        self.proposer = OpenCVHandGestureRecognizer(source=None, fast_segmentation=True,
+                                                    segmentation_scale=segmentation_scale)
+
+        # 第二级：只处理裁剪区域（按需导入对应依赖）
+        if backend == "yolo":
+            from hand_gesture_recognition import HandGestureRecognizer
+            # 整帧尺寸的默认预热对裁剪区域推理无效，改为下面按 crop_imgsz 预热
+            self.backend = HandGestureRecognizer(model_path=model_path, sources=None, warmup=False)
+        else:
+            from optimized_hand_gesture import OptimizedHandGestureRecognizer
+            self.backend = OptimizedHandGestureRecognizer(source=None, classifier_path=classifier_path, warmup=False)
+            # 裁剪区域的位置每帧都在变化，MediaPipe 的跨帧跟踪不再适用，每个区域单独检测一只手
+            self.backend.hands.close()
+            self.backend.hands = self.backend.mp_hands.Hands(
+                static_image_mode=True,
+                max_num_hands=1,
+                min_detection_confidence=0.7
+            )
+        if warmup:
+            self.warmup()
+
+        # 打开摄像头（后台线程采集，只保留最新帧）
+        self.cap = open_capture(source, width=640, height=480, config=capture_config)
+
+        # 跳过推理的帧数统计
+        self.frames = 0
+        self.skipped_frames = 0
+
+        # 各阶段延迟指标和平滑帧率（target_fps 为告警用的目标帧率）
+        self.metrics = FrameMetrics(target_fps=target_fps)
+        self.fps = 0
+
+    def warmup(self):
+        """用一个 crop_imgsz 大小的空白裁剪区域推理一次，使第一个真实候选区域不再承担模型初始化的开销"""
+        size = self.crop_imgsz
+        self.infer_regions(np.zeros((size, size, 3), dtype=np.uint8), [[0, 0, size, size]])
+
+    def pad_region(self, x, y, w, h, frame_w, frame_h):
+        """把轮廓的外接矩形向外扩展并变成正方形，平移到帧内，返回 [x1, y1, x2, y2]"""
+        side = int(max(w, h) * (1 + 2 * self.padding))
+        side = min(side, frame_w, frame_h)
+        x1 = min(max(x + w // 2 - side // 2, 0), frame_w - side)
+        y1 = min(max(y + h // 2 - side // 2, 0), frame_h - side)
+        return [x1, y1, x1 + side, y1 + side]
+
+    @staticmethod
+    def merge_regions(regions):
+        """合并相互重叠的区域（避免同一只手被检测两次）"""
+        regions = [list(region) for region in regions]
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(regions)):
+                for j in range(i + 1, len(regions)):
+                    a, b = regions[i], regions[j]
+                    if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                        regions[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                        del regions[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+        return regions
+
+    def propose_regions(self, frame):
+        """第一级：返回候选手部区域列表 [[x1, y1, x2, y2], ...]（整帧坐标）"""
+        h, w = frame.shape[:2]
+        mask = self.proposer.preprocess_frame(frame)
+        contours = self.proposer.find_hand_contours(mask, self.max_regions)
+        return self.merge_regions([self.pad_region(*cv2.boundingRect(contour), w, h) for contour in contours])
+
+    def infer_regions(self, frame, regions):
+        """第二级：对每个候选区域的裁剪图推理，返回每个区域的原始输出"""
+        crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in regions]
+        if not crops:
+            return []
+        if self.backend_name == "yolo":
+            # 所有裁剪区域一次批量推理
+            return self.backend.detect_gestures(crops, imgsz=self.crop_imgsz)
+        from optimized_hand_gesture import landmarks_to_array
+        outputs = []
+        for crop in crops:
+            results = self.backend.hands.process(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB))
+            outputs.append(landmarks_to_array(results.multi_hand_landmarks)
+                           if results.multi_hand_landmarks else None)
+        return outputs
+
+    def parse_regions(self, frame, regions, outputs):
+        """把各区域的输出映射回整帧坐标，返回 (检测结果列表, MediaPipe 后端的 analyze_hands 结果或 None)"""
+        if self.backend_name == "yolo":
+            detections = []
+            for (x1, y1, _, _), result in zip(regions, outputs):
+                for detection in self.backend.parse_results([result]):
+                    bx1, by1, bx2, by2 = detection["bbox"]
+                    detection["bbox"] = [bx1 + x1, by1 + y1, bx2 + x1, by2 + y1]
+                    detections.append(detection)
+            return detections, None
+
+        from optimized_hand_gesture import analyze_hands, detections_from_features
+        # 关键点从裁剪区域的归一化坐标映射回整帧的归一化坐标
+        h, w = frame.shape[:2]
+        hands = []
+        for (x1, y1, x2, y2), landmarks in zip(regions, outputs):
+            if landmarks is None:
+                continue
+            landmarks = landmarks * np.array([(x2 - x1) / w, (y2 - y1) / h, (x2 - x1) / w], dtype=np.float32)
+            landmarks[:, :, 0] += x1 / w
+            landmarks[:, :, 1] += y1 / h
+            hands.append(landmarks)
+        if not hands:
+            return [], None
+        features = analyze_hands(np.concatenate(hands), w, h, self.backend.classifier)
+        return detections_from_features(features), features
+
+    def process_frame(self, frame):
+        """无界面处理单帧，返回检测结果列表；没有候选区域时跳过第二级推理"""
+        self.frames += 1
+        regions = self.propose_regions(frame)
+        if not regions:
+            self.skipped_frames += 1
+            return []
+        return self.parse_regions(frame, regions, self.infer_regions(frame, regions))[0]
+
+    def draw_results(self, frame, regions, detections, features=None):
+        """绘制候选区域、关键点、检测框、手势标签和帧率"""
+        for x1, y1, x2, y2 in regions:
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 255), 1)
+
+        if features is not None:
+            h, w = frame.shape[:2]
+            for points in np.trunc(features["landmarks"][:, :, :2] * (w, h)).astype(np.int32):
+                for start, end in self.backend.mp_hands.HAND_CONNECTIONS:
+                    cv2.line(frame, tuple(points[start]), tuple(points[end]), (255, 255, 255), 1)
+                for point in points:
+                    cv2.circle(frame, tuple(point), 3, (255, 0, 0), -1)
+
+        for detection in detections:
+            x1, y1, x2, y2 = detection["bbox"]
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            label = f"{detection['gesture']}: {detection['confidence']:.2f}"
+            self.proposer.text_renderer.draw_text(frame, label, (x1, y1 - 30), (0, 255, 0))
+
+        self.proposer.text_renderer.draw_text(frame, f"FPS: {self.fps:.1f}", (10, 10), (0, 255, 0))
+        return frame
+
+    def print_skip_stats(self):
+        if self.frames:
+            print(f"⏭️  无候选区域跳过推理 {self.skipped_frames}/{self.frames} 帧"
+                  f"（{self.skipped_frames / self.frames:.1%}）")
+
+    def close(self):
+        """释放摄像头和 MediaPipe"""
+        if self.cap is not None:
+            self.cap.release()
+        cv2.destroyAllWindows()
+        if self.backend_name == "mediapipe":
+            self.backend.hands.close()
+
+    def run(self):
+        """运行级联实时手势识别"""
+        print(f"级联手势识别系统已启动（肤色候选区域 → {self.backend_name}）")
+        print("💡 提示：")
+        print("   - 按 'q' 键退出")
+        print("   - 按 's' 键保存当前图像")
+        print("   - 黄色方框为送入第二级识别的候选区域")
+        print()
+
+        try:
+            while True:
+                # 读取帧
+                with self.metrics.time("capture"):
+                    ret, frame = self.cap.read()
+                    if ret:
+                        # 镜像翻转帧（使显示更自然）
+                        frame = cv2.flip(frame, 1)
+                if not ret:
+                    print("无法读取摄像头帧")
+                    break
+                self.frames += 1
+
+                # 第一级：候选区域
+                with self.metrics.time("proposal"):
+                    regions = self.propose_regions(frame)
+
+                # 第二级：只在有候选区域时推理
+                detections, features = [], None
+                if regions:
+                    with self.metrics.time("inference"):
+                        outputs = self.infer_regions(frame, regions)
+                    with self.metrics.time("postprocess"):
+                        detections, features = self.parse_regions(frame, regions, outputs)
+                else:
+                    self.skipped_frames += 1
+
+                # 绘制结果
+                with self.metrics.time("render"):
+                    frame = self.draw_results(frame, regions, detections, features)
+
+                # 显示帧
+                with self.metrics.time("display"):
+                    cv2.imshow("级联手势识别", frame)
+                    key = cv2.waitKey(1) & 0xFF
+
+                # 平滑帧率
+                self.metrics.set_dropped_frames(self.cap.dropped_frames)
+                self.fps = self.metrics.frame_done()
+
+                if key == ord('q'):
+                    break
+                elif key == ord('s'):
+                    save_path = f"gesture_{int(time.time())}.jpg"
+                    cv2.imwrite(save_path, frame)
+                    print(f"✅ 图像已保存：{save_path}")
+
+        except KeyboardInterrupt:
+            print()
+            print("🔄 正在退出系统...")
+
+        self.close()
+        self.print_skip_stats()
+        print_summary(self.metrics)
+        print("✅ 级联手势识别系统已关闭")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="级联手势识别：肤色候选区域 + 裁剪区域上的 YOLO/MediaPipe")
+    parser.add_argument("--backend", choices=BACKENDS, default="yolo", help="第二级识别器")
+    parser.add_argument("--model", default=None, help="YOLO模型文件路径")
+    parser.add_argument("--classifier", default=None, help="MediaPipe 后端使用的关键点手势分类器权重")
+    parser.add_argument("--padding", type=float, default=0.25, help="候选区域每边向外扩展的比例")
+    parser.add_argument("--max-regions", type=int, default=2, help="每帧最多处理的候选区域数")
+    parser.add_argument("--crop-imgsz", type=int, default=224, help="YOLO 对裁剪区域推理的输入尺寸")
+    parser.add_argument("--segmentation-scale", type=float, default=0.5, help="肤色分割使用的缩放比例")
+    add_capture_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        recognizer = CascadeRecognizer(backend=args.backend, model_path=args.model, padding=args.padding,
+                                       max_regions=args.max_regions, crop_imgsz=args.crop_imgsz,
+                                       segmentation_scale=args.segmentation_scale,
+                                       classifier_path=args.classifier, target_fps=args.target_fps,
+                                       capture_config=CaptureConfig.from_args(args))
+        # 启动指标导出（Prometheus 接口 / JSON 文件）
+        exporters = start_exporters(recognizer.metrics, args.metrics_port, args.metrics_json,
+                                    args.metrics_interval)
+        try:
+            recognizer.run()
+        finally:
+            for exporter in exporters:
+                exporter.stop()
+    except Exception as e:
+        print(f"❌ 发生错误: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+import yaml
+
+from model_export import list_images, resolve_split_dir
+
+"""
+训练数据集缓存
+训练前一次性校验所有标注文件，在多个进程中把图像按 ultralytics 的方式等比缩放到训练尺寸并填充为正方形，
+写入连续存储的内存映射缓存（images.npy）；标注只做校验，训练时仍由 ultralytics 读取原始标注（它自己会缓存解析结果）。
+每张图像以文件内容的哈希为键，重新准备时未改动的图像直接从旧缓存复制，不再解码；
+训练时各个 epoch 直接从缓存读取图像，不再重复解码和缩放JPEG
+"""
+
+CACHE_VERSION = 2
+
+# 工作进程中打开的缓存文件（可写内存映射）
+_output = None
+
+
+def label_path_for(image_path):
+    """YOLO 约定的标注文件路径：.../images/xxx.jpg -> .../labels/xxx.txt"""
+    head, sep, tail = image_path.rpartition(f"{os.sep}images{os.sep}")
+    path = head + f"{os.sep}labels{os.sep}" + tail if sep else image_path
+    return os.path.splitext(path)[0] + ".txt"
+
+
+def read_labels(label_path, num_classes):
+    """读取并校验一个标注文件，返回 (标注数组 [N, 5]：类别 x y w h，错误列表)；没有标注文件的图像视为背景图"""
+    if not os.path.exists(label_path):
+        return np.zeros((0, 5), dtype=np.float32), []
+
+    rows = []
+    errors = []
+    with open(label_path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            parts = line.split()
+            if not parts:
+                continue
+            where = f"{label_path}:{line_no}"
+            if len(parts) != 5:
+                errors.append(f"{where} 应为 5 列，实际 {len(parts)} 列")
+                continue
+            try:
+                class_id, x, y, w, h = (float(value) for value in parts)
+            except ValueError:
+                errors.append(f"{where} 包含非数字内容")
+                continue
+            if class_id != int(class_id) or not 0 <= class_id < num_classes:
+                errors.append(f"{where} 类别 {parts[0]} 超出范围 0~{num_classes - 1}")
+            elif not all(0 <= value <= 1 for value in (x, y, w, h)) or w <= 0 or h <= 0:
+                errors.append(f"{where} 坐标应为 0~1 之间的归一化值，且宽高大于 0")
+            else:
+                rows.append((class_id, x, y, w, h))
+    return np.array(rows, dtype=np.float32).reshape(-1, 5), errors
+
+
+def file_hash(path):
+    """图像文件内容的哈希（缓存键）"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _init_worker(images_path):
+    global _output
+    _output = np.load(images_path, mmap_mode="r+")
+
+
+def resize_long_side(image, imgsz):
+    """与 ultralytics 的 load_image 相同的等比缩放：长边缩放到 imgsz（边长向上取整），返回 (图像, 缩放比例)"""
+    h0, w0 = image.shape[:2]
+    scale = imgsz / max(h0, w0)
+    if scale != 1:
+        new_w, new_h = min(math.ceil(w0 * scale), imgsz), min(math.ceil(h0 * scale), imgsz)
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    return image, scale
+
+
+def _letterbox_into_cache(task):
+    """（工作进程）解码一张图像，缩放并填充后直接写入缓存文件的第 index 行，只返回几何信息"""
+    index, path = task
+    image = cv2.imread(path)
+    if image is None:
+        return index, None
+    h0, w0 = image.shape[:2]
+    size = _output.shape[1]
+    image, scale = resize_long_side(image, size)
+    new_h, new_w = image.shape[:2]
+    pad_x, pad_y = (size - new_w) // 2, (size - new_h) // 2
+    _output[index] = cv2.copyMakeBorder(image, pad_y, size - new_h - pad_y, pad_x, size - new_w - pad_x,
+                                        cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return index, {"orig_shape": [h0, w0], "resized": [new_h, new_w], "scale": scale, "pad": [pad_x, pad_y]}
+
+
+def build_split_cache(image_paths, split_dir, imgsz, workers=None):
+    """构建一个数据集划分的缓存，返回 (复用的图像数, 新处理的图像数)"""
+    os.makedirs(split_dir, exist_ok=True)
+    index_path = os.path.join(split_dir, "index.json")
+    images_path = os.path.join(split_dir, "images.npy")
+    hashes = [file_hash(path) for path in image_paths]
+
+    # 读取旧缓存，按内容哈希查找可以复用的图像
+    old_index = None
+    if os.path.exists(index_path) and os.path.exists(images_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            old_index = json.load(f)
+        if old_index.get("version") != CACHE_VERSION or old_index.get("imgsz") != imgsz:
+            old_index = None
+    old_rows = {}
+    if old_index:
+        old_rows = {entry["hash"]: i for i, entry in enumerate(old_index["entries"])}
+
+    # 图像完全相同时直接复用整个缓存
+    reuse_all = old_index is not None and [entry["hash"] for entry in old_index["entries"]] == hashes
+    entries = [None] * len(image_paths)
+    reused = 0
+    if reuse_all:
+        entries = [dict(entry) for entry in old_index["entries"]]
+        reused = len(entries)
+    else:
+        tmp_path = os.path.join(split_dir, "images.tmp.npy")
+        output = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.uint8,
+                                           shape=(len(image_paths), imgsz, imgsz, 3))
+        tasks = []
+        old_images = np.load(images_path, mmap_mode="r") if old_index else None
+        for i, (path, digest) in enumerate(zip(image_paths, hashes)):
+            row = old_rows.get(digest)
+            if row is None:
+                tasks.append((i, path))
+                continue
+            output[i] = old_images[row]
+            entries[i] = dict(old_index["entries"][row])
+            reused += 1
+        output.flush()
+        del output, old_images
+
+        if tasks:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(tmp_path,)) as executor:
+                chunksize = max(1, len(tasks) // ((workers or os.cpu_count() or 1) * 4))
+                for i, entry in executor.map(_letterbox_into_cache, tasks, chunksize=chunksize):
+                    if entry is None:
+                        raise ValueError(f"无法读取图像: {image_paths[i]}")
+                    entries[i] = entry
+        os.replace(tmp_path, images_path)
+
+    for path, digest, entry in zip(image_paths, hashes, entries):
+        entry.update({"file": os.path.abspath(path), "hash": digest})
+
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump({"version": CACHE_VERSION, "imgsz": imgsz, "entries": entries}, f, ensure_ascii=False)
+    return reused, len(image_paths) - reused
+
+
+class DatasetCache:
+    """一个数据集划分的缓存（只读内存映射）"""
+
+    def __init__(self, split_dir):
+        self.split_dir = split_dir
+        with open(os.path.join(split_dir, "index.json"), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        self.imgsz = index["imgsz"]
+        self.entries = index["entries"]
+        self.images = np.load(os.path.join(split_dir, "images.npy"), mmap_mode="r")
+        self.lookup = {entry["file"]: i for i, entry in enumerate(self.entries)}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __reduce__(self):
+        # 传给 DataLoader 工作进程时只传目录，在工作进程中重新打开内存映射（不复制图像数据）
+        return DatasetCache, (self.split_dir,)
+
+    def image(self, index):
+        """填充后的 imgsz x imgsz 图像（内存映射视图，只读）"""
+        return self.images[index]
+
+    def resized_image(self, index):
+        """去掉填充部分、等比缩放后的图像（内存映射视图，只读）"""
+        entry = self.entries[index]
+        new_h, new_w = entry["resized"]
+        pad_x, pad_y = entry["pad"]
+        return self.images[index, pad_y:pad_y + new_h, pad_x:pad_x + new_w]
+
+    def find(self, path):
+        """图像文件在缓存中的序号，不在缓存中时返回 None"""
+        return self.lookup.get(os.path.abspath(path))
+
+
+def prepare_dataset(data_yaml, imgsz=640, cache_dir=None, workers=None, splits=("train", "val")):
+    """校验标注并构建各数据集划分的缓存，返回 {划分: DatasetCache}"""
+    with open(data_yaml, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    names = data.get("names") or {}
+    num_classes = len(names)
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(data_yaml)), ".dataset_cache")
+
+    # 先校验所有划分的标注，发现错误时在处理图像之前退出
+    split_items = {}
+    errors = []
+    for split in splits:
+        if not data.get(split):
+            continue
+        image_dir = resolve_split_dir(data_yaml, split)
+        image_paths = list_images(image_dir)
+        if not image_paths:
+            print(f"⚠️  {split} 划分中没有图像: {image_dir}")
+            continue
+        labels = []
+        for path in image_paths:
+            split_labels, label_errors = read_labels(label_path_for(path), num_classes)
+            labels.append(split_labels)
+            errors.extend(label_errors)
+        split_items[split] = (image_paths, labels)
+
+    if errors:
+        for error in errors[:20]:
+            print(f"❌ {error}")
+        if len(errors) > 20:
+            print(f"... 另有 {len(errors) - 20} 处错误")
+        raise ValueError(f"标注文件校验失败：共 {len(errors)} 处错误")
+
+    caches = {}
+    for split, (image_paths, labels) in split_items.items():
+        start_time = time.time()
+        split_dir = os.path.join(cache_dir, f"{split}_{imgsz}")
+        reused, processed = build_split_cache(image_paths, split_dir, imgsz, workers)
+        caches[split] = DatasetCache(split_dir)
+        print(f"📦 {split}: {len(image_paths)} 张图像，{int(sum(len(l) for l in labels))} 个标注 | "
+              f"复用 {reused}，新处理 {processed} | 耗时 {time.time() - start_time:.1f} 秒 | {split_dir}")
+    return caches
+
+
+def make_cached_trainer(caches):
+    """返回从缓存读取图像的 ultralytics DetectionTrainer 子类（传给 model.train(trainer=...)）"""
+    from cached_training import CachedDetectionTrainer
+
+    split_caches = list(caches.values())
+
+    class Trainer(CachedDetectionTrainer):
+        caches = split_caches
+
+    return Trainer
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="校验标注并预处理训练数据集缓存")
+    parser.add_argument("data", nargs="?", default="hand_gesture_data.yaml", help="数据配置文件")
+    parser.add_argument("--imgsz", type=int, default=640, help="训练输入尺寸")
+    parser.add_argument("--cache-dir", default=None, help="缓存目录（默认为数据配置文件旁的 .dataset_cache）")
+    parser.add_argument("--workers", type=int, default=None, help="预处理进程数（默认CPU核心数）")
+    args = parser.parse_args()
+
+    try:
+        prepare_dataset(args.data, args.imgsz, args.cache_dir, args.workers)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    print("✅ 数据集缓存已就绪")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from inference_server import remove_stale_socket, socket_identity
+
+"""
+无界面手势识别服务
+基于 asyncio：采集和推理在单独的线程中串行执行（等待新帧而不是 sleep），事件循环只负责网络I/O，
+每帧的识别结果以JSON行的形式推送给所有订阅者（Unix socket，不支持时使用TCP；可选 WebSocket）。
+每个订阅者有独立的有界队列，读取慢的订阅者只会丢弃自己最旧的消息，不会拖慢识别或其他订阅者
+"""
+
+DEFAULT_SOCKET = "/tmp/hand_gesture.sock"
+
+
+class ServiceClient:
+    """一个订阅者的消息队列"""
+
+    def __init__(self, queue_size=32):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        # 连接处理结束后设置
+        self.done = asyncio.Event()
+
+    def put(self, message):
+        """放入消息，队列满时丢弃最旧的消息"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    def close(self):
+        """放入结束标记，发送完队列中的消息后断开连接"""
+        self.put(None)
+
+
+class GestureService:
+    def __init__(self, recognizer, socket_path=DEFAULT_SOCKET, host="127.0.0.1", port=8765,
+                 websocket_port=None, client_queue_size=32):
+        """recognizer 为 HandGestureRecognizer；socket_path 为 None 或平台不支持 Unix socket 时监听 host:port"""
+        self.recognizer = recognizer
+        self.socket_path = socket_path
+        self.host = host
+        self.port = port
+        self.websocket_port = websocket_port
+        self.client_queue_size = client_queue_size
+
+        self.clients = set()
+        self.published = 0
+        # 本服务创建的 socket 文件的 (设备号, inode)
+        self.socket_id = None
+        # 推理在单独的线程中串行执行，模型实例不会被并发调用
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+
+    def process_next(self):
+        """（推理线程）读取各视频源的最新帧并检测，返回要推送的消息列表；所有视频源结束时返回 None"""
+        recognizer = self.recognizer
+        with recognizer.metrics.time("capture"):
+            frames = recognizer.read_frames(timeout=1.0)
+        if not frames:
+            # 等待超时但视频源仍在运行时返回空列表，继续等待
+            return [] if any(cap.isOpened() for cap in recognizer.captures) else None
+        frames = recognizer.mirror_frames(frames)
+        process_start = time.perf_counter()
+
+        with recognizer.metrics.time("preprocess"):
+            processed_frames = [(index, recognizer.preprocess_frame(frame)) for index, frame in frames]
+        batch_detections = recognizer.detect_frames(processed_frames)
+        recognizer.record_frames(frames, batch_detections)
+
+        recognizer.metrics.set_dropped_frames(sum(cap.dropped_frames for cap in recognizer.captures))
+        recognizer.fps = recognizer.metrics.frame_done()
+        recognizer.report_startup()
+        recognizer.adapt(time.perf_counter() - process_start)
+
+        timestamp = time.time()
+        messages = []
+        for (index, _), detections in zip(frames, batch_detections):
+            messages.append(json.dumps({
+                "source": index,
+                "source_name": str(recognizer.sources[index]),
+                "timestamp": round(timestamp, 3),
+                "fps": round(recognizer.fps, 1),
+                "detections": detections
+            }, ensure_ascii=False) + "\n")
+        return messages
+
+    def publish(self, message):
+        for client in list(self.clients):
+            client.put(message)
+        self.published += 1
+
+    async def handle_stream(self, reader, writer):
+        """Unix socket / TCP 订阅者：逐行写入JSON消息，drain 等待对端读取（反压只作用于该订阅者）"""
+        client = ServiceClient(self.client_queue_size)
+        self.clients.add(client)
+        try:
+            while True:
+                message = await client.queue.get()
+                if message is None:
+                    break
+                writer.write(message.encode("utf-8"))
+                await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.clients.discard(client)
+            writer.close()
+            client.done.set()
+
+    async def handle_websocket(self, websocket, path=None):
+        """WebSocket 订阅者：每条消息为一帧的JSON"""
+        client = ServiceClient(self.client_queue_size)
+        self.clients.add(client)
+        try:
+            while True:
+                message = await client.queue.get()
+                if message is None:
+                    break
+                await websocket.send(message.rstrip("\n"))
+        except Exception:
+            # 连接关闭
+            pass
+        finally:
+            self.clients.discard(client)
+            client.done.set()
+
+    async def start_servers(self):
+        """启动 Unix socket（或TCP）及可选的 WebSocket 服务，返回服务器列表"""
+        servers = []
+        if self.socket_path and hasattr(asyncio, "start_unix_server"):
+            # 只删除残留的 socket 文件，已有服务在运行或不是 socket 时抛出 RuntimeError
+            remove_stale_socket(self.socket_path)
+            servers.append(await asyncio.start_unix_server(self.handle_stream, path=self.socket_path))
+            self.socket_id = socket_identity(self.socket_path)
+            print(f"📡 结果推送: unix://{self.socket_path}")
+        else:
+            servers.append(await asyncio.start_server(self.handle_stream, self.host, self.port))
+            print(f"📡 结果推送: tcp://{self.host}:{self.port}")
+
+        if self.websocket_port:
+            try:
+                import websockets
+            except ImportError:
+                print("⚠️  未安装 websockets，WebSocket 推送不可用（pip install websockets）")
+            else:
+                servers.append(await websockets.serve(self.handle_websocket, self.host, self.websocket_port))
+                print(f"📡 WebSocket 推送: ws://{self.host}:{self.websocket_port}")
+        return servers
+
+    async def run(self):
+        """运行服务，直到所有视频源结束"""
+        loop = asyncio.get_running_loop()
+        servers = await self.start_servers()
+        try:
+            while True:
+                messages = await loop.run_in_executor(self.executor, self.process_next)
+                if messages is None:
+                    print("无法读取摄像头帧")
+                    break
+                for message in messages:
+                    self.publish(message)
+        finally:
+            # 停止接受新连接，通知已连接的订阅者发送完剩余消息后断开
+            for server in servers:
+                server.close()
+            clients = list(self.clients)
+            for client in clients:
+                client.close()
+            if clients:
+                await asyncio.wait([asyncio.ensure_future(client.done.wait()) for client in clients], timeout=2.0)
+            for server in servers:
+                await server.wait_closed()
+            if self.socket_id is not None and socket_identity(self.socket_path) == self.socket_id:
+                os.remove(self.socket_path)
+
+    def serve(self):
+        """阻塞运行服务，Ctrl+C 退出后释放资源"""
+        print("实时手势识别服务已启动（无界面模式）")
+        print("💡 按 Ctrl+C 退出")
+        print()
+        try:
+            asyncio.run(self.run())
+        except RuntimeError as e:
+            print(f"❌ {e}")
+        except KeyboardInterrupt:
+            print()
+            print("🔄 正在退出服务...")
+        finally:
+            self.executor.shutdown(wait=True)
+            self.recognizer.release()
+        print(f"📊 共推送 {self.published} 条结果")
+        self.recognizer.print_tracking_stats()
+        if self.recognizer.adaptive is not None:
+            self.recognizer.adaptive.print_stats()
+        print("✅ 实时手势识别服务已关闭")
+
+
+async def subscribe(socket_path=DEFAULT_SOCKET, host="127.0.0.1", port=8765):
+    """订阅识别结果，逐条生成解析后的消息字典"""
+    if socket_path and hasattr(asyncio, "open_unix_connection"):
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            yield json.loads(line)
+    finally:
+        writer.close()
+
+
+def main():
+    """订阅识别服务并在终端输出结果（服务端使用 hand_gesture_recognition.py --serve 启动）"""
+    parser = argparse.ArgumentParser(description="订阅手势识别服务的结果")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="服务的 Unix socket 路径（为空时使用TCP）")
+    parser.add_argument("--host", default="127.0.0.1", help="TCP 地址")
+    parser.add_argument("--port", type=int, default=8765, help="TCP 端口")
+    args = parser.parse_args()
+
+    async def print_results():
+        async for message in subscribe(args.socket or None, args.host, args.port):
+            gestures = [f"{d['gesture']} ({d['confidence']:.2f})" for d in message["detections"]]
+            print(f"[{time.strftime('%H:%M:%S', time.localtime(message['timestamp']))}] "
+                  f"[{message['source']}] FPS: {message['fps']:.1f} | "
+                  f"{', '.join(gestures) if gestures else '未检测到手势'}")
+
+    try:
+        asyncio.run(print_results())
+    except KeyboardInterrupt:
+        pass
+    except (ConnectionError, FileNotFoundError) as e:
+        print(f"❌ 无法连接识别服务: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import time
+
+import cv2
+import numpy as np
+
+"""
+手势状态机
+对逐帧的识别结果做去抖：同一手势连续出现 stable_frames 次后才确认，并产生一次手势事件；
+手势稳定后降低昂贵识别器的运行频率（每 stable_interval 帧运行一次），中间帧沿用上次结果，
+一旦画面发生变化（缩略图平均灰度差超过阈值）或手势改变，立即恢复每帧识别
+"""
+
+
+def make_thumbnail(frame, size=(32, 24)):
+    """缩小后的灰度缩略图（float32），用于低开销地比较画面变化"""
+    small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return small.astype(np.float32)
+
+
+class GestureStateMachine:
+    def __init__(self, stable_frames=5, stable_interval=2, change_threshold=8.0, thumbnail_size=(32, 24)):
+        """stable_frames 为确认手势所需的连续帧数，stable_interval 为手势稳定后识别器的运行间隔（帧），
+        change_threshold 为判定画面变化的缩略图平均灰度差（0~255）"""
+        self.stable_frames = max(int(stable_frames), 1)
+        self.stable_interval = max(int(stable_interval), 1)
+        self.change_threshold = change_threshold
+        self.thumbnail_size = thumbnail_size
+
+        # 去抖状态：上一次识别到的手势及其连续出现的次数
+        self.prev_gesture = None
+        self.gesture_count = 0
+        # 已确认（去抖后）的手势
+        self.stable_gesture = None
+
+        # 最近一次运行识别器时的缩略图，以及之后经过的帧数
+        self.reference = None
+        self.frames_since_run = 0
+
+        # 统计信息
+        self.recognized_frames = 0
+        self.skipped_frames = 0
+
+    @property
+    def is_stable(self):
+        """当前手势是否已稳定"""
+        return self.gesture_count >= self.stable_frames
+
+    def should_run(self, frame):
+        """判断当前帧是否需要运行识别器；返回 False 时调用方应沿用上一次的识别结果"""
+        if self.reference is None or not self.is_stable or self.stable_interval <= 1:
+            return True
+        if self.frames_since_run + 1 >= self.stable_interval:
+            return True
+
+        # 画面发生变化时立即恢复识别
+        difference = cv2.absdiff(make_thumbnail(frame, self.thumbnail_size), self.reference).mean()
+        if difference > self.change_threshold:
+            return True
+
+        self.frames_since_run += 1
+        self.skipped_frames += 1
+        return False
+
+    def update(self, frame, gesture):
+        """用识别器的结果（手势名称，没有手时为 None）更新状态，手势确认或消失时返回事件字典，否则返回 None"""
+        self.reference = make_thumbnail(frame, self.thumbnail_size)
+        self.frames_since_run = 0
+        self.recognized_frames += 1
+
+        if gesture == self.prev_gesture:
+            self.gesture_count += 1
+        else:
+            self.prev_gesture = gesture
+            self.gesture_count = 1
+
+        if self.gesture_count == self.stable_frames and gesture != self.stable_gesture:
+            event = {"gesture": gesture, "previous": self.stable_gesture, "timestamp": time.time()}
+            self.stable_gesture = gesture
+            return event
+        return None
+
+    def print_stats(self):
+        """打印识别器实际运行和跳过的帧数"""
+        total = self.recognized_frames + self.skipped_frames
+        if total:
+            print(f"📊 识别器运行 {self.recognized_frames}/{total} 帧，手势稳定时跳过 {self.skipped_frames} 帧"
+                  f"（{self.skipped_frames / total:.1%}）")
+
+
+def print_gesture_event(event):
+    """在终端输出去抖后的手势事件"""
+    timestamp = time.strftime("%H:%M:%S", time.localtime(event["timestamp"]))
+    if event["gesture"] is None:
+        print(f"[{timestamp}] ✋ 手势结束（{event['previous']}）")
+    else:
+        print(f"[{timestamp}] 👉 手势: {event['gesture']}")
@@ -0,0 +1,125 @@
+import cv2
+import numpy as np
+
+"""
+检测+跟踪模式
+每 N 帧运行一次完整的检测器，中间的帧用金字塔LK光流跟踪边界框内的特征点，
+按特征点的中值位移平移边界框，并沿用上一次检测到的手势类别；
+跟踪置信度（成功跟踪的特征点比例）过低时提前运行检测器
+"""
+
+
+class GestureTracker:
+    def __init__(self, detect_interval=5, min_confidence=0.5, max_points=40, min_points=4):
+        """detect_interval 为检测器运行间隔（帧），min_confidence 为跟踪置信度下限"""
+        self.detect_interval = max(int(detect_interval), 1)
+        self.min_confidence = min_confidence
+        self.max_points = max_points
+        self.min_points = min_points
+
+        # 光流参数
+        self.lk_params = dict(winSize=(15, 15), maxLevel=2,
+                              criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+        # 跟踪状态：每个目标为 {"detection": 检测结果, "points": 特征点, "initial_points": 初始特征点数}
+        self.prev_gray = None
+        self.tracks = []
+        self.confidence = 0.0
+        self.frames_since_detection = 0
+
+        # 统计信息
+        self.detector_frames = 0
+        self.tracked_frames = 0
+
+    @property
+    def detector_ratio(self):
+        """运行检测器的帧占总帧数的比例"""
+        total = self.detector_frames + self.tracked_frames
+        return self.detector_frames / total if total else 0.0
+
+    def due_for_detection(self):
+        """是否到了按间隔运行检测器的时候"""
+        return self.prev_gray is None or self.frames_since_detection >= self.detect_interval - 1
+
+    def reset(self, frame, detections):
+        """用检测器的结果重新初始化跟踪目标"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        h, w = gray.shape
+
+        self.tracks = []
+        for detection in detections:
+            x1, y1, x2, y2 = detection["bbox"]
+            x1, y1 = max(x1, 0), max(y1, 0)
+            x2, y2 = min(x2, w), min(y2, h)
+            points = None
+            if x2 > x1 and y2 > y1:
+                # 只在边界框内提取特征点
+                mask = np.zeros_like(gray)
+                mask[y1:y2, x1:x2] = 255
+                points = cv2.goodFeaturesToTrack(gray, self.max_points, 0.01, 5, mask=mask)
+            if points is None:
+                points = np.empty((0, 1, 2), dtype=np.float32)
+            self.tracks.append({
+                "detection": dict(detection),
+                "points": points,
+                "initial_points": max(len(points), 1)
+            })
+
+        self.prev_gray = gray
+        self.confidence = 1.0
+        self.frames_since_detection = 0
+        self.detector_frames += 1
+
+    def track(self, frame):
+        """用光流把上一帧的边界框传播到当前帧
+
+        返回跟踪后的检测结果列表；跟踪置信度低于下限时返回 None，此时应运行检测器
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.prev_gray is not None and gray.shape != self.prev_gray.shape:
+            # 分辨率已改变（如自适应切换档位），无法跟踪，改为运行检测器
+            return None
+
+        if self.tracks:
+            prev_points = np.concatenate([track["points"] for track in self.tracks])
+            if len(prev_points) == 0:
+                self.confidence = 0.0
+                return None
+
+            # 前向-后向光流，过滤掉跟踪不可靠的点
+            next_points, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, prev_points, None,
+                                                              **self.lk_params)
+            back_points, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self.prev_gray, next_points, None,
+                                                                   **self.lk_params)
+            fb_error = np.linalg.norm((prev_points - back_points).reshape(-1, 2), axis=1)
+            good = (status.ravel() == 1) & (back_status.ravel() == 1) & (fb_error < 1.0)
+
+            confidences = []
+            start = 0
+            for track in self.tracks:
+                count = len(track["points"])
+                track_good = good[start:start + count]
+                old = track["points"][track_good].reshape(-1, 2)
+                new = next_points[start:start + count][track_good].reshape(-1, 2)
+                start += count
+
+                if len(new) < self.min_points:
+                    confidences.append(0.0)
+                    continue
+
+                # 按特征点位移的中值平移边界框
+                dx, dy = np.median(new - old, axis=0)
+                x1, y1, x2, y2 = track["detection"]["bbox"]
+                track["detection"]["bbox"] = [int(round(x1 + dx)), int(round(y1 + dy)),
+                                              int(round(x2 + dx)), int(round(y2 + dy))]
+                track["points"] = new.reshape(-1, 1, 2)
+                confidences.append(len(new) / track["initial_points"])
+
+            self.confidence = min(confidences)
+            if self.confidence < self.min_confidence:
+                return None
+
+        self.prev_gray = gray
+        self.frames_since_detection += 1
+        self.tracked_frames += 1
+        return [dict(track["detection"]) for track in self.tracks]
@@ -1,8 +1,25 @@
+# 最先导入：启动时间线以此为起点
+from startup import PROCESS_START, BackgroundTask, StartupTimeline
+import argparse
+import copy
+import os
 import cv2
 import numpy as np
-from ultralytics import YOLO
 import time
-from PIL import Image, ImageDraw, ImageFont
+from PIL import ImageFont
+from threaded_capture import open_capture
+from text_renderer import GlyphAtlasRenderer
+from pipeline import Pipeline
+from gesture_tracker import GestureTracker
+from motion_gate import MotionGate
+from capture_config import CaptureConfig, add_capture_arguments
+from gesture_service import DEFAULT_SOCKET, GestureService
+from metrics import FrameMetrics, add_metrics_arguments, print_summary, start_exporters
+from session_recorder import SessionRecorder, session_path
+from adaptive_controller import add_adaptive_arguments, controller_from_args
+
+# 模块导入完成的时刻（ultralytics/torch 不在这里导入，见 load_model）
+IMPORTS_DONE = time.perf_counter()
 
 # 手势类别映射
 gesture_classes = {
@@ -16,94 +33,334 @@ gesture_classes = {
     7: "布"
 }
 
-# 加载中文字体
-try:
-    # 尝试加载Windows系统字体
-    FONT_PATH = "C:/Windows/Fonts/simhei.ttf"  # 黑体
-    FONT = ImageFont.truetype(FONT_PATH, 24)
-    print(f"✅ 成功加载中文字体: {FONT_PATH}")
-except Exception as e:
-    print(f"❌ 无法加载指定字体: {e}")
-    print("💡 尝试使用默认字体")
-    FONT = ImageFont.load_default()
+# 文字渲染器在第一次使用时才加载字体（导入模块时不读取字体文件）
+_text_renderer = None
+
+def get_text_renderer():
+    """加载中文字体，返回预先光栅化了手势名称的文字渲染器"""
+    global _text_renderer
+    if _text_renderer is None:
+        try:
+            # 尝试加载Windows系统字体
+            font_path = "C:/Windows/Fonts/simhei.ttf"  # 黑体
+            font = ImageFont.truetype(font_path, 24)
+            print(f"✅ 成功加载中文字体: {font_path}")
+        except Exception as e:
+            print(f"❌ 无法加载指定字体: {e}")
+            print("💡 尝试使用默认字体")
+            font = ImageFont.load_default()
+        _text_renderer = GlyphAtlasRenderer(font, preload=gesture_classes.values())
+    return _text_renderer
+
+def load_model(model_path=None):
+    """加载YOLO模型；ultralytics（以及 torch）在这里才导入，可以放在后台线程中与打开摄像头同时进行"""
+    from ultralytics import YOLO
+    # model_path 可以是 .pt 模型，也可以是 model_export.py 导出的 .onnx 文件或 OpenVINO 模型目录
+    if model_path:
+        return YOLO(model_path, task="detect")
+    # 使用预训练模型，后续可以替换为自定义训练的模型
+    if not os.path.exists('yolov8n.pt'):
+        print("💡 当前目录没有 yolov8n.pt，首次运行需要下载模型")
+    return YOLO('yolov8n.pt')
 
 class HandGestureRecognizer:
-    def __init__(self, model_path=None):
-        # 加载YOLOv8模型
-        if model_path:
-            self.model = YOLO(model_path)
-        else:
-            # 使用预训练模型，后续可以替换为自定义训练的模型
-            self.model = YOLO('yolov8n.pt')
-        
-        # 打开摄像头
-        self.cap = cv2.VideoCapture(0)
-        if not self.cap.isOpened():
-            raise Exception("无法打开摄像头")
-        
-        # 设置摄像头分辨率
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        
-        # 用于计算帧率
-        self.prev_time = 0
+    def __init__(self, model_path=None, sources=(0,), track_interval=0, track_min_confidence=0.5,
+                 target_fps=None, capture_config=None, motion_threshold=None, motion_refresh=30,
+                 record_path=None, record_interval=1, warmup=True, timeline=None, adaptive=None):
+        """warmup 为 True 时在处理第一帧之前用空白帧预热模型；timeline 为记录各启动阶段耗时的 StartupTimeline；
+        adaptive 为 AdaptiveController 时根据处理耗时自动切换采集分辨率和模型输入尺寸"""
+        self.timeline = timeline if timeline is not None else StartupTimeline()
+        self.startup_reported = False
+        
+        # 模型输入尺寸（自适应模式下由控制器调整）；自适应模式从控制器的初始档位开始采集
+        self.imgsz = 320
+        self.adaptive = adaptive
+        if adaptive is not None:
+            width, height, self.imgsz = adaptive.current()
+            capture_config = copy.copy(capture_config) if capture_config is not None else CaptureConfig()
+            capture_config.width, capture_config.height = width, height
+        
+        # 在后台线程中加载YOLOv8模型（所有视频源共享同一个模型实例），同时打开视频源
+        model_task = BackgroundTask(load_model, model_path, name="加载模型", timeline=self.timeline)
+        
+        # 打开视频源（摄像头索引、视频文件或流地址），每个视频源一个后台采集线程
+        # sources 为 None 或空列表时不打开任何视频源；也可以直接传入 FixtureCapture 等采集对象
+        self.sources = list(sources) if sources else []
+        with self.timeline.phase("打开视频源"):
+            self.captures = [open_capture(source, width=640, height=480, config=capture_config)
+                             for source in self.sources]
+        
+        # 模型加载期间顺便加载字体
+        with self.timeline.phase("加载字体"):
+            get_text_renderer()
+        
+        with self.timeline.phase("等待模型"):
+            try:
+                self.model = model_task.result()
+            except Exception:
+                # 模型加载失败时关闭已打开的视频源
+                for cap in self.captures:
+                    cap.release()
+                raise
+        
+        # 预热：模型初始化、内存分配等一次性开销发生在第一帧真实画面之前
+        if warmup:
+            with self.timeline.phase("模型预热"):
+                self.warmup(capture_config)
+        
+        # 第一个视频源，兼容单摄像头用法
+        self.cap = self.captures[0] if self.captures else None
+        
+        # 跟踪模式：每 track_interval 帧运行一次检测器，中间帧用光流跟踪边界框（每个视频源一个跟踪器）
+        self.trackers = None
+        if track_interval > 1:
+            self.trackers = [GestureTracker(track_interval, track_min_confidence) for _ in self.sources]
+        
+        # 运动门控：画面中变化像素比例低于 motion_threshold 时跳过检测，沿用该视频源上一次的结果，
+        # 每 motion_refresh 帧强制检测一次（每个视频源一个门控）
+        self.motion_gates = None
+        if motion_threshold is not None:
+            self.motion_gates = [MotionGate(motion_threshold, motion_refresh) for _ in self.sources]
+        self.last_detections = [[] for _ in self.sources]
+        self.detector_ran = False
+        
+        # 会话录制（可选）：每个视频源一个后台录制器，录制原始帧、检测框和时间戳
+        self.recorders = None
+        if record_path:
+            fps = capture_config.fps if capture_config is not None and capture_config.fps else 30.0
+            self.recorders = [SessionRecorder(session_path(record_path, i, len(self.sources)), fps, record_interval,
+                                              source=source)
+                              for i, source in enumerate(self.sources)]
+        
+        # 各阶段延迟指标和平滑帧率（target_fps 为告警用的目标帧率）
+        self.metrics = FrameMetrics(target_fps=target_fps)
         self.fps = 0
     
+    def warmup(self, capture_config=None):
+        """用与实际画面尺寸相同的空白帧做一次批量推理（批大小为视频源数）"""
+        width = capture_config.width if capture_config is not None and capture_config.width else 640
+        height = capture_config.height if capture_config is not None and capture_config.height else 480
+        self.detect_gestures([np.zeros((height, width, 3), dtype=np.uint8)] * max(len(self.sources), 1))
+    
+    def adapt(self, latency):
+        """自适应模式下记录一帧的处理耗时（秒），控制器决定切换档位时应用新的分辨率和输入尺寸
+        
+        只统计运行了检测器的帧：运动门控跳过或光流跟踪的帧耗时很短，计入后会高估处理能力而不断升档
+        """
+        if self.adaptive is None or not self.detector_ran:
+            return
+        level = self.adaptive.update(latency)
+        if level is None:
+            return
+        width, height, self.imgsz = level
+        for cap in self.captures:
+            if hasattr(cap, "set_resolution"):
+                cap.set_resolution(width, height)
+        # 分辨率改变后，沿用的旧检测框坐标不再有效：清空上次结果，运动门控和跟踪器下一帧强制检测
+        self.last_detections = [[] for _ in self.sources]
+        if self.motion_gates is not None:
+            for gate in self.motion_gates:
+                gate.reference = None
+        if self.trackers is not None:
+            for tracker in self.trackers:
+                tracker.prev_gray = None
+        # 新的输入尺寸预热一次，切换后的第一帧不承担初始化开销
+        self.detect_gestures([np.zeros((height, width, 3), dtype=np.uint8)] * max(len(self.sources), 1))
+    
+    def report_startup(self):
+        """第一帧识别完成后输出一次启动时间线"""
+        if self.startup_reported:
+            return
+        self.startup_reported = True
+        self.timeline.mark("首帧识别完成")
+        self.timeline.print_report()
+    
     def preprocess_frame(self, frame):
         """预处理帧图像"""
         # YOLOv8会自动处理图像，这里可以添加额外的预处理步骤
         return frame
     
-    def detect_gestures(self, frame):
-        """检测手势"""
+    def read_frames(self, timeout=5.0):
+        """从每个视频源获取最新帧，返回 [(视频源序号, 帧), ...]"""
+        deadline = time.time() + timeout
+        while True:
+            frames = []
+            for index, cap in enumerate(self.captures):
+                item = cap.read_latest(timeout=0)
+                if item is not None:
+                    frames.append((index, item[0]))
+            
+            # 至少有一个视频源有新帧，或所有视频源都已结束，或等待超时
+            running = [cap for cap in self.captures if cap.isOpened()]
+            if frames or not running or time.time() >= deadline:
+                return frames
+            
+            # 等待任意视频源产生新帧后重新检查
+            running[0].wait(timeout=0.01)
+    
+    def mirror_frames(self, frames):
+        """镜像翻转摄像头帧（视频文件和流地址保持原样）"""
+        return [(index, cv2.flip(frame, 1) if isinstance(self.sources[index], int) else frame)
+                for index, frame in frames]
+    
+    def window_name(self, index):
+        """视频源对应的窗口标题，多个视频源时带上视频源编号"""
+        if len(self.sources) > 1:
+            return f"实时手势识别 [{index}] {self.sources[index]}"
+        return "实时手势识别"
+    
+    def detect_gestures(self, frame, imgsz=None):
+        """检测手势，frame 可以是单帧或帧列表（列表时一次批量推理，每帧返回一个结果）；
+        imgsz 为推理输入尺寸，默认使用 self.imgsz（级联模式下对小裁剪区域使用更小的尺寸）"""
         # 调整YOLOv8模型参数，提高识别准确率
         # conf: 置信度阈值，提高到0.6减少误检
         # iou: IOU阈值，控制重叠检测框的合并
-        # imgsz: 输入图像大小，调整为320x320提高速度
+        # imgsz: 输入图像大小，默认320x320平衡速度和准确率（自适应模式下随档位变化）
         results = self.model(frame, 
                            conf=0.6,  # 提高置信度阈值，减少误检
                            iou=0.5,   # IOU阈值，控制重叠检测框
-                           imgsz=320, # 输入图像大小，平衡速度和准确率
+                           imgsz=imgsz or self.imgsz,
                            verbose=False)
         return results
     
-    def draw_results(self, frame, results):
-        """在帧上绘制检测结果"""
-        # 将OpenCV图像转换为PIL图像，用于绘制中文
-        pil_img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-        draw = ImageDraw.Draw(pil_img)
+    def detect_frames(self, frames):
+        """检测一批帧 [(视频源序号, 帧), ...]，返回每帧的检测结果列表
+        
+        启用运动门控时，画面静止的视频源不运行检测器，直接沿用上一次的结果
+        """
+        # 本次是否运行了检测器（自适应档位只统计这些帧的耗时）
+        self.detector_ran = False
+        if self.motion_gates is None:
+            return self._detect_or_track(frames)
+        
+        detections = [None] * len(frames)
+        active = []
+        for i, (index, frame) in enumerate(frames):
+            if self.motion_gates[index].should_process(frame):
+                active.append(i)
+            else:
+                detections[i] = [dict(d) for d in self.last_detections[index]]
+        
+        if active:
+            for i, result in zip(active, self._detect_or_track([frames[i] for i in active])):
+                detections[i] = result
+                self.last_detections[frames[i][0]] = result
+        return detections
+    
+    def _detect_or_track(self, frames):
+        """未启用跟踪模式时所有帧一次批量推理；启用跟踪模式时只有到达检测间隔
+        或跟踪置信度过低的帧才运行检测器，其余帧沿用上次的手势类别并用光流跟踪边界框
+        """
+        if self.trackers is None:
+            self.detector_ran = True
+            with self.metrics.time("inference"):
+                batch_results = self.detect_gestures([frame for _, frame in frames])
+            with self.metrics.time("postprocess"):
+                return [self.parse_results([result]) for result in batch_results]
+        
+        detections = [None] * len(frames)
+        to_detect = []
+        batch_results = []
+        # 光流跟踪代替了这些帧的推理，一起计入推理阶段
+        with self.metrics.time("inference"):
+            for i, (index, frame) in enumerate(frames):
+                tracker = self.trackers[index]
+                if tracker.due_for_detection():
+                    to_detect.append(i)
+                    continue
+                tracked = tracker.track(frame)
+                if tracked is None:
+                    # 跟踪置信度过低，改为运行检测器
+                    to_detect.append(i)
+                else:
+                    detections[i] = tracked
+            
+            if to_detect:
+                self.detector_ran = True
+                batch_results = self.detect_gestures([frames[i][1] for i in to_detect])
+        
+        with self.metrics.time("postprocess"):
+            for i, result in zip(to_detect, batch_results):
+                index, frame = frames[i]
+                detections[i] = self.parse_results([result])
+                self.trackers[index].reset(frame, detections[i])
         
-        # 解析检测结果
+        return detections
+    
+    def record_frames(self, frames, batch_detections):
+        """录制模式下把各视频源的原始帧（绘制前）和检测结果交给后台录制器"""
+        if self.recorders is None:
+            return
+        with self.metrics.time("record"):
+            timestamp = time.time()
+            for (index, frame), detections in zip(frames, batch_detections):
+                self.recorders[index].record(frame, timestamp, detections=detections)
+    
+    def release(self):
+        """释放视频源和录制器"""
+        for cap in self.captures:
+            cap.release()
+        if self.recorders is not None:
+            for recorder in self.recorders:
+                recorder.close()
+            self.recorders = None
+    
+    def print_tracking_stats(self):
+        """打印跟踪模式下检测器帧的占比，以及运动门控跳过的帧数"""
+        if self.motion_gates is not None:
+            for index, gate in enumerate(self.motion_gates):
+                gate.print_stats(f"[{index}] ")
+        if self.trackers is None:
+            return
+        for index, tracker in enumerate(self.trackers):
+            total = tracker.detector_frames + tracker.tracked_frames
+            print(f"📊 [{index}] 检测器帧 {tracker.detector_frames}/{total}（{tracker.detector_ratio:.1%}），"
+                  f"其余帧使用光流跟踪")
+    
+    def parse_results(self, results):
+        """将检测结果转换为字典列表，每个字典包含类别、手势名称、置信度和边界框"""
+        detections = []
         for result in results:
             boxes = result.boxes
             for box in boxes:
-                # 获取边界框坐标
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                # 获取置信度
-                conf = float(box.conf[0])
-                # 获取类别
                 cls = int(box.cls[0])
-                
-                # 检查类别是否在手势映射中
                 if cls in gesture_classes:
-                    gesture_name = gesture_classes[cls]
-                    # 绘制边界框
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                    # 绘制类别名称和置信度（使用PIL绘制中文）
-                    label = f"{gesture_name}: {conf:.2f}"
-                    
-                    # 将PIL图像转换回OpenCV图像，绘制中文
-                    pil_img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-                    draw = ImageDraw.Draw(pil_img)
-                    draw.text((x1, y1 - 30), label, font=FONT, fill=(0, 255, 0))
-                    frame = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
-        
-        # 绘制帧率（使用PIL绘制中文）
-        pil_img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-        draw = ImageDraw.Draw(pil_img)
+                    x1, y1, x2, y2 = map(int, box.xyxy[0])
+                    detections.append({
+                        "class_id": cls,
+                        "gesture": gesture_classes[cls],
+                        "confidence": float(box.conf[0]),
+                        "bbox": [x1, y1, x2, y2]
+                    })
+        return detections
+    
+    def process_frames(self, frames):
+        """无界面批量处理：一次批量推理，返回每帧的检测结果列表"""
+        processed_frames = [self.preprocess_frame(frame) for frame in frames]
+        batch_results = self.detect_gestures(processed_frames)
+        return [self.parse_results([result]) for result in batch_results]
+    
+    def process_frame(self, frame):
+        """无界面处理单帧，返回检测结果列表"""
+        return self.process_frames([frame])[0]
+    
+    def draw_results(self, frame, results):
+        """在帧上绘制检测结果"""
+        return self.draw_detections(frame, self.parse_results(results))
+    
+    def draw_detections(self, frame, detections):
+        """在帧上绘制检测结果字典列表（见 parse_results）"""
+        for detection in detections:
+            x1, y1, x2, y2 = detection["bbox"]
+            # 绘制边界框
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            # 绘制类别名称和置信度（使用缓存的文字掩码绘制中文）
+            label = f"{detection['gesture']}: {detection['confidence']:.2f}"
+            get_text_renderer().draw_text(frame, label, (x1, y1 - 30), (0, 255, 0))
+        
+        # 绘制帧率
         fps_text = f"FPS: {self.fps:.1f}"
-        draw.text((10, 10), fps_text, font=FONT, fill=(0, 255, 0))
-        frame = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
+        get_text_renderer().draw_text(frame, fps_text, (10, 10), (0, 255, 0))
         
         return frame
     
@@ -118,64 +375,82 @@ class HandGestureRecognizer:
         # 窗口可用性标志
         window_available = True
         
-        while True:
+        # 是否按下退出键
+        quit_requested = False
+        
+        # 终端输出模式下上一次输出结果的时间（限制输出频率，但不限制识别速度）
+        last_print = 0.0
+        
+        while not quit_requested:
             try:
-                # 读取帧
-                ret, frame = self.cap.read()
-                if not ret:
+                # 读取每个视频源的最新帧
+                with self.metrics.time("capture"):
+                    frames = self.read_frames()
+                    if frames:
+                        # 镜像翻转摄像头帧（视频文件和流地址保持原样）
+                        frames = self.mirror_frames(frames)
+                if not frames:
                     print("无法读取摄像头帧")
                     break
-                
-                # 镜像翻转帧
-                frame = cv2.flip(frame, 1)
+                # 处理耗时（不含等待摄像头的时间），供自适应档位控制使用
+                process_start = time.perf_counter()
                 
                 # 预处理帧
-                processed_frame = self.preprocess_frame(frame)
+                with self.metrics.time("preprocess"):
+                    processed_frames = [(index, self.preprocess_frame(frame)) for index, frame in frames]
                 
-                # 检测手势
-                results = self.detect_gestures(processed_frame)
+                # 检测手势（所有视频源的帧一次批量推理，跟踪模式下只检测需要的帧）
+                batch_detections = self.detect_frames(processed_frames)
                 
-                # 计算帧率
-                current_time = time.time()
-                self.fps = 1 / (current_time - self.prev_time) if (current_time - self.prev_time) > 0 else 0
-                self.prev_time = current_time
+                # 录制会话（在绘制之前）
+                self.record_frames(frames, batch_detections)
                 
                 # 绘制结果
-                output_frame = self.draw_results(frame, results)
+                with self.metrics.time("render"):
+                    output_frames = [self.draw_detections(frame, detections)
+                                     for (_, frame), detections in zip(frames, batch_detections)]
                 
-                # 提取识别结果（用于终端输出）
-                detected_gestures = []
-                for result in results:
-                    boxes = result.boxes
-                    for box in boxes:
-                        conf = float(box.conf[0])
-                        cls = int(box.cls[0])
-                        if cls in gesture_classes:
-                            gesture_name = gesture_classes[cls]
-                            detected_gestures.append(f"{gesture_name} ({conf:.2f})")
+                display_start = time.perf_counter()
+                print_due = not window_available and display_start - last_print >= 0.1
                 
-                # 尝试显示帧
-                if window_available:
-                    try:
-                        cv2.imshow("实时手势识别", output_frame)
-                        # 按 'q' 键退出
-                        if cv2.waitKey(1) & 0xFF == ord('q'):
-                            break
-                    except Exception as e:
-                        # 窗口显示失败，切换到终端输出模式
-                        window_available = False
-                        print("⚠️  窗口显示不可用，切换到终端输出模式")
-                        print("📋 识别结果将输出到终端")
-                        print()
-                else:
-                    # 终端输出模式
-                    if detected_gestures:
-                        print(f"[{time.strftime('%H:%M:%S')}] FPS: {self.fps:.1f} | 识别结果: {', '.join(detected_gestures)}")
-                    else:
-                        print(f"[{time.strftime('%H:%M:%S')}] FPS: {self.fps:.1f} | 未检测到手势")
+                # 将结果分发回各个视频源
+                for (index, frame), detections, output_frame in zip(frames, batch_detections, output_frames):
+                    # 提取识别结果（用于终端输出）
+                    detected_gestures = [f"{d['gesture']} ({d['confidence']:.2f})" for d in detections]
                     
-                    # 短暂延迟，避免输出过快
-                    time.sleep(0.1)
+                    # 多个视频源时，终端输出带上视频源编号
+                    source_prefix = f"[{index}] " if len(self.sources) > 1 else ""
+                    
+                    # 尝试显示帧
+                    if window_available:
+                        try:
+                            cv2.imshow(self.window_name(index), output_frame)
+                        except Exception as e:
+                            # 窗口显示失败，切换到终端输出模式
+                            window_available = False
+                            print("⚠️  窗口显示不可用，切换到终端输出模式")
+                            print("📋 识别结果将输出到终端（无界面部署请使用 --serve 服务模式）")
+                            print()
+                    elif print_due:
+                        # 终端输出模式（每 0.1 秒最多输出一次）
+                        if detected_gestures:
+                            print(f"[{time.strftime('%H:%M:%S')}] {source_prefix}FPS: {self.fps:.1f} | 识别结果: {', '.join(detected_gestures)}")
+                        else:
+                            print(f"[{time.strftime('%H:%M:%S')}] {source_prefix}FPS: {self.fps:.1f} | 未检测到手势")
+                
+                if window_available:
+                    # 按 'q' 键退出
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        quit_requested = True
+                
+                # 显示阶段计时和平滑帧率
+                self.metrics.record("display", time.perf_counter() - display_start)
+                self.metrics.set_dropped_frames(sum(cap.dropped_frames for cap in self.captures))
+                self.fps = self.metrics.frame_done()
+                self.report_startup()
+                self.adapt(time.perf_counter() - process_start)
+                if print_due:
+                    last_print = display_start
                     
             except KeyboardInterrupt:
                 # 捕获 Ctrl+C 退出
@@ -184,28 +459,163 @@ class HandGestureRecognizer:
                 break
         
         # 释放资源
-        self.cap.release()
+        self.release()
+        try:
+            cv2.destroyAllWindows()
+        except:
+            pass
+        self.print_tracking_stats()
+        print_summary(self.metrics)
+        if self.adaptive is not None:
+            self.adaptive.print_stats()
+        print("✅ 实时手势识别系统已关闭")
+    
+    def run_pipelined(self):
+        """以流水线方式运行实时手势识别：采集、预处理、推理、渲染各占一个线程，主线程负责显示"""
+        print("实时手势识别系统已启动（流水线模式）")
+        print("💡 提示：")
+        print("   - 按 'q' 键退出")
+        print("   - 或按 Ctrl+C 退出")
+        print()
+        
+        def capture():
+            with self.metrics.time("capture"):
+                frames = self.read_frames()
+            if not frames:
+                return None
+            return {"frames": self.mirror_frames(frames)}
+        
+        def preprocess(item):
+            with self.metrics.time("preprocess"):
+                item["processed"] = [(index, self.preprocess_frame(frame)) for index, frame in item["frames"]]
+            return item
+        
+        def infer(item):
+            # detect_frames 内部分别记录推理和后处理耗时
+            infer_start = time.perf_counter()
+            item["detections"] = self.detect_frames(item["processed"])
+            # 流水线的吞吐量取决于最慢的推理阶段，以其耗时控制自适应档位
+            self.adapt(time.perf_counter() - infer_start)
+            # 录制会话（在渲染阶段绘制之前）
+            self.record_frames(item["frames"], item["detections"])
+            return item
+        
+        def render(item):
+            with self.metrics.time("render"):
+                item["outputs"] = [(index, self.draw_detections(frame, detections))
+                                   for (index, frame), detections in zip(item["frames"], item["detections"])]
+            return item
+        
+        pipeline = Pipeline(capture, [
+            ("preprocess", preprocess),
+            ("infer", infer),
+            ("render", render)
+        ]).start()
+        
+        try:
+            while True:
+                item = pipeline.get()
+                if item is None:
+                    print("无法读取摄像头帧")
+                    break
+                
+                # 显示各视频源的结果
+                with self.metrics.time("display"):
+                    for index, output_frame in item["outputs"]:
+                        cv2.imshow(self.window_name(index), output_frame)
+                    key = cv2.waitKey(1) & 0xFF
+                
+                # 平滑帧率（以显示的帧为准），丢帧包括采集缓冲区和流水线队列丢弃的帧
+                self.metrics.set_dropped_frames(sum(cap.dropped_frames for cap in self.captures) +
+                                                sum(s["dropped"] for s in pipeline.stats()))
+                self.fps = self.metrics.frame_done()
+                self.report_startup()
+                
+                # 按 'q' 键退出
+                if key == ord('q'):
+                    break
+        except KeyboardInterrupt:
+            # 捕获 Ctrl+C 退出
+            print()
+            print("🔄 正在退出系统...")
+        finally:
+            pipeline.stop()
+        
+        # 释放资源
+        self.release()
         try:
             cv2.destroyAllWindows()
         except:
             pass
+        pipeline.print_stats()
+        self.print_tracking_stats()
+        print_summary(self.metrics)
+        if self.adaptive is not None:
+            self.adaptive.print_stats()
         print("✅ 实时手势识别系统已关闭")
     
-    def train_model(self, data_yaml, epochs=100, imgsz=640):
-        """训练自定义手势识别模型"""
+    def train_model(self, data_yaml, epochs=100, imgsz=640, use_cache=True, cache_dir=None, workers=None):
+        """训练自定义手势识别模型
+        use_cache 为 True 时先校验标注并把图像预处理到内存映射缓存（见 dataset_cache.py），各 epoch 直接读取缓存"""
+        trainer = None
+        if use_cache:
+            from dataset_cache import make_cached_trainer, prepare_dataset
+            trainer = make_cached_trainer(prepare_dataset(data_yaml, imgsz, cache_dir, workers))
+        
         # 加载YOLOv8模型进行训练
-        model = YOLO('yolov8n.pt')
+        model = load_model()
         results = model.train(
+            trainer=trainer,
             data=data_yaml,
             epochs=epochs,
             imgsz=imgsz,
             batch=16,
+            cache=False,
             name='hand_gesture_model'
         )
         return results
 
+def parse_source(value):
+    """解析视频源参数：纯数字为摄像头索引，其余为视频文件路径或流地址"""
+    return int(value) if value.isdigit() else value
+
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="实时手势识别系统")
+    parser.add_argument("--model", default=None, help="模型文件路径（默认使用 yolov8n.pt）")
+    parser.add_argument("--source", nargs="+", type=parse_source, default=[0],
+                        help="一个或多个视频源：摄像头索引、视频文件或流地址")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="流水线模式：采集、预处理、推理、渲染在不同线程中并行执行")
+    parser.add_argument("--track-interval", type=int, default=0,
+                        help="跟踪模式：每 N 帧运行一次检测器，中间帧用光流跟踪（0 表示关闭）")
+    parser.add_argument("--track-min-confidence", type=float, default=0.5,
+                        help="跟踪置信度低于该值时立即运行检测器")
+    parser.add_argument("--motion-threshold", type=float, default=None,
+                        help="运动门控：缩略图中变化像素比例低于该值（如 0.01）时跳过检测，沿用上次结果")
+    parser.add_argument("--motion-refresh", type=int, default=30,
+                        help="运动门控下每 N 帧强制检测一次（0 表示不强制）")
+    parser.add_argument("--serve", action="store_true",
+                        help="无界面服务模式：不创建窗口，通过 Unix socket / WebSocket 推送识别结果")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET,
+                        help="服务模式的 Unix socket 路径（为空或平台不支持时使用 --port 的TCP端口）")
+    parser.add_argument("--port", type=int, default=8765, help="服务模式的TCP端口")
+    parser.add_argument("--websocket-port", type=int, default=None, help="服务模式的 WebSocket 端口（需要 websockets）")
+    parser.add_argument("--record", default=None,
+                        help="会话录制目录：后台写入视频、每帧的检测框和时间戳（多个视频源时每个视频源一个子目录）")
+    parser.add_argument("--record-interval", type=int, default=1,
+                        help="录制时每 N 帧保存一帧图像（0 表示只录制检测结果）")
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="启动时不用空白帧预热模型（第一帧的推理会明显变慢）")
+    add_capture_arguments(parser)
+    add_metrics_arguments(parser)
+    add_adaptive_arguments(parser)
+    args = parser.parse_args()
+    
+    # 启动时间线：模块导入、打开视频源与加载模型（并行）、预热，直到首帧识别完成
+    timeline = StartupTimeline()
+    timeline.add("导入模块", PROCESS_START, IMPORTS_DONE)
+    
     print("=" * 50)
     print("实时手势识别系统 v1.0")
     print("基于 YOLOv8 和 OpenCV")
@@ -214,9 +624,33 @@ def main():
     
     try:
         # 创建手势识别器实例
-        recognizer = HandGestureRecognizer()
+        recognizer = HandGestureRecognizer(model_path=args.model, sources=args.source,
+                                           track_interval=args.track_interval,
+                                           track_min_confidence=args.track_min_confidence,
+                                           target_fps=args.target_fps,
+                                           capture_config=CaptureConfig.from_args(args),
+                                           motion_threshold=args.motion_threshold,
+                                           motion_refresh=args.motion_refresh,
+                                           record_path=args.record,
+                                           record_interval=args.record_interval,
+                                           warmup=not args.no_warmup,
+                                           timeline=timeline,
+                                           adaptive=controller_from_args(args))
+        # 启动指标导出（Prometheus 接口 / JSON 文件）
+        exporters = start_exporters(recognizer.metrics, args.metrics_port, args.metrics_json,
+                                    args.metrics_interval)
         # 运行实时识别
-        recognizer.run()
+        try:
+            if args.serve:
+                GestureService(recognizer, socket_path=args.socket or None, port=args.port,
+                               websocket_port=args.websocket_port).serve()
+            elif args.pipeline:
+                recognizer.run_pipelined()
+            else:
+                recognizer.run()
+        finally:
+            for exporter in exporters:
+                exporter.stop()
     except Exception as e:
         print(f"❌ 发生错误: {e}")
         print()
@@ -228,7 +662,7 @@ def main():
         print("2. 摄像头无法打开:")
         print("   - 确保摄像头未被其他程序占用")
         print("   - 检查摄像头驱动是否正常")
-        print("   - 尝试使用不同的摄像头索引 (修改代码中的 cv2.VideoCapture(0) 为 1, 2 等)")
+        print("   - 尝试使用不同的摄像头索引 (例如 --source 1)")
         print()
         print("3. OpenCV 窗口显示错误:")
         print("   - 这是由于 OpenCV 编译配置问题")
@@ -0,0 +1,519 @@
+import argparse
+import asyncio
+import json
+import os
+import queue
+import socket
+import stat
+import threading
+import time
+import traceback
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from metrics import FrameMetrics, add_metrics_arguments, print_summary, start_exporters
+
+"""
+本地推理服务
+常驻进程只加载一次 YOLO 模型（可选同时加载 MediaPipe Hands），同一台机器上的多个程序作为客户端共用。
+客户端通过 Unix socket 发送JSON行请求，帧像素放在客户端创建的共享内存槽位中，请求里只有 (序号, 槽位, 形状)；
+服务端把各客户端的请求合并成批（最多 max_batch 帧，最多等待 batch_window 秒）一次推理，
+按 gesture_classes 返回检测结果。每个客户端最多同时有 max_pending 个未完成的请求，超出时立即拒绝，
+客户端可以随时连接和断开
+"""
+
+DEFAULT_SOCKET = "/tmp/hand_gesture_infer.sock"
+
+# 可选的推理后端
+BACKENDS = ["yolo", "mediapipe"]
+
+
+def attach_shared_memory(name):
+    """映射其他进程创建的共享内存；不交给本进程的 resource_tracker 管理，
+    否则服务退出时会把仍属于客户端的共享内存一并删除"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.13 之前没有 track 参数
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def remove_stale_socket(path):
+    """删除上次未正常退出留下的 socket 文件；仍有服务在监听或该路径不是 socket 时抛出 RuntimeError"""
+    if not os.path.exists(path):
+        return
+    if not stat.S_ISSOCK(os.stat(path).st_mode):
+        raise RuntimeError(f"{path} 已存在且不是 socket 文件")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        # 没有进程监听：残留文件
+        os.remove(path)
+        return
+    finally:
+        probe.close()
+    raise RuntimeError(f"{path} 上已有服务在运行")
+
+
+def socket_identity(path):
+    """socket 文件的 (设备号, inode)，不存在时返回 None；退出时据此只删除本进程创建的 socket 文件"""
+    try:
+        info = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return info.st_dev, info.st_ino
+
+
+class ServerClient:
+    """服务端记录的一个客户端连接：共享内存映射和未完成的请求数"""
+
+    def __init__(self, client_id, writer):
+        self.id = client_id
+        self.writer = writer
+        self.closed = False
+        self.shm = None
+        self.slots = 0
+        self.slot_bytes = 0
+        self.pending = 0
+        self.processed = 0
+        self.rejected = 0
+
+    def send(self, message):
+        if not self.closed:
+            self.writer.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    def attach(self, name, slots, slot_bytes):
+        """（推理线程）映射客户端的共享内存，替换之前的映射；槽位超出共享内存大小时抛出 ValueError"""
+        self.release_memory()
+        if slots <= 0 or slot_bytes <= 0:
+            raise ValueError(f"无效的槽位数 {slots} 或槽位大小 {slot_bytes}")
+        shm = attach_shared_memory(name)
+        if slots * slot_bytes > shm.size:
+            shm.close()
+            raise ValueError(f"{slots} 个 {slot_bytes} 字节的槽位超出共享内存大小 {shm.size}")
+        self.shm = shm
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+
+    def frame(self, slot, shape):
+        """（推理线程）槽位中的帧（直接映射共享内存，不复制）"""
+        if self.shm is None:
+            raise ValueError("尚未注册共享内存")
+        if (not isinstance(slot, int) or len(shape) != 3
+                or not all(isinstance(size, int) and size >= 0 for size in shape)):
+            raise ValueError(f"无效的槽位 {slot} 或帧形状 {shape}")
+        if not 0 <= slot < self.slots or int(np.prod(shape)) > self.slot_bytes:
+            raise ValueError(f"无效的槽位 {slot} 或帧形状 {shape}")
+        return np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def release_memory(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm = None
+
+
+class InferenceServer:
+    def __init__(self, socket_path=DEFAULT_SOCKET, model_path=None, mediapipe=False, max_batch=8,
+                 batch_window=0.005, max_pending=8):
+        """model_path 为 YOLO 模型；mediapipe 为 True 时同时加载 MediaPipe Hands；
+        max_batch 为一批最多的帧数，batch_window 为凑批最多等待的秒数，max_pending 为每个客户端最多未完成的请求数"""
+        self.socket_path = socket_path
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.max_pending = max_pending
+
+        # 模型只在这里加载一次，所有客户端共用
+        from hand_gesture_recognition import HandGestureRecognizer
+        self.recognizers = {"yolo": HandGestureRecognizer(model_path=model_path, sources=None)}
+        if mediapipe:
+            from optimized_hand_gesture import OptimizedHandGestureRecognizer
+            recognizer = OptimizedHandGestureRecognizer(source=None, warmup=False)
+            # 不同客户端的帧交替到达，不能沿用跨帧跟踪，每帧单独检测
+            recognizer.hands.close()
+            recognizer.hands = recognizer.mp_hands.Hands(
+                static_image_mode=True,
+                max_num_hands=2,
+                min_detection_confidence=0.7
+            )
+            self.recognizers["mediapipe"] = recognizer
+
+        self.clients = {}
+        self.next_client_id = 0
+        # 推理线程的请求队列：("infer", 客户端, 请求) / ("attach", 客户端, 参数) / ("detach", 客户端, None)
+        self.requests = queue.Queue()
+        self.loop = None
+
+        # 统计信息
+        self.batches = 0
+        self.processed = 0
+        self.rejected = 0
+        self.metrics = FrameMetrics()
+
+    async def handle_client(self, reader, writer):
+        """一个客户端连接：读取请求，infer 请求交给推理线程，超出未完成请求数时立即拒绝"""
+        client = ServerClient(self.next_client_id, writer)
+        self.next_client_id += 1
+        self.clients[client.id] = client
+        print(f"🔗 客户端 #{client.id} 已连接（当前 {len(self.clients)} 个）")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    client.send({"error": "无效的请求"})
+                    continue
+
+                op = message.get("op")
+                if op == "infer":
+                    self.submit(client, message)
+                elif op == "attach":
+                    self.requests.put(("attach", client, message))
+                elif op == "status":
+                    client.send(self.status())
+                elif op == "detach":
+                    break
+                else:
+                    client.send({"error": f"未知的操作: {op}"})
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            client.closed = True
+            del self.clients[client.id]
+            # 由推理线程在处理完该客户端之前的请求后释放共享内存
+            self.requests.put(("detach", client, None))
+            writer.close()
+            print(f"👋 客户端 #{client.id} 已断开：处理 {client.processed} 帧，拒绝 {client.rejected} 帧")
+
+    def submit(self, client, message):
+        backend = message.get("backend", "yolo")
+        if backend not in self.recognizers:
+            client.send({"id": message.get("id"), "error": f"服务未加载 {backend} 后端"})
+        elif client.pending >= self.max_pending:
+            # 每个客户端的未完成请求数有上限，一个客户端发送过快不会挤占其他客户端
+            client.rejected += 1
+            self.rejected += 1
+            client.send({"id": message.get("id"), "error": "busy"})
+        elif not isinstance(message.get("shape"), list) or "slot" not in message:
+            client.send({"id": message.get("id"), "error": "请求缺少 slot 或 shape"})
+        else:
+            client.pending += 1
+            self.requests.put(("infer", client, (message.get("id"), message["slot"], tuple(message["shape"]),
+                                                 backend, time.perf_counter())))
+
+    def status(self):
+        return {
+            "op": "status",
+            "clients": len(self.clients),
+            "backends": list(self.recognizers),
+            "batches": self.batches,
+            "processed": self.processed,
+            "rejected": self.rejected,
+            "max_batch": self.max_batch,
+            "max_pending": self.max_pending
+        }
+
+    def deliver(self, client, message):
+        """（事件循环）返回一个请求的结果"""
+        client.pending -= 1
+        if message is not None:
+            client.send(message)
+
+    def reply(self, client, message):
+        self.loop.call_soon_threadsafe(self.deliver, client, message)
+
+    def next_batch(self):
+        """（推理线程）阻塞取出第一个请求，再在 batch_window 内尽量凑满一批；收到 None 时返回 None"""
+        item = self.requests.get()
+        if item is None:
+            return None
+        batch = [item]
+        deadline = time.perf_counter() + self.batch_window
+        while sum(1 for kind, _, _ in batch if kind == "infer") < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # 处理完这一批后退出
+                self.requests.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def run_inference(self, requests):
+        """（推理线程）按后端分组批量推理一组 infer 请求，并把结果返回给各客户端"""
+        groups = {}
+        for client, request in requests:
+            groups.setdefault(request[3], []).append((client, request))
+
+        for backend, items in groups.items():
+            recognizer = self.recognizers[backend]
+            frames, valid = [], []
+            for client, (request_id, slot, shape, _, received) in items:
+                if client.closed:
+                    self.reply(client, None)
+                    continue
+                try:
+                    frames.append(client.frame(slot, shape))
+                    valid.append((client, request_id))
+                    self.metrics.record("queue_wait", time.perf_counter() - received)
+                except Exception as e:
+                    # 客户端给出的槽位或帧形状有误只影响这一个请求
+                    self.reply(client, {"id": request_id, "error": str(e)})
+            if not frames:
+                continue
+
+            try:
+                with self.metrics.time(f"inference_{backend}"):
+                    if hasattr(recognizer, "process_frames"):
+                        results = recognizer.process_frames(frames)
+                    else:
+                        results = [recognizer.process_frame(frame) for frame in frames]
+            except Exception as e:
+                results = [e] * len(frames)
+            finally:
+                # 释放对共享内存的引用，否则客户端断开时无法 close
+                del frames
+
+            self.batches += 1
+            for (client, request_id), detections in zip(valid, results):
+                if isinstance(detections, Exception):
+                    self.reply(client, {"id": request_id, "error": str(detections)})
+                    continue
+                client.processed += 1
+                self.processed += 1
+                self.metrics.frame_done()
+                self.reply(client, {"id": request_id, "backend": backend, "detections": detections})
+        self.metrics.set_dropped_frames(self.rejected)
+
+    def inference_loop(self):
+        """（推理线程）串行处理请求队列：控制请求与同一客户端的推理请求保持先后顺序"""
+        while True:
+            batch = self.next_batch()
+            if batch is None:
+                break
+            try:
+                self.process_batch(batch)
+            except Exception:
+                # 推理线程为所有客户端共用，任何意外错误都不能让它退出
+                print("⚠️  推理线程处理请求时出错：")
+                traceback.print_exc()
+
+    def process_batch(self, batch):
+        """（推理线程）按顺序处理一批请求"""
+        requests = []
+        for kind, client, payload in batch:
+            if kind == "infer":
+                requests.append((client, payload))
+                continue
+            # 先完成之前的推理请求，再注册/释放共享内存
+            self.run_inference(requests)
+            requests = []
+            if kind == "attach":
+                try:
+                    client.attach(payload["shm"], int(payload["slots"]), int(payload["slot_bytes"]))
+                except (KeyError, TypeError, ValueError, OSError) as e:
+                    self.loop.call_soon_threadsafe(client.send, {"op": "attach", "error": str(e)})
+            else:
+                client.release_memory()
+        self.run_inference(requests)
+
+    async def run(self):
+        """运行服务，直到被中断"""
+        self.loop = asyncio.get_running_loop()
+        remove_stale_socket(self.socket_path)
+        server = await asyncio.start_unix_server(self.handle_client, path=self.socket_path)
+        identity = socket_identity(self.socket_path)
+        thread = threading.Thread(target=self.inference_loop, name="inference", daemon=True)
+        thread.start()
+        print(f"📡 推理服务: unix://{self.socket_path}（后端: {', '.join(self.recognizers)}）")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.requests.put(None)
+            await self.loop.run_in_executor(None, thread.join)
+            for client in list(self.clients.values()):
+                client.release_memory()
+            if socket_identity(self.socket_path) == identity:
+                os.remove(self.socket_path)
+
+    def serve(self):
+        """阻塞运行服务，Ctrl+C 退出"""
+        print("本地推理服务已启动")
+        print("💡 按 Ctrl+C 退出")
+        print()
+        try:
+            asyncio.run(self.run())
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            return
+        except KeyboardInterrupt:
+            print()
+            print("🔄 正在退出服务...")
+        average = self.processed / self.batches if self.batches else 0.0
+        print(f"📊 共处理 {self.processed} 帧（{self.batches} 批，平均每批 {average:.1f} 帧），拒绝 {self.rejected} 帧")
+        print_summary(self.metrics)
+        print("✅ 本地推理服务已关闭")
+
+
+class InferenceClient:
+    def __init__(self, socket_path=DEFAULT_SOCKET, backend="yolo", slots=4):
+        """连接本地推理服务；slots 为共享内存槽位数，即最多同时提交的帧数（超过服务端的 max_pending 时减少为 max_pending）"""
+        if backend not in BACKENDS:
+            raise ValueError(f"未知的推理后端: {backend}")
+        self.backend = backend
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(socket_path)
+        self.reader = self.sock.makefile("rb")
+
+        # 同时提交的帧数不超过服务端每个客户端的未完成请求上限，请求不会因此被拒绝（busy）
+        max_pending = self.status().get("max_pending", slots)
+        if slots > max_pending:
+            print(f"⚠️  推理服务每个客户端最多 {max_pending} 个未完成的请求，槽位数从 {slots} 减少为 {max_pending}")
+        self.num_slots = min(slots, max_pending)
+
+        # 共享内存在提交第一帧时按帧大小创建，由客户端负责删除
+        self.shm = None
+        self.slot_bytes = 0
+        self.free_slots = []
+
+        # 已提交请求的槽位，以及已返回但尚未取走的结果
+        self.next_id = 0
+        self.in_flight = {}
+        self.results = {}
+
+    def send(self, message):
+        self.sock.sendall((json.dumps(message) + "\n").encode("utf-8"))
+
+    def receive(self):
+        """读取一条服务端消息"""
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("推理服务已断开")
+        return json.loads(line)
+
+    def ensure_capacity(self, nbytes):
+        """槽位放不下当前帧时，等待所有请求完成后重新创建共享内存并通知服务端"""
+        if nbytes <= self.slot_bytes:
+            return
+        while self.in_flight:
+            self.collect()
+        self.release_memory()
+        self.slot_bytes = nbytes
+        self.shm = shared_memory.SharedMemory(create=True, size=nbytes * self.num_slots)
+        self.free_slots = list(range(self.num_slots))
+        self.send({"op": "attach", "shm": self.shm.name, "slots": self.num_slots, "slot_bytes": nbytes})
+
+    def submit(self, frame):
+        """把帧写入一个空闲槽位并提交，返回请求序号；没有空闲槽位时先等待结果"""
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        self.ensure_capacity(frame.nbytes)
+        while not self.free_slots:
+            self.collect()
+
+        slot = self.free_slots.pop()
+        view = np.ndarray(frame.shape, dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+        view[...] = frame
+        del view
+
+        request_id = self.next_id
+        self.next_id += 1
+        self.in_flight[request_id] = slot
+        self.send({"op": "infer", "id": request_id, "slot": slot, "shape": list(frame.shape),
+                   "backend": self.backend})
+        return request_id
+
+    def collect(self):
+        """读取一个结果并释放其槽位"""
+        message = self.receive()
+        if message.get("op") == "attach":
+            raise RuntimeError(f"推理服务无法映射共享内存: {message.get('error')}")
+        request_id = message.get("id")
+        if request_id not in self.in_flight:
+            raise RuntimeError(message.get("error", f"未知的响应: {message}"))
+        self.free_slots.append(self.in_flight.pop(request_id))
+        self.results[request_id] = message
+
+    def result(self, request_id):
+        """等待并返回一个请求的检测结果；服务端拒绝（busy）或出错时抛出 RuntimeError"""
+        while request_id not in self.results:
+            self.collect()
+        message = self.results.pop(request_id)
+        if "error" in message:
+            raise RuntimeError(f"请求 {request_id} 失败: {message['error']}")
+        return message["detections"]
+
+    def process_frames(self, frames):
+        """与识别器的 process_frames 接口相同：同时提交多帧（最多 slots 帧在途），按顺序返回检测结果"""
+        request_ids = [self.submit(frame) for frame in frames]
+        return [self.result(request_id) for request_id in request_ids]
+
+    def process_frame(self, frame):
+        return self.result(self.submit(frame))
+
+    def status(self):
+        """服务端的状态（客户端数、已处理帧数等）；只能在没有未完成请求时调用"""
+        self.send({"op": "status"})
+        return self.receive()
+
+    def release_memory(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def close(self):
+        """通知服务端断开，删除共享内存"""
+        try:
+            self.send({"op": "detach"})
+        except OSError:
+            pass
+        self.reader.close()
+        self.sock.close()
+        self.release_memory()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="本地推理服务：多个程序共用一次加载的手势识别模型")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="服务的 Unix socket 路径")
+    parser.add_argument("--model", default=None, help="YOLO模型文件路径（默认使用 yolov8n.pt）")
+    parser.add_argument("--mediapipe", action="store_true", help="同时加载 MediaPipe Hands 后端")
+    parser.add_argument("--max-batch", type=int, default=8, help="一次批量推理最多的帧数")
+    parser.add_argument("--batch-window-ms", type=float, default=5.0, help="凑批最多等待的毫秒数")
+    parser.add_argument("--max-pending", type=int, default=8, help="每个客户端最多未完成的请求数")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    if not hasattr(asyncio, "start_unix_server"):
+        print("❌ 当前平台不支持 Unix socket")
+        return
+
+    server = InferenceServer(socket_path=args.socket, model_path=args.model, mediapipe=args.mediapipe,
+                             max_batch=args.max_batch, batch_window=args.batch_window_ms / 1000.0,
+                             max_pending=args.max_pending)
+    exporters = start_exporters(server.metrics, args.metrics_port, args.metrics_json, args.metrics_interval)
+    try:
+        server.serve()
+    finally:
+        for exporter in exporters:
+            exporter.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+"""
+关键点手势分类器
+以 MediaPipe 的 21 个手部关键点为输入：以手腕为原点、按手掌大小归一化、统一左右手方向，
+用一个小型 NumPy 多层感知机（MLP）输出八种手势的概率，代替手写阈值规则。
+权重保存为 .npz 文件，推理和训练都只依赖 NumPy；所有手一次批量计算
+"""
+
+NUM_LANDMARKS = 21
+WRIST = 0
+INDEX_MCP = 5
+MIDDLE_MCP = 9
+PINKY_MCP = 17
+
+# 手势类别映射（与 optimized_hand_gesture.py 一致）
+gesture_classes = {
+    0: "数字1",
+    1: "数字2",
+    2: "数字3",
+    3: "数字4",
+    4: "数字5",
+    5: "剪刀",
+    6: "锤头",
+    7: "布"
+}
+
+
+def normalize_landmarks(landmarks):
+    """(手数, 21, 3) 关键点 -> (手数, 63) 特征：相对手腕的坐标，除以手腕到中指根部的距离，
+    并把左右手镜像到同一方向（食指根部在小指根部左侧）"""
+    landmarks = np.asarray(landmarks, dtype=np.float32).reshape(-1, NUM_LANDMARKS, 3)
+    points = landmarks - landmarks[:, WRIST:WRIST + 1]
+    palm = points[:, MIDDLE_MCP, :2]
+    scale = 1.0 / np.maximum(np.sqrt((palm * palm).sum(axis=1)), 1e-6)
+    # 缩放与镜像合并为一次乘法：x 方向的系数在需要镜像时取负
+    x_scale = np.where(points[:, INDEX_MCP, 0] > points[:, PINKY_MCP, 0], -scale, scale)
+    points *= np.stack([x_scale, scale, scale], axis=1)[:, None, :]
+    return points.reshape(len(points), -1)
+
+
+def flush_denormals(array):
+    """把非规格化的极小浮点数置零（权重衰减会产生大量此类值，使矩阵乘法慢一个数量级）"""
+    return np.where(np.abs(array) < np.finfo(np.float32).tiny, 0, array).astype(np.float32)
+
+
+def augment_landmarks(landmarks, rng, max_angle=15.0, noise=0.01):
+    """训练时的数据增强：绕手腕随机旋转、缩放并加入少量噪声"""
+    landmarks = np.array(landmarks, dtype=np.float32)
+    angles = np.radians(rng.uniform(-max_angle, max_angle, len(landmarks)))
+    cos, sin = np.cos(angles), np.sin(angles)
+    rotation = np.stack([np.stack([cos, -sin], axis=1), np.stack([sin, cos], axis=1)], axis=1)
+    wrist = landmarks[:, WRIST:WRIST + 1, :2]
+    scale = rng.uniform(0.9, 1.1, (len(landmarks), 1, 1))
+    landmarks[:, :, :2] = np.einsum("nij,nkj->nki", rotation, landmarks[:, :, :2] - wrist) * scale + wrist
+    landmarks += rng.normal(0, noise, landmarks.shape).astype(np.float32)
+    return landmarks
+
+
+class LandmarkClassifier:
+    def __init__(self, num_classes=8, hidden_sizes=(64, 32), seed=0):
+        """num_classes 为手势类别数，hidden_sizes 为各隐藏层的大小"""
+        rng = np.random.default_rng(seed)
+        sizes = [NUM_LANDMARKS * 3] + list(hidden_sizes) + [num_classes]
+        # He 初始化
+        self.weights = [(rng.standard_normal((n_in, n_out)) * np.sqrt(2.0 / n_in)).astype(np.float32)
+                        for n_in, n_out in zip(sizes[:-1], sizes[1:])]
+        self.biases = [np.zeros(n_out, dtype=np.float32) for n_out in sizes[1:]]
+        self.num_classes = num_classes
+
+    def forward(self, features):
+        """前向计算，返回每层的激活值列表（最后一项为 logits）"""
+        activations = [features]
+        for i, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+            output = activations[-1] @ weight + bias
+            if i < len(self.weights) - 1:
+                output = np.maximum(output, 0)
+            activations.append(output)
+        return activations
+
+    @staticmethod
+    def softmax(logits):
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict_proba(self, landmarks):
+        """(手数, 21, 3) 关键点 -> (手数, 类别数) 概率"""
+        return self.softmax(self.forward(normalize_landmarks(landmarks))[-1])
+
+    def predict(self, landmarks):
+        """返回 (类别ID数组, 置信度数组, 概率矩阵)"""
+        probabilities = self.predict_proba(landmarks)
+        class_ids = probabilities.argmax(axis=1)
+        return class_ids, probabilities[np.arange(len(class_ids)), class_ids], probabilities
+
+    def fit(self, landmarks, labels, epochs=300, lr=0.005, batch_size=64, weight_decay=1e-4,
+            val_split=0.2, augment=True, seed=0, log_interval=50):
+        """用 Adam 训练（交叉熵损失），返回最终的 (训练准确率, 验证准确率)"""
+        rng = np.random.default_rng(seed)
+        landmarks = np.asarray(landmarks, dtype=np.float32).reshape(-1, NUM_LANDMARKS, 3)
+        labels = np.asarray(labels, dtype=np.int64)
+
+        # 划分验证集
+        order = rng.permutation(len(labels))
+        num_val = int(len(labels) * val_split) if len(labels) >= 10 else 0
+        val_idx, train_idx = order[:num_val], order[num_val:]
+
+        params = self.weights + self.biases
+        moments = [np.zeros_like(p) for p in params]
+        velocities = [np.zeros_like(p) for p in params]
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        step = 0
+
+        for epoch in range(1, epochs + 1):
+            rng.shuffle(train_idx)
+            total_loss = 0.0
+            for start in range(0, len(train_idx), batch_size):
+                batch = train_idx[start:start + batch_size]
+                batch_landmarks = augment_landmarks(landmarks[batch], rng) if augment else landmarks[batch]
+                activations = self.forward(normalize_landmarks(batch_landmarks))
+                probabilities = self.softmax(activations[-1])
+                total_loss += -np.log(probabilities[np.arange(len(batch)), labels[batch]] + 1e-9).sum()
+
+                # 反向传播
+                grad = probabilities
+                grad[np.arange(len(batch)), labels[batch]] -= 1
+                grad /= len(batch)
+                weight_grads = [None] * len(self.weights)
+                bias_grads = [None] * len(self.biases)
+                for i in range(len(self.weights) - 1, -1, -1):
+                    weight_grads[i] = activations[i].T @ grad + weight_decay * self.weights[i]
+                    bias_grads[i] = grad.sum(axis=0)
+                    if i > 0:
+                        grad = (grad @ self.weights[i].T) * (activations[i] > 0)
+
+                # Adam 更新（原地修改参数）
+                step += 1
+                for param, g, m, v in zip(params, weight_grads + bias_grads, moments, velocities):
+                    m *= beta1
+                    m += (1 - beta1) * g
+                    v *= beta2
+                    v += (1 - beta2) * g * g
+                    m_hat = m / (1 - beta1 ** step)
+                    v_hat = v / (1 - beta2 ** step)
+                    param -= (lr * m_hat / (np.sqrt(v_hat) + eps)).astype(np.float32)
+
+            if log_interval and (epoch % log_interval == 0 or epoch == epochs):
+                message = (f"epoch {epoch:4d} | loss {total_loss / len(train_idx):.4f} | "
+                           f"训练准确率 {self.accuracy(landmarks[train_idx], labels[train_idx]):.1%}")
+                if num_val:
+                    message += f" | 验证准确率 {self.accuracy(landmarks[val_idx], labels[val_idx]):.1%}"
+                print(message)
+
+        self.weights = [flush_denormals(weight) for weight in self.weights]
+        self.biases = [flush_denormals(bias) for bias in self.biases]
+        train_acc = self.accuracy(landmarks[train_idx], labels[train_idx])
+        val_acc = self.accuracy(landmarks[val_idx], labels[val_idx]) if num_val else None
+        return train_acc, val_acc
+
+    def accuracy(self, landmarks, labels):
+        if len(labels) == 0:
+            return float("nan")
+        return float((self.predict_proba(landmarks).argmax(axis=1) == labels).mean())
+
+    def save(self, path):
+        """保存权重为 .npz（W0, b0, W1, b1, ...）"""
+        arrays = {"num_classes": np.array(self.num_classes)}
+        for i, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+            arrays[f"W{i}"] = weight
+            arrays[f"b{i}"] = bias
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """从 .npz 文件加载权重"""
+        data = np.load(path)
+        classifier = cls.__new__(cls)
+        num_layers = sum(1 for key in data.files if key.startswith("W"))
+        classifier.weights = [flush_denormals(data[f"W{i}"]) for i in range(num_layers)]
+        classifier.biases = [flush_denormals(data[f"b{i}"]) for i in range(num_layers)]
+        classifier.num_classes = int(data["num_classes"])
+        return classifier
+
+
+def load_samples(path):
+    """读取录制的样本，返回 (关键点 (N, 21, 3), 类别 (N,))"""
+    if not os.path.exists(path):
+        return np.zeros((0, NUM_LANDMARKS, 3), dtype=np.float32), np.zeros(0, dtype=np.int64)
+    data = np.load(path)
+    return data["landmarks"].astype(np.float32), data["labels"].astype(np.int64)
+
+
+def append_samples(path, landmarks, labels):
+    """把样本追加到 .npz 样本文件，返回样本总数"""
+    old_landmarks, old_labels = load_samples(path)
+    all_landmarks = np.concatenate([old_landmarks, np.asarray(landmarks, dtype=np.float32).reshape(-1, NUM_LANDMARKS, 3)])
+    all_labels = np.concatenate([old_labels, np.asarray(labels, dtype=np.int64).reshape(-1)])
+    np.savez(path, landmarks=all_landmarks, labels=all_labels)
+    return len(all_labels)
+
+
+def benchmark(classifier, num_hands=2, iterations=2000):
+    """测量批量推理 num_hands 只手的平均耗时（毫秒）"""
+    landmarks = np.random.default_rng(0).random((num_hands, NUM_LANDMARKS, 3), dtype=np.float32)
+    classifier.predict(landmarks)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        classifier.predict(landmarks)
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="训练关键点手势分类器")
+    parser.add_argument("samples", nargs="+", help="录制的样本文件（optimized_hand_gesture.py --record-samples 生成）")
+    parser.add_argument("-o", "--output", default="gesture_classifier.npz", help="输出的权重文件")
+    parser.add_argument("--epochs", type=int, default=300, help="训练轮数")
+    parser.add_argument("--lr", type=float, default=0.005, help="学习率")
+    parser.add_argument("--hidden", type=int, nargs="+", default=[64, 32], help="隐藏层大小")
+    parser.add_argument("--val-split", type=float, default=0.2, help="验证集比例")
+    args = parser.parse_args()
+
+    samples = [load_samples(path) for path in args.samples]
+    landmarks = np.concatenate([s[0] for s in samples])
+    labels = np.concatenate([s[1] for s in samples])
+    if len(labels) == 0:
+        print("❌ 没有可用的样本")
+        return
+
+    print(f"📋 共 {len(labels)} 个样本：")
+    for class_id, name in gesture_classes.items():
+        print(f"   - {name}: {int((labels == class_id).sum())}")
+
+    classifier = LandmarkClassifier(num_classes=len(gesture_classes), hidden_sizes=args.hidden)
+    classifier.fit(landmarks, labels, epochs=args.epochs, lr=args.lr, val_split=args.val_split)
+    classifier.save(args.output)
+    print(f"⏱️  批量推理 2 只手平均耗时 {benchmark(classifier):.4f} ms")
+    print(f"✅ 权重已保存：{args.output}")
+
+
+if __name__ == "__main__":
+    main()
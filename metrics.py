@@ -0,0 +1,277 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+"""
+延迟指标与遥测导出
+按阶段（采集、预处理、推理、后处理、渲染、显示）记录最近 N 次的耗时，计算 P50/P95/P99，
+统计丢帧数，用最近 N 帧的完成时间计算平滑帧率（代替单帧 1/dt），
+并可通过本地 Prometheus 文本格式的 HTTP 接口或定期写入的 JSON 文件导出，
+用于在边缘设备帧率低于目标值时告警
+"""
+
+STAGES = ("capture", "preprocess", "inference", "postprocess", "render", "display")
+
+
+class RollingWindow:
+    """最近 size 个数值的滑动窗口"""
+
+    def __init__(self, size=300):
+        self.values = deque(maxlen=size)
+        self.total_count = 0
+        self.total_sum = 0.0
+
+    def add(self, value):
+        self.values.append(value)
+        self.total_count += 1
+        self.total_sum += value
+
+    def summary(self):
+        """窗口内数值的平均值和 P50/P95/P99"""
+        if not self.values:
+            return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+        values = np.fromiter(self.values, dtype=np.float64, count=len(self.values))
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {"mean": float(values.mean()), "p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+class FrameMetrics:
+    def __init__(self, window_size=300, target_fps=None):
+        """window_size 为滑动窗口大小（帧），target_fps 为目标帧率（低于该值时告警）"""
+        self.window_size = window_size
+        self.target_fps = target_fps
+        self.lock = threading.Lock()
+        self.stages = {name: RollingWindow(window_size) for name in STAGES}
+
+        # 最近 window_size 帧的完成时间，用于计算平滑帧率
+        self.frame_times = deque(maxlen=window_size)
+        self.frames = 0
+        self.dropped_frames = 0
+        self.below_target = False
+
+    def record(self, stage, seconds):
+        """记录一次阶段耗时（秒），各阶段可在不同线程中记录"""
+        with self.lock:
+            if stage not in self.stages:
+                self.stages[stage] = RollingWindow(self.window_size)
+            self.stages[stage].add(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        """计时上下文：with metrics.time("inference"): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def set_dropped_frames(self, count):
+        """更新累计丢帧数（采集缓冲区和流水线队列丢弃的帧）"""
+        with self.lock:
+            self.dropped_frames = count
+
+    def frame_done(self):
+        """一帧显示完成，更新平滑帧率，并在帧率跌破/恢复目标值时输出提示"""
+        with self.lock:
+            self.frame_times.append(time.perf_counter())
+            self.frames += 1
+            fps = self._fps()
+            # 至少积累 30 帧后再判断，避免启动阶段误报
+            if self.target_fps is None or len(self.frame_times) < min(30, self.window_size):
+                return fps
+            below = fps < self.target_fps
+            changed = below != self.below_target
+            self.below_target = below
+
+        if changed and below:
+            print(f"⚠️  帧率 {fps:.1f} 低于目标 {self.target_fps:.1f} FPS")
+        elif changed:
+            print(f"✅ 帧率已恢复到 {fps:.1f} FPS（目标 {self.target_fps:.1f}）")
+        return fps
+
+    def _fps(self):
+        if len(self.frame_times) < 2:
+            return 0.0
+        elapsed = self.frame_times[-1] - self.frame_times[0]
+        return (len(self.frame_times) - 1) / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def fps(self):
+        """最近 window_size 帧的平均帧率"""
+        with self.lock:
+            return self._fps()
+
+    def snapshot(self):
+        """当前指标的字典（耗时单位为毫秒）"""
+        with self.lock:
+            stages = {}
+            for name, window in self.stages.items():
+                summary = window.summary()
+                stages[name] = {
+                    "count": window.total_count,
+                    "mean_ms": summary["mean"] * 1000,
+                    "p50_ms": summary["p50"] * 1000,
+                    "p95_ms": summary["p95"] * 1000,
+                    "p99_ms": summary["p99"] * 1000
+                }
+            return {
+                "timestamp": time.time(),
+                "frames": self.frames,
+                "fps": self._fps(),
+                "target_fps": self.target_fps,
+                "below_target": self.below_target,
+                "dropped_frames": self.dropped_frames,
+                "stages": stages
+            }
+
+    def prometheus_text(self):
+        """Prometheus 文本格式的指标"""
+        with self.lock:
+            lines = [
+                "# HELP gesture_stage_latency_seconds Per-stage latency over the rolling window.",
+                "# TYPE gesture_stage_latency_seconds summary"
+            ]
+            for name, window in self.stages.items():
+                summary = window.summary()
+                for quantile, key in (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99")):
+                    lines.append(f'gesture_stage_latency_seconds{{stage="{name}",quantile="{quantile}"}} '
+                                 f'{summary[key]:.6f}')
+                lines.append(f'gesture_stage_latency_seconds_sum{{stage="{name}"}} {window.total_sum:.6f}')
+                lines.append(f'gesture_stage_latency_seconds_count{{stage="{name}"}} {window.total_count}')
+
+            lines += [
+                "# HELP gesture_fps Smoothed frames per second over the rolling window.",
+                "# TYPE gesture_fps gauge",
+                f"gesture_fps {self._fps():.3f}",
+                "# HELP gesture_frames_total Frames displayed.",
+                "# TYPE gesture_frames_total counter",
+                f"gesture_frames_total {self.frames}",
+                "# HELP gesture_dropped_frames_total Frames dropped by capture buffers and pipeline queues.",
+                "# TYPE gesture_dropped_frames_total counter",
+                f"gesture_dropped_frames_total {self.dropped_frames}"
+            ]
+            if self.target_fps is not None:
+                lines += [
+                    "# HELP gesture_target_fps Configured target frame rate.",
+                    "# TYPE gesture_target_fps gauge",
+                    f"gesture_target_fps {self.target_fps}",
+                    "# HELP gesture_below_target 1 when the smoothed frame rate is below the target.",
+                    "# TYPE gesture_below_target gauge",
+                    f"gesture_below_target {int(self.below_target)}"
+                ]
+            return "\n".join(lines) + "\n"
+
+
+class MetricsHTTPServer:
+    """本地HTTP接口：/metrics 返回 Prometheus 文本格式，/metrics.json 返回JSON"""
+
+    def __init__(self, metrics, port=9108, host="127.0.0.1"):
+        self.metrics = metrics
+        self.address = (host, port)
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body = metrics.prometheus_text().encode("utf-8")
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                elif self.path == "/metrics.json":
+                    body = json.dumps(metrics.snapshot(), ensure_ascii=False).encode("utf-8")
+                    content_type = "application/json; charset=utf-8"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # 不在终端输出每次抓取的访问日志
+                pass
+
+        self.server = ThreadingHTTPServer(self.address, Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"📈 指标接口: http://{self.address[0]}:{self.server.server_port}/metrics")
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.thread.join(timeout=1.0)
+
+
+class MetricsJSONWriter:
+    """定期把指标快照写入JSON文件（先写临时文件再替换，读取方不会读到不完整的文件）"""
+
+    def __init__(self, metrics, path, interval=5.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def write(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.metrics.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.write()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        print(f"📈 指标文件: {self.path}（每 {self.interval:g} 秒更新）")
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+        # 退出前写入最终结果
+        self.write()
+
+
+def add_metrics_arguments(parser):
+    """为命令行添加指标相关参数"""
+    parser.add_argument("--target-fps", type=float, default=None, help="目标帧率，平滑帧率低于该值时告警")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="在本地该端口提供 Prometheus 指标接口（/metrics）")
+    parser.add_argument("--metrics-json", default=None, help="定期把指标写入该JSON文件")
+    parser.add_argument("--metrics-interval", type=float, default=5.0, help="JSON指标文件的更新间隔（秒）")
+
+
+def start_exporters(metrics, port=None, json_path=None, interval=5.0):
+    """按参数启动指标导出器，返回导出器列表（退出时调用各自的 stop）"""
+    exporters = []
+    if port is not None:
+        exporters.append(MetricsHTTPServer(metrics, port).start())
+    if json_path:
+        exporters.append(MetricsJSONWriter(metrics, json_path, interval).start())
+    return exporters
+
+
+def print_summary(metrics):
+    """打印各阶段延迟统计"""
+    snapshot = metrics.snapshot()
+    print(f"📊 平滑帧率 {snapshot['fps']:.1f} FPS | 共 {snapshot['frames']} 帧 | 丢帧 {snapshot['dropped_frames']}")
+    for name, s in snapshot["stages"].items():
+        if s["count"]:
+            print(f"   - {name:<12} P50 {s['p50_ms']:>7.2f} ms | P95 {s['p95_ms']:>7.2f} ms | "
+                  f"P99 {s['p99_ms']:>7.2f} ms")
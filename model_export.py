@@ -0,0 +1,222 @@
+import argparse
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+import yaml
+
+"""
+模型导出与后端对比脚本
+把训练好的手势模型（.pt）导出为 ONNX / OpenVINO 格式，可选用验证集图像做静态INT8量化，
+导出的模型可以直接传给 HandGestureRecognizer(model_path=...) 使用，
+并可输出各后端的延迟对比报告
+"""
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def letterbox(image, size, color=(114, 114, 114)):
+    """等比例缩放并填充为 size x size，返回 (图像, 缩放比例, (左侧填充, 上侧填充))"""
+    h, w = image.shape[:2]
+    scale = min(size / h, size / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    if (new_w, new_h) != (w, h):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+    pad_x = (size - new_w) // 2
+    pad_y = (size - new_h) // 2
+    image = cv2.copyMakeBorder(image, pad_y, size - new_h - pad_y, pad_x, size - new_w - pad_x,
+                               cv2.BORDER_CONSTANT, value=color)
+    return image, scale, (pad_x, pad_y)
+
+
+def resolve_split_dir(data_yaml, split="val"):
+    """根据数据配置文件解析某个数据集划分的图像目录（相对路径以 path 字段或配置文件所在目录为基准）"""
+    with open(data_yaml, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    split_path = data.get(split)
+    if not split_path:
+        raise ValueError(f"数据配置文件中没有 {split} 划分: {data_yaml}")
+    base = data.get("path") or os.path.dirname(os.path.abspath(data_yaml))
+    if not os.path.isabs(base):
+        base = os.path.join(os.path.dirname(os.path.abspath(data_yaml)), base)
+    return os.path.normpath(os.path.join(base, split_path))
+
+
+def list_images(image_dir, limit=None):
+    """列出目录中的图像文件"""
+    paths = sorted(p for p in glob.glob(os.path.join(image_dir, "**", "*"), recursive=True)
+                   if os.path.splitext(p)[1].lower() in IMAGE_EXTENSIONS)
+    return paths[:limit] if limit else paths
+
+
+def to_model_input(image, imgsz):
+    """BGR图像 -> 模型输入张量 (1, 3, imgsz, imgsz)，float32，范围 0~1"""
+    image, _, _ = letterbox(image, imgsz)
+    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    return np.ascontiguousarray(image.transpose(2, 0, 1)[np.newaxis], dtype=np.float32) / 255.0
+
+
+def backend_name(model_path):
+    """根据模型路径判断推理后端"""
+    path = model_path.rstrip("/\\")
+    if path.endswith("_openvino_model"):
+        return "openvino-int8" if "int8" in os.path.basename(path) else "openvino"
+    if path.endswith(".onnx"):
+        return "onnxruntime-int8" if path.endswith("_int8.onnx") else "onnxruntime"
+    return "pytorch"
+
+
+def quantize_onnx_int8(onnx_path, data_yaml, imgsz=320, calib_images=200):
+    """使用验证集图像对ONNX模型做静态INT8量化，返回量化后的模型路径"""
+    import onnx
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                          quantize_static)
+
+    image_paths = list_images(resolve_split_dir(data_yaml, "val"), limit=calib_images)
+    if not image_paths:
+        raise Exception("验证集中没有可用于INT8校准的图像")
+    print(f"📷 使用 {len(image_paths)} 张验证集图像进行INT8校准")
+
+    input_name = onnx.load(onnx_path, load_external_data=False).graph.input[0].name
+
+    class ValImageReader(CalibrationDataReader):
+        def __init__(self):
+            self.paths = iter(image_paths)
+
+        def get_next(self):
+            for path in self.paths:
+                image = cv2.imread(path)
+                if image is not None:
+                    return {input_name: to_model_input(image, imgsz)}
+            return None
+
+    int8_path = onnx_path[:-len(".onnx")] + "_int8.onnx"
+    quantize_static(
+        onnx_path,
+        int8_path,
+        ValImageReader(),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8
+    )
+
+    # 保留原模型的元数据（类别名称、输入尺寸等），供 ultralytics 加载时使用
+    source_model = onnx.load(onnx_path)
+    int8_model = onnx.load(int8_path)
+    del int8_model.metadata_props[:]
+    int8_model.metadata_props.extend(source_model.metadata_props)
+    onnx.save(int8_model, int8_path)
+    return int8_path
+
+
+def export_model(model_path, formats=("onnx",), int8=False, data_yaml="hand_gesture_data.yaml",
+                 imgsz=320, calib_images=200):
+    """导出模型，返回 {后端名称: 模型路径}"""
+    from ultralytics import YOLO
+
+    exported = {}
+    model = YOLO(model_path)
+    for fmt in formats:
+        if fmt == "onnx":
+            # 动态批量维度，支持多视频源批量推理
+            path = model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+            exported["onnxruntime"] = path
+            if int8:
+                exported["onnxruntime-int8"] = quantize_onnx_int8(path, data_yaml, imgsz, calib_images)
+        elif fmt == "openvino":
+            exported["openvino"] = model.export(format="openvino", imgsz=imgsz)
+            if int8:
+                # OpenVINO 的INT8量化由 NNCF 完成，使用数据配置文件中的验证集校准
+                exported["openvino-int8"] = model.export(format="openvino", imgsz=imgsz, int8=True,
+                                                         data=data_yaml)
+        else:
+            raise ValueError(f"不支持的导出格式: {fmt}")
+
+    for name, path in exported.items():
+        print(f"✅ 已导出 {name}: {path}")
+    return exported
+
+
+def benchmark_backends(model_paths, images, imgsz=320, runs=50, warmup=5):
+    """对比各后端的推理延迟，并检查检测到的手势类别是否与第一个模型一致"""
+    from ultralytics import YOLO
+
+    report = []
+    reference = None
+    for model_path in model_paths:
+        model = YOLO(model_path, task="detect")
+
+        def predict(image):
+            return model(image, conf=0.6, iou=0.5, imgsz=imgsz, verbose=False)[0]
+
+        for i in range(warmup):
+            predict(images[i % len(images)])
+
+        latencies = []
+        for i in range(runs):
+            start = time.perf_counter()
+            predict(images[i % len(images)])
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        # 每张图像检测到的类别集合
+        classes = [sorted(int(c) for c in predict(image).boxes.cls) for image in images]
+        if reference is None:
+            reference = classes
+        agreement = sum(a == b for a, b in zip(classes, reference)) / len(images)
+
+        latencies = np.array(latencies)
+        report.append({
+            "backend": backend_name(model_path),
+            "model": model_path,
+            "mean_ms": float(latencies.mean()),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "class_agreement": agreement
+        })
+    return report
+
+
+def print_report(report):
+    """打印后端延迟对比表"""
+    print()
+    print(f"{'后端':<18}{'平均(ms)':>10}{'P50(ms)':>10}{'P95(ms)':>10}{'类别一致率':>12}  模型")
+    print("-" * 80)
+    for r in report:
+        print(f"{r['backend']:<18}{r['mean_ms']:>10.2f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+              f"{r['class_agreement']:>12.1%}  {r['model']}")
+    print()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="导出 ONNX / OpenVINO 模型并对比各后端延迟")
+    parser.add_argument("model", help="训练好的 .pt 模型路径")
+    parser.add_argument("--formats", nargs="+", choices=["onnx", "openvino"], default=["onnx"],
+                        help="导出格式")
+    parser.add_argument("--int8", action="store_true", help="额外导出静态INT8量化模型")
+    parser.add_argument("--data", default="hand_gesture_data.yaml", help="数据配置文件（INT8校准使用验证集）")
+    parser.add_argument("--imgsz", type=int, default=320, help="模型输入尺寸（与 detect_gestures 保持一致）")
+    parser.add_argument("--calib-images", type=int, default=200, help="INT8校准使用的最大图像数")
+    parser.add_argument("--benchmark", action="store_true", help="导出后输出各后端延迟对比报告")
+    parser.add_argument("--runs", type=int, default=50, help="延迟测试的推理次数")
+    args = parser.parse_args()
+
+    exported = export_model(args.model, args.formats, args.int8, args.data, args.imgsz, args.calib_images)
+
+    if args.benchmark:
+        image_paths = list_images(resolve_split_dir(args.data, "val"), limit=20)
+        images = [img for img in (cv2.imread(p) for p in image_paths) if img is not None]
+        if not images:
+            # 没有验证集图像时使用随机图像测试延迟
+            print("⚠️  未找到验证集图像，使用随机图像测试延迟")
+            images = [np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)]
+        report = benchmark_backends([args.model] + list(exported.values()), images, args.imgsz, args.runs)
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import cv2
+import numpy as np
+
+from gesture_state import make_thumbnail
+
+"""
+运动门控
+在缩小的灰度缩略图上做帧差，画面中发生变化的像素比例低于阈值时跳过模型推理，沿用上一次的结果；
+每隔 refresh_interval 帧强制推理一次，避免长时间使用过期的结果。
+无人或画面静止时几乎不再运行模型
+"""
+
+
+class MotionGate:
+    def __init__(self, threshold=0.01, refresh_interval=30, pixel_threshold=15, thumbnail_size=(64, 48)):
+        """threshold 为判定有运动的变化像素比例，refresh_interval 为强制推理的间隔（帧，0 表示不强制），
+        pixel_threshold 为单个像素灰度变化超过多少才算变化"""
+        self.threshold = threshold
+        self.refresh_interval = refresh_interval
+        self.pixel_threshold = pixel_threshold
+        self.thumbnail_size = thumbnail_size
+
+        # 最近一次推理时的缩略图，与其比较可以累计缓慢的变化
+        self.reference = None
+        self.frames_since_process = 0
+        self.motion = 0.0
+
+        # 统计信息
+        self.processed_frames = 0
+        self.skipped_frames = 0
+
+    def should_process(self, frame):
+        """当前帧是否需要运行模型；返回 True 时以该帧作为新的参考帧"""
+        thumbnail = make_thumbnail(frame, self.thumbnail_size)
+
+        if self.reference is not None:
+            changed = cv2.absdiff(thumbnail, self.reference) > self.pixel_threshold
+            self.motion = float(np.count_nonzero(changed)) / changed.size
+            refresh_due = self.refresh_interval and self.frames_since_process + 1 >= self.refresh_interval
+            if self.motion < self.threshold and not refresh_due:
+                self.frames_since_process += 1
+                self.skipped_frames += 1
+                return False
+
+        self.reference = thumbnail
+        self.frames_since_process = 0
+        self.processed_frames += 1
+        return True
+
+    @property
+    def skip_ratio(self):
+        """跳过推理的帧占总帧数的比例"""
+        total = self.processed_frames + self.skipped_frames
+        return self.skipped_frames / total if total else 0.0
+
+    def print_stats(self, prefix=""):
+        """打印跳过推理的帧数"""
+        total = self.processed_frames + self.skipped_frames
+        print(f"📊 {prefix}运动门控跳过 {self.skipped_frames}/{total} 帧（{self.skip_ratio:.1%}），"
+              f"模型实际运行 {self.processed_frames} 帧")
@@ -1,7 +1,15 @@
+import argparse
 import cv2
 import numpy as np
 import time
-from PIL import Image, ImageDraw, ImageFont
+from collections import namedtuple
+from PIL import ImageFont
+from threaded_capture import open_capture
+from text_renderer import GlyphAtlasRenderer
+from skin_segmenter import FastSkinSegmenter
+from capture_config import CaptureConfig, add_capture_arguments
+from gesture_state import GestureStateMachine, print_gesture_event
+from metrics import FrameMetrics, add_metrics_arguments, print_summary, start_exporters
 
 # 手势类别映射
 gesture_classes = {
@@ -15,29 +23,44 @@ gesture_classes = {
     7: "布"
 }
 
+# 手势名称到类别ID的反向映射
+gesture_ids = {name: cls for cls, name in gesture_classes.items()}
+
+# 手指计数结果：count 为手指数量，tips 为指尖坐标 (K, 2)，angles 为每个凸缺陷的角度（度）；
+# starts/fars 为被判定为手指间凹陷的缺陷起点和最深点 (K, 2)，hull 为凸包，供绘制使用
+FingerCountResult = namedtuple("FingerCountResult", ["count", "tips", "angles", "starts", "fars", "hull"])
+
 class OpenCVHandGestureRecognizer:
-    def __init__(self):
-        """初始化基于OpenCV的手势识别器"""
-        # 打开摄像头
-        self.cap = cv2.VideoCapture(0)
-        if not self.cap.isOpened():
-            raise Exception("无法打开摄像头")
+    def __init__(self, source=0, fast_segmentation=False, segmentation_scale=0.5, min_defect_depth=0,
+                 target_fps=None, capture_config=None, stable_frames=5, stable_interval=2):
+        """初始化基于OpenCV的手势识别器，source 为 None 时不打开摄像头，也可以传入 FixtureCapture 等采集对象
         
-        # 设置摄像头分辨率
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+        fast_segmentation 为 True 时使用预分配缓冲区、在缩小图像上完成的快速肤色分割，
+        此时 preprocess_frame 返回缩小后的掩码，find_hand_contour 返回原始分辨率下的轮廓；
+        min_defect_depth 为手指间凹陷的最小深度（像素），默认 0 即只按角度判断；
+        实时识别时同一手势连续 stable_frames 帧后确认，之后每 stable_interval 帧才运行一次识别
+        """
+        # 打开摄像头（后台线程采集，只保留最新帧）
+        self.cap = open_capture(source, width=640, height=480, config=capture_config)
         
-        # 用于计算帧率
-        self.prev_time = 0
+        # 各阶段延迟指标和平滑帧率（target_fps 为告警用的目标帧率）
+        self.metrics = FrameMetrics(target_fps=target_fps)
         self.fps = 0
         
         # 皮肤颜色范围（HSV）
         self.lower_skin = np.array([0, 20, 70], dtype=np.uint8)
         self.upper_skin = np.array([20, 255, 255], dtype=np.uint8)
         
-        # 用于存储之前的手势
-        self.prev_gesture = None
-        self.gesture_count = 0
+        # 快速肤色分割（可选）
+        self.segmenter = None
+        if fast_segmentation:
+            self.segmenter = FastSkinSegmenter(self.lower_skin, self.upper_skin, scale=segmentation_scale)
+        
+        # 凸缺陷深度阈值（像素）
+        self.min_defect_depth = min_defect_depth
+        
+        # 手势状态机：去抖（prev_gesture / gesture_count），手势稳定时降低识别频率
+        self.gesture_state = GestureStateMachine(stable_frames, stable_interval)
         
         # 加载中文字体
         try:
@@ -50,10 +73,16 @@ class OpenCVHandGestureRecognizer:
             print("💡 尝试使用默认字体")
             self.font = ImageFont.load_default()
         
+        # 文字渲染器：预先光栅化手势名称，其余文字首次绘制时光栅化并缓存
+        self.text_renderer = GlyphAtlasRenderer(self.font, preload=gesture_classes.values())
+        
         print("✅ 基于OpenCV的手势识别系统已初始化")
     
     def preprocess_frame(self, frame):
         """预处理帧图像"""
+        if self.segmenter is not None:
+            return self.segmenter.segment(frame)
+        
         # 转换为HSV颜色空间
         hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
         
@@ -70,64 +99,66 @@ class OpenCVHandGestureRecognizer:
         
         return mask
     
-    def find_hand_contour(self, mask):
-        """查找手部轮廓"""
-        # 查找轮廓
-        contours, _ = cv2.findContours(mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    def find_hand_contours(self, mask, max_count=1):
+        """按面积从大到小返回最多 max_count 个候选手部轮廓（面积足够大，坐标为原始分辨率）"""
+        # 只查找外轮廓（内部空洞的面积总小于外轮廓，不会成为候选）
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
-        # 找到最大的轮廓（假设是手）
-        if contours:
-            max_contour = max(contours, key=cv2.contourArea)
-            # 检查轮廓面积是否足够大
-            if cv2.contourArea(max_contour) > 1000:
-                return max_contour
+        # 面积阈值（原始分辨率下为1000）
+        min_area = 1000
+        if self.segmenter is not None:
+            min_area = self.segmenter.scale_area(min_area)
+        
+        # 面积只计算一次
+        candidates = [(cv2.contourArea(contour), contour) for contour in contours]
+        candidates = [item for item in candidates if item[0] > min_area]
+        candidates.sort(key=lambda item: item[0], reverse=True)
         
-        return None
+        if self.segmenter is not None:
+            return [self.segmenter.scale_contour(contour) for _, contour in candidates[:max_count]]
+        return [contour for _, contour in candidates[:max_count]]
+    
+    def find_hand_contour(self, mask):
+        """查找手部轮廓（快速分割模式下在缩小的掩码上查找，再把轮廓坐标放大回原始分辨率）"""
+        # 找到最大的轮廓（假设是手）
+        contours = self.find_hand_contours(mask, 1)
+        return contours[0] if contours else None
     
-    def count_fingers(self, contour, frame):
-        """计算伸直的手指数量"""
+    def count_fingers(self, contour):
+        """计算伸直的手指数量（不绘制，可在无界面/批处理模式下使用），返回 FingerCountResult"""
         # 创建凸包
         hull = cv2.convexHull(contour)
         
-        # 绘制凸包
-        cv2.drawContours(frame, [hull], -1, (0, 255, 0), 2)
-        
         # 计算凸缺陷
         hull_indices = cv2.convexHull(contour, returnPoints=False)
         defects = cv2.convexityDefects(contour, hull_indices)
         
-        # 手指数量
-        finger_count = 0
-        
-        # 存储指尖点
-        finger_tips = []
+        empty = np.empty((0, 2), dtype=contour.dtype)
+        tips, starts, fars = empty, empty, empty
+        angles = np.empty(0, dtype=np.float64)
         
         if defects is not None:
-            for i in range(defects.shape[0]):
-                s, e, f, d = defects[i, 0]
-                start = tuple(contour[s][0])
-                end = tuple(contour[e][0])
-                far = tuple(contour[f][0])
-                
-                # 计算三角形边长
-                a = np.linalg.norm(np.array(end) - np.array(start))
-                b = np.linalg.norm(np.array(far) - np.array(start))
-                c = np.linalg.norm(np.array(end) - np.array(far))
-                
-                # 使用余弦定理计算角度
-                angle = np.arccos((b**2 + c**2 - a**2) / (2 * b * c)) * 180 / np.pi
-                
-                # 如果角度小于90度，认为是手指之间的凹陷
-                if angle < 90:
-                    finger_count += 1
-                    # 绘制指尖点
-                    cv2.circle(frame, end, 5, (0, 0, 255), -1)
-                    finger_tips.append(end)
-                    
-                    # 绘制连接线
-                    cv2.line(frame, start, end, (0, 255, 0), 2)
-                    cv2.line(frame, end, far, (0, 255, 0), 2)
-                    cv2.line(frame, far, start, (0, 255, 0), 2)
+            # 一次性取出所有缺陷的起点、终点和最深点 (N, 2)
+            defects = defects.reshape(-1, 4)
+            points = contour.reshape(-1, 2)
+            start = points[defects[:, 0]]
+            end = points[defects[:, 1]]
+            far = points[defects[:, 2]]
+            
+            # 计算三角形边长
+            a = np.linalg.norm(end - start, axis=1)
+            b = np.linalg.norm(far - start, axis=1)
+            c = np.linalg.norm(end - far, axis=1)
+            
+            # 使用余弦定理计算角度（退化三角形得到 NaN，不会被判定为手指）
+            with np.errstate(divide="ignore", invalid="ignore"):
+                angles = np.degrees(np.arccos((b**2 + c**2 - a**2) / (2 * b * c)))
+            
+            # 角度小于90度且深度超过阈值的缺陷，认为是手指之间的凹陷（深度为定点数，除以256得到像素）
+            is_finger = (angles < 90) & (defects[:, 3] > self.min_defect_depth * 256)
+            tips, starts, fars = end[is_finger], start[is_finger], far[is_finger]
+        
+        finger_count = len(tips)
         
         # 检查是否有手掌（如果没有检测到凹陷，可能是拳头或布）
         if finger_count == 0:
@@ -138,10 +169,20 @@ class OpenCVHandGestureRecognizer:
                 circularity = 4 * np.pi * (area / (perimeter ** 2))
                 if circularity > 0.7:
                     # 圆形轮廓，可能是拳头
-                    return 0, finger_tips
+                    return FingerCountResult(0, tips, angles, starts, fars, hull)
         
         # 实际手指数量是凹陷数量 + 1
-        return finger_count + 1, finger_tips
+        return FingerCountResult(finger_count + 1, tips, angles, starts, fars, hull)
+    
+    def draw_finger_defects(self, frame, result):
+        """绘制凸包、指尖点和手指间凹陷的三角形"""
+        cv2.drawContours(frame, [result.hull], -1, (0, 255, 0), 2)
+        for start, end, far in zip(result.starts.tolist(), result.tips.tolist(), result.fars.tolist()):
+            start, end, far = tuple(start), tuple(end), tuple(far)
+            cv2.circle(frame, end, 5, (0, 0, 255), -1)
+            cv2.line(frame, start, end, (0, 255, 0), 2)
+            cv2.line(frame, end, far, (0, 255, 0), 2)
+            cv2.line(frame, far, start, (0, 255, 0), 2)
     
     def recognize_gesture(self, finger_count, contour, frame):
         """根据手指数量和轮廓特征识别手势"""
@@ -176,6 +217,27 @@ class OpenCVHandGestureRecognizer:
         else:
             return "布", 0.85
     
+    def process_frame(self, frame):
+        """无界面处理单帧（BGR），返回检测结果列表"""
+        mask = self.preprocess_frame(frame)
+        contour = self.find_hand_contour(mask)
+        if contour is None:
+            return []
+        
+        finger_count = self.count_fingers(contour).count
+        gesture_name, confidence = self.recognize_gesture(finger_count, contour, frame)
+        return [self.make_detection(contour, gesture_name, confidence)]
+    
+    def make_detection(self, contour, gesture_name, confidence):
+        """手部轮廓和识别结果 -> 检测结果字典（与其他识别器的格式一致）"""
+        x, y, w, h = cv2.boundingRect(contour)
+        return {
+            "class_id": gesture_ids[gesture_name],
+            "gesture": gesture_name,
+            "confidence": confidence,
+            "bbox": [x, y, x + w, y + h]
+        }
+    
     def draw_finger_contour(self, frame, contour, finger_tips):
         """绘制手指轮廓"""
         if contour is not None:
@@ -183,9 +245,9 @@ class OpenCVHandGestureRecognizer:
             cv2.drawContours(frame, [contour], -1, (255, 0, 0), 2)
             
             # 绘制指尖连线
-            if len(finger_tips) >= 2:
-                for i in range(len(finger_tips) - 1):
-                    cv2.line(frame, finger_tips[i], finger_tips[i+1], (0, 255, 255), 2)
+            finger_tips = [tuple(tip) for tip in np.asarray(finger_tips).tolist()]
+            for i in range(len(finger_tips) - 1):
+                cv2.line(frame, finger_tips[i], finger_tips[i+1], (0, 255, 255), 2)
     
     def run(self):
         """运行基于OpenCV的手势识别系统"""
@@ -214,78 +276,89 @@ class OpenCVHandGestureRecognizer:
         print("   - 按 's' 键保存当前图像")
         print()
         
+        # 上一次识别的结果（跳过识别的帧沿用）
+        mask = None
+        contour = None
+        
         try:
             while True:
                 # 读取帧
-                ret, frame = self.cap.read()
+                with self.metrics.time("capture"):
+                    ret, frame = self.cap.read()
+                    if ret:
+                        # 镜像翻转帧（使显示更自然）
+                        frame = cv2.flip(frame, 1)
                 if not ret:
                     print("无法读取摄像头帧")
                     break
                 
-                # 镜像翻转帧（使显示更自然）
-                frame = cv2.flip(frame, 1)
+                # 手势稳定且画面没有变化时跳过识别，沿用上一次的结果
+                if self.gesture_state.should_run(frame):
+                    # 预处理帧
+                    with self.metrics.time("preprocess"):
+                        mask = self.preprocess_frame(frame)
+                    
+                    # 查找手部轮廓并计算手指数量（轮廓分析相当于该识别器的推理阶段）
+                    with self.metrics.time("inference"):
+                        contour = self.find_hand_contour(mask)
+                        if contour is not None:
+                            finger_result = self.count_fingers(contour)
+                            finger_count = finger_result.count
+                    
+                    # 识别手势，传入轮廓和帧信息
+                    gesture_name = None
+                    if contour is not None:
+                        with self.metrics.time("postprocess"):
+                            gesture_name, confidence = self.recognize_gesture(finger_count, contour, frame)
+                            # 获取手部边界框
+                            x, y, w, h = cv2.boundingRect(contour)
+                    
+                    # 更新手势状态，输出去抖后的手势事件
+                    event = self.gesture_state.update(frame, gesture_name)
+                    if event is not None:
+                        print_gesture_event(event)
+                
+                render_start = time.perf_counter()
                 
                 # 复制原始帧用于显示
                 display_frame = frame.copy()
                 
-                # 预处理帧
-                mask = self.preprocess_frame(frame)
-                
-                # 查找手部轮廓
-                contour = self.find_hand_contour(mask)
-                
-                # 计算帧率
-                current_time = time.time()
-                self.fps = 1 / (current_time - self.prev_time) if (current_time - self.prev_time) > 0 else 0
-                self.prev_time = current_time
-                
-                # 使用PIL绘制帧率，解决汉字乱码问题
-                pil_img = Image.fromarray(cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB))
-                draw = ImageDraw.Draw(pil_img)
+                # 使用缓存的文字掩码绘制帧率，解决汉字乱码问题
                 fps_text = f"FPS: {self.fps:.1f}"
-                draw.text((10, 10), fps_text, font=self.font, fill=(0, 255, 0))
-                display_frame = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
+                self.text_renderer.draw_text(display_frame, fps_text, (10, 10), (0, 255, 0))
                 
                 # 如果找到手部轮廓
                 if contour is not None:
-                    # 计算手指数量
-                    finger_count, finger_tips = self.count_fingers(contour, display_frame)
-                    
-                    # 识别手势，传入轮廓和帧信息
-                    gesture_name, confidence = self.recognize_gesture(finger_count, contour, display_frame)
-                    
-                    # 绘制手指轮廓
-                    self.draw_finger_contour(display_frame, contour, finger_tips)
-                    
-                    # 获取手部边界框
-                    x, y, w, h = cv2.boundingRect(contour)
+                    # 绘制凸包、手指间凹陷和手指轮廓
+                    self.draw_finger_defects(display_frame, finger_result)
+                    self.draw_finger_contour(display_frame, contour, finger_result.tips)
                     
                     # 绘制边界框
                     cv2.rectangle(display_frame, (x - 20, y - 20), (x + w + 20, y + h + 20), 
                                  (0, 255, 0), 2)
                     
-                    # 使用PIL绘制中文，解决汉字乱码问题
-                    # 将OpenCV图像转换为PIL图像
-                    pil_img = Image.fromarray(cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB))
-                    draw = ImageDraw.Draw(pil_img)
-                    
+                    # 使用缓存的文字掩码绘制中文，解决汉字乱码问题
                     # 显示手势名称和置信度
                     label = f"{gesture_name}: {confidence:.2f}"
-                    draw.text((x - 20, y - 30), label, font=self.font, fill=(0, 255, 0))
+                    self.text_renderer.draw_text(display_frame, label, (x - 20, y - 30), (0, 255, 0))
                     
                     # 显示手指数量
                     finger_text = f"手指数量: {finger_count}"
-                    draw.text((x - 20, y + h + 50), finger_text, font=self.font, fill=(0, 255, 0))
-                    
-                    # 将PIL图像转换回OpenCV图像
-                    display_frame = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
+                    self.text_renderer.draw_text(display_frame, finger_text, (x - 20, y + h + 50), (0, 255, 0))
+                
+                self.metrics.record("render", time.perf_counter() - render_start)
                 
                 # 显示原始帧和掩码
-                cv2.imshow("基于OpenCV的实时手势识别", display_frame)
-                cv2.imshow("皮肤掩码", mask)
+                with self.metrics.time("display"):
+                    cv2.imshow("基于OpenCV的实时手势识别", display_frame)
+                    cv2.imshow("皮肤掩码", mask)
+                    key = cv2.waitKey(1) & 0xFF
+                
+                # 平滑帧率
+                self.metrics.set_dropped_frames(self.cap.dropped_frames)
+                self.fps = self.metrics.frame_done()
                 
                 # 处理按键
-                key = cv2.waitKey(1) & 0xFF
                 if key == ord('q'):
                     # 按 'q' 键退出
                     break
@@ -303,15 +376,41 @@ class OpenCVHandGestureRecognizer:
         # 释放资源
         self.cap.release()
         cv2.destroyAllWindows()
+        self.gesture_state.print_stats()
+        print_summary(self.metrics)
         print("✅ 基于OpenCV的手势识别系统已关闭")
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="基于OpenCV的实时手势识别系统")
+    parser.add_argument("--fast-segmentation", action="store_true",
+                        help="快速肤色分割：预分配缓冲区，在缩小的图像上做形态学处理")
+    parser.add_argument("--segmentation-scale", type=float, default=0.5,
+                        help="快速肤色分割使用的缩放比例")
+    parser.add_argument("--stable-frames", type=int, default=5, help="连续多少帧相同才确认手势")
+    parser.add_argument("--stable-interval", type=int, default=2,
+                        help="手势稳定后每 N 帧运行一次识别（1 表示每帧识别）")
+    add_capture_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    
     try:
         # 创建手势识别器实例
-        recognizer = OpenCVHandGestureRecognizer()
+        recognizer = OpenCVHandGestureRecognizer(fast_segmentation=args.fast_segmentation,
+                                                 segmentation_scale=args.segmentation_scale,
+                                                 target_fps=args.target_fps,
+                                                 capture_config=CaptureConfig.from_args(args),
+                                                 stable_frames=args.stable_frames,
+                                                 stable_interval=args.stable_interval)
+        # 启动指标导出（Prometheus 接口 / JSON 文件）
+        exporters = start_exporters(recognizer.metrics, args.metrics_port, args.metrics_json,
+                                    args.metrics_interval)
         # 运行实时识别
-        recognizer.run()
+        try:
+            recognizer.run()
+        finally:
+            for exporter in exporters:
+                exporter.stop()
     except Exception as e:
         print(f"❌ 发生错误: {e}")
         print()
@@ -1,7 +1,19 @@
+# 最先导入：启动时间线以此为起点
+from startup import PROCESS_START, BackgroundTask, StartupTimeline
+import argparse
 import cv2
 import numpy as np
-import mediapipe as mp
 import time
+from threaded_capture import open_capture
+from pipeline import Pipeline
+from motion_gate import MotionGate
+from capture_config import CaptureConfig, add_capture_arguments
+from metrics import FrameMetrics, add_metrics_arguments, print_summary, start_exporters
+from landmark_classifier import LandmarkClassifier, append_samples
+from session_recorder import SessionRecorder
+
+# 模块导入完成的时刻（mediapipe 不在这里导入，见 load_mediapipe）
+IMPORTS_DONE = time.perf_counter()
 
 # 手势类别映射
 gesture_classes = {
@@ -15,120 +27,245 @@ gesture_classes = {
     7: "布"
 }
 
+# 手势名称到类别ID的反向映射
+gesture_ids = {name: cls for cls, name in gesture_classes.items()}
+
+# 关键点索引
+THUMB_TIP = 4  # 拇指尖端
+THUMB_BASE = 2  # 拇指根部
+FINGER_TIPS = [8, 12, 16, 20]  # 食指、中指、无名指、小指尖端
+FINGER_BASES = [6, 10, 14, 18]  # 食指、中指、无名指、小指根部（用于判断手指是否伸直）
+PINKY_MCP = 17  # 小指掌指关节（用于判断拇指是否张开）
+
+def landmarks_to_array(multi_hand_landmarks):
+    """将MediaPipe检测到的所有手部关键点一次性转换为 (手数, 21, 3) 的 float32 数组"""
+    return np.array(
+        [[(lm.x, lm.y, lm.z) for lm in hand_landmarks.landmark] for hand_landmarks in multi_hand_landmarks],
+        dtype=np.float32
+    ).reshape(-1, 21, 3)
+
+def analyze_hands(landmarks, w=None, h=None, classifier=None):
+    """对所有手同时计算手指状态、手势类别和边界框
+    
+    landmarks 为 (手数, 21, 3) 数组，返回字典：
+    landmarks、thumb_extended (手数,)、fingers_extended (手数, 4)、finger_count (手数,)、
+    all_bent (手数,)、class_ids (手数,)、confidences (手数,)，
+    给定 classifier（LandmarkClassifier）时手势类别和置信度由分类器给出，并包含 probabilities (手数, 类别数)；
+    给定 w 和 h 时还包含图像坐标系下的 bboxes (手数, 4)
+    """
+    x = landmarks[:, :, 0]
+    y = landmarks[:, :, 1]
+    
+    # 拇指：尖端比根部离小指根部更远说明拇指张开（与左右手无关）
+    thumb_extended = (np.hypot(x[:, THUMB_TIP] - x[:, PINKY_MCP], y[:, THUMB_TIP] - y[:, PINKY_MCP]) >
+                      np.hypot(x[:, THUMB_BASE] - x[:, PINKY_MCP], y[:, THUMB_BASE] - y[:, PINKY_MCP]))
+    # 其他四根手指：尖端y坐标小于根部y坐标说明手指伸直
+    fingers_extended = y[:, FINGER_TIPS] < y[:, FINGER_BASES]
+    finger_count = thumb_extended.astype(np.int32) + fingers_extended.sum(axis=1)
+    
+    # 握拳：所有手指都弯曲
+    all_bent = ~thumb_extended & ~fingers_extended.any(axis=1)
+    # 剪刀：无名指和小指弯曲
+    ring_pinky_bent = (y[:, 16] > y[:, 14]) & (y[:, 20] > y[:, 18])
+    
+    # 根据手指数量和形状确定手势类别和置信度
+    conditions = [
+        finger_count == 1,
+        (finger_count == 2) & ring_pinky_bent,
+        finger_count == 2,
+        finger_count == 3,
+        finger_count == 4,
+        finger_count == 5,
+        all_bent
+    ]
+    class_ids = np.select(conditions, [0, 5, 1, 2, 3, 4, 6], default=7)
+    confidences = np.select(conditions, [0.95, 0.90, 0.90, 0.85, 0.85, 0.90, 0.85], default=0.85)
+    
+    features = {
+        "landmarks": landmarks,
+        "thumb_extended": thumb_extended,
+        "fingers_extended": fingers_extended,
+        "finger_count": finger_count,
+        "all_bent": all_bent,
+        "class_ids": class_ids,
+        "confidences": confidences
+    }
+    
+    if classifier is not None:
+        # 学习得到的分类器给出真实的类别概率
+        features["class_ids"], features["confidences"], features["probabilities"] = classifier.predict(landmarks)
+    
+    if w is not None and h is not None:
+        # 与逐点 int(x * w) 相同的截断方式，并以 (w, h, 0, 0) 作为初始极值
+        points = np.trunc(landmarks[:, :, :2].astype(np.float64) * (w, h)).astype(np.int32)
+        mins = np.minimum(points.min(axis=1), (w, h))
+        maxs = np.maximum(points.max(axis=1), 0)
+        features["bboxes"] = np.concatenate([mins, maxs], axis=1)
+    
+    return features
+
+def detections_from_features(features):
+    """analyze_hands 的结果（包含 bboxes）-> 检测结果字典列表；features 为 None 时返回空列表"""
+    if features is None:
+        return []
+    return [{
+        "class_id": int(cls),
+        "gesture": gesture_classes[int(cls)],
+        "confidence": float(conf),
+        "bbox": [int(v) for v in bbox]
+    } for cls, conf, bbox in zip(features["class_ids"], features["confidences"], features["bboxes"])]
+
+def load_mediapipe():
+    """导入 mediapipe 并创建手部检测模型（可以放在后台线程中与打开摄像头同时进行），返回 (mp.solutions, Hands)"""
+    import mediapipe as mp
+    hands = mp.solutions.hands.Hands(
+        static_image_mode=False,
+        max_num_hands=2,
+        min_detection_confidence=0.7,
+        min_tracking_confidence=0.5
+    )
+    return mp.solutions, hands
+
 class OptimizedHandGestureRecognizer:
-    def __init__(self):
-        """初始化优化后的手势识别器"""
+    def __init__(self, source=0, target_fps=None, capture_config=None, motion_threshold=None, motion_refresh=30,
+                 classifier_path=None, samples_path=None, record_path=None, record_interval=1,
+                 warmup=True, timeline=None):
+        """初始化优化后的手势识别器，source 为 None 时不打开摄像头，也可以传入 FixtureCapture 等采集对象
+        
+        motion_threshold 不为 None 时启用运动门控：画面静止时跳过 MediaPipe 推理，沿用上一次的结果；
+        classifier_path 为 landmark_classifier.py 训练的权重文件，不指定时使用规则判断手势；
+        samples_path 不为 None 时按数字键 0~7 把当前的手部关键点录制为对应类别的训练样本；
+        record_path 不为 None 时把会话（每 record_interval 帧一帧图像，以及每帧的关键点和识别结果）录制到该目录；
+        warmup 为 True 时在处理第一帧之前用空白帧预热模型，timeline 为记录各启动阶段耗时的 StartupTimeline
+        """
+        self.timeline = timeline if timeline is not None else StartupTimeline()
+        self.startup_reported = False
+        
+        # 在后台线程中导入 mediapipe 并创建手部检测模型，同时打开摄像头
+        model_task = BackgroundTask(load_mediapipe, name="加载模型", timeline=self.timeline)
+        
+        # 打开摄像头（后台线程采集，只保留最新帧）
+        with self.timeline.phase("打开视频源"):
+            self.cap = open_capture(source, width=640, height=480, config=capture_config)
+        
         # 初始化MediaPipe手部检测
-        self.mp_hands = mp.solutions.hands
-        self.mp_drawing = mp.solutions.drawing_utils
-        self.mp_drawing_styles = mp.solutions.drawing_styles
+        with self.timeline.phase("等待模型"):
+            try:
+                solutions, self.hands = model_task.result()
+            except Exception:
+                if self.cap is not None:
+                    self.cap.release()
+                raise
+        self.mp_hands = solutions.hands
+        self.mp_drawing = solutions.drawing_utils
+        self.mp_drawing_styles = solutions.drawing_styles
         
-        # 配置手部检测模型
-        self.hands = self.mp_hands.Hands(
-            static_image_mode=False,
-            max_num_hands=2,
-            min_detection_confidence=0.7,
-            min_tracking_confidence=0.5
-        )
+        # 预热：模型初始化等一次性开销发生在第一帧真实画面之前
+        if warmup:
+            with self.timeline.phase("模型预热"):
+                width = capture_config.width if capture_config is not None and capture_config.width else 640
+                height = capture_config.height if capture_config is not None and capture_config.height else 480
+                self.hands.process(np.zeros((height, width, 3), dtype=np.uint8))
+        
+        # 运动门控（可选），以及跳过推理时沿用的上一次结果
+        self.motion_gate = MotionGate(motion_threshold, motion_refresh) if motion_threshold is not None else None
+        self.last_results = None
+        self.last_features = None
         
-        # 打开摄像头
-        self.cap = cv2.VideoCapture(0)
-        if not self.cap.isOpened():
-            raise Exception("无法打开摄像头")
+        # 关键点手势分类器（可选）和训练样本录制
+        self.classifier = LandmarkClassifier.load(classifier_path) if classifier_path else None
+        self.samples_path = samples_path
         
-        # 设置摄像头分辨率
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+        # 会话录制（可选，后台线程写入）
+        self.recorder = None
+        if record_path:
+            fps = capture_config.fps if capture_config is not None and capture_config.fps else 30.0
+            self.recorder = SessionRecorder(record_path, fps, record_interval, source=source)
         
-        # 用于计算帧率
-        self.prev_time = 0
+        # 各阶段延迟指标和平滑帧率（target_fps 为告警用的目标帧率）
+        self.metrics = FrameMetrics(target_fps=target_fps)
         self.fps = 0
         
+        if self.classifier is not None:
+            print(f"✅ 已加载关键点手势分类器：{classifier_path}")
         print("✅ 优化后的手势识别系统已初始化")
     
+    def report_startup(self):
+        """第一帧识别完成后输出一次启动时间线"""
+        if self.startup_reported:
+            return
+        self.startup_reported = True
+        self.timeline.mark("首帧识别完成")
+        self.timeline.print_report()
+    
     def count_fingers(self, hand_landmarks):
         """根据手部关键点计算手指数量"""
-        # 手指尖端关键点索引
-        finger_tips = [8, 12, 16, 20]  # 食指、中指、无名指、小指
-        thumb_tip = 4  # 拇指
-        
-        # 手指根部关键点索引（用于判断手指是否伸直）
-        finger_bases = [6, 10, 14, 18]  # 食指、中指、无名指、小指
-        
-        # 获取手腕关键点（用于参考）
-        wrist = hand_landmarks.landmark[0]
-        
-        # 计数伸直的手指
-        finger_count = 0
-        
-        # 检查拇指
-        # 拇指的判断比较特殊，需要考虑左右手
-        # 对于右手，拇指尖端x坐标小于拇指根部x坐标时，拇指伸直
-        # 对于左手，拇指尖端x坐标大于拇指根部x坐标时，拇指伸直
-        thumb_base = hand_landmarks.landmark[2]
-        if hand_landmarks.landmark[thumb_tip].x < hand_landmarks.landmark[thumb_base].x:
-            # 右手拇指伸直
-            finger_count += 1
-        elif hand_landmarks.landmark[thumb_tip].x > hand_landmarks.landmark[thumb_base].x:
-            # 左手拇指伸直
-            finger_count += 1
-        
-        # 检查其他四根手指
-        for tip, base in zip(finger_tips, finger_bases):
-            # 如果手指尖端y坐标小于手指根部y坐标，说明手指伸直
-            if hand_landmarks.landmark[tip].y < hand_landmarks.landmark[base].y:
-                finger_count += 1
-        
-        return finger_count
+        features = analyze_hands(landmarks_to_array([hand_landmarks]))
+        return int(features["finger_count"][0])
     
     def recognize_gesture(self, hand_landmarks):
         """根据手部关键点识别手势"""
-        # 计算手指数量
-        finger_count = self.count_fingers(hand_landmarks)
+        return self.recognize_gestures(landmarks_to_array([hand_landmarks]))[0]
+    
+    def recognize_gestures(self, landmarks):
+        """对 (手数, 21, 3) 关键点数组中的所有手识别手势，返回 [(手势名称, 置信度), ...]"""
+        features = analyze_hands(landmarks, classifier=self.classifier)
+        return [(gesture_classes[int(cls)], float(conf))
+                for cls, conf in zip(features["class_ids"], features["confidences"])]
+    
+    def get_bounding_box(self, hand_landmarks, w, h):
+        """根据手部关键点计算图像坐标系下的边界框 (x_min, y_min, x_max, y_max)"""
+        features = analyze_hands(landmarks_to_array([hand_landmarks]), w, h)
+        return tuple(int(v) for v in features["bboxes"][0])
+    
+    def process_frame(self, frame):
+        """无界面处理单帧（BGR），返回检测结果列表"""
+        h, w, _ = frame.shape
+        results = self.hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
         
-        # 根据手指数量识别基本手势
-        if finger_count == 1:
-            return "数字1", 0.95
-        elif finger_count == 2:
-            # 检查是否是剪刀手势（食指和中指伸直，其他手指弯曲）
-            # 获取食指和中指尖端
-            index_tip = hand_landmarks.landmark[8]
-            middle_tip = hand_landmarks.landmark[12]
-            ring_tip = hand_landmarks.landmark[16]
-            pinky_tip = hand_landmarks.landmark[20]
-            
-            # 检查无名指和小指是否弯曲
-            if ring_tip.y > hand_landmarks.landmark[14].y and pinky_tip.y > hand_landmarks.landmark[18].y:
-                return "剪刀", 0.90
-            else:
-                return "数字2", 0.90
-        elif finger_count == 3:
-            return "数字3", 0.85
-        elif finger_count == 4:
-            return "数字4", 0.85
-        elif finger_count == 5:
-            return "数字5", 0.90
-        else:
-            # 检查是否是锤头手势（握拳）
-            # 检查所有手指尖端是否都低于手指根部
-            all_bent = True
-            for tip in [4, 8, 12, 16, 20]:
-                if tip == 4:  # 拇指
-                    if hand_landmarks.landmark[tip].x < hand_landmarks.landmark[2].x or \
-                       hand_landmarks.landmark[tip].x > hand_landmarks.landmark[2].x:
-                        all_bent = False
-                        break
-                else:  # 其他手指
-                    finger_index = tip // 4  # 0:食指, 1:中指, 2:无名指, 3:小指
-                    base_index = 6 + finger_index * 4
-                    if hand_landmarks.landmark[tip].y < hand_landmarks.landmark[base_index].y:
-                        all_bent = False
-                        break
-            
-            if all_bent:
-                return "锤头", 0.85
-            else:
-                return "布", 0.85
+        if not results.multi_hand_landmarks:
+            return []
+        
+        # 所有手的特征一次性计算
+        return detections_from_features(
+            analyze_hands(landmarks_to_array(results.multi_hand_landmarks), w, h, self.classifier))
+    
+    def analyze_results(self, frame, results):
+        """所有手的关键点一次性转换为数组，并同时计算手势和边界框；未检测到手部时返回 None"""
+        if not results.multi_hand_landmarks:
+            return None
+        h, w, _ = frame.shape
+        return analyze_hands(landmarks_to_array(results.multi_hand_landmarks), w, h, self.classifier)
+    
+    def record_frame(self, frame, features):
+        """录制模式下把原始帧（绘制前）、关键点和识别结果交给后台录制器"""
+        if self.recorder is None:
+            return
+        with self.metrics.time("record"):
+            self.recorder.record(frame, landmarks=None if features is None else features["landmarks"],
+                                 detections=detections_from_features(features))
+    
+    def close(self):
+        """释放摄像头、MediaPipe 和录制器"""
+        if self.cap is not None:
+            self.cap.release()
+        cv2.destroyAllWindows()
+        self.hands.close()
+        if self.recorder is not None:
+            self.recorder.close()
+    
+    def record_sample(self, key, features):
+        """录制模式下按数字键 0~7 把当前所有手的关键点保存为该类别的样本，返回是否处理了该按键"""
+        if not self.samples_path or not ord('0') <= key <= ord('7'):
+            return False
+        class_id = key - ord('0')
+        if features is None:
+            print("⚠️  未检测到手部，样本未保存")
+            return True
+        landmarks = features["landmarks"]
+        total = append_samples(self.samples_path, landmarks, [class_id] * len(landmarks))
+        print(f"✅ 已录制 {gesture_classes[class_id]} 样本 {len(landmarks)} 个（共 {total} 个）：{self.samples_path}")
+        return True
     
     def draw_hand_landmarks(self, frame, hand_landmarks):
         """绘制手部关键点和轮廓"""
@@ -168,8 +305,41 @@ class OptimizedHandGestureRecognizer:
         
         return frame
     
-    def run(self):
-        """运行优化后的手势识别系统"""
+    def draw_results(self, frame, results, features=None):
+        """在帧上绘制帧率、手部关键点、边界框和手势标签（features 为已计算好的 analyze_hands 结果）"""
+        # 绘制帧率
+        cv2.putText(frame, f"FPS: {self.fps:.1f}", (10, 30), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        
+        # 如果检测到手部
+        if results.multi_hand_landmarks:
+            if features is None:
+                features = self.analyze_results(frame, results)
+            
+            for i, hand_landmarks in enumerate(results.multi_hand_landmarks):
+                # 绘制手部关键点和轮廓
+                frame = self.draw_hand_landmarks(frame, hand_landmarks)
+                
+                # 识别手势
+                gesture_name = gesture_classes[int(features["class_ids"][i])]
+                confidence = float(features["confidences"][i])
+                
+                # 获取手部边界框
+                x_min, y_min, x_max, y_max = (int(v) for v in features["bboxes"][i])
+                
+                # 添加边界框和手势标签
+                cv2.rectangle(frame, (x_min - 20, y_min - 20), (x_max + 20, y_max + 20), 
+                             (0, 255, 0), 2)
+                
+                # 显示手势名称和置信度
+                label = f"{gesture_name}: {confidence:.2f}"
+                cv2.putText(frame, label, (x_min - 20, y_min - 30), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+        
+        return frame
+    
+    def print_banner(self):
+        """打印系统说明"""
         print("=" * 60)
         print("优化后的实时手势识别系统 v2.0")
         print("基于 MediaPipe 和 OpenCV")
@@ -194,102 +364,228 @@ class OptimizedHandGestureRecognizer:
         print("💡 操作说明：")
         print("   - 按 'q' 键退出程序")
         print("   - 按 's' 键保存当前图像")
+        if self.samples_path:
+            print("   - 按数字键 0~7 录制当前手势的训练样本：" +
+                  "、".join(f"{cls}={name}" for cls, name in gesture_classes.items()))
         print()
+    
+    def run(self):
+        """运行优化后的手势识别系统"""
+        self.print_banner()
         
         try:
             while True:
                 # 读取帧
-                ret, frame = self.cap.read()
+                with self.metrics.time("capture"):
+                    ret, frame = self.cap.read()
+                    if ret:
+                        # 镜像翻转帧（使显示更自然）
+                        frame = cv2.flip(frame, 1)
                 if not ret:
                     print("无法读取摄像头帧")
                     break
                 
-                # 镜像翻转帧（使显示更自然）
-                frame = cv2.flip(frame, 1)
+                # 画面静止时跳过推理，沿用上一次的结果
+                if self.motion_gate is None or self.motion_gate.should_process(frame):
+                    # 转换为RGB格式（MediaPipe需要RGB输入）
+                    with self.metrics.time("preprocess"):
+                        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                    
+                    # 处理帧，检测手部
+                    with self.metrics.time("inference"):
+                        self.last_results = self.hands.process(rgb_frame)
+                    
+                    # 计算手势和边界框
+                    with self.metrics.time("postprocess"):
+                        self.last_features = self.analyze_results(frame, self.last_results)
+                results, features = self.last_results, self.last_features
                 
-                # 转换为RGB格式（MediaPipe需要RGB输入）
-                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                # 录制会话（在绘制之前）
+                self.record_frame(frame, features)
                 
-                # 处理帧，检测手部
-                results = self.hands.process(rgb_frame)
+                # 绘制帧率、手部关键点和识别结果
+                with self.metrics.time("render"):
+                    frame = self.draw_results(frame, results, features)
                 
-                # 计算帧率
-                current_time = time.time()
-                self.fps = 1 / (current_time - self.prev_time) if (current_time - self.prev_time) > 0 else 0
-                self.prev_time = current_time
+                # 显示帧
+                with self.metrics.time("display"):
+                    cv2.imshow("优化后的实时手势识别", frame)
+                    key = cv2.waitKey(1) & 0xFF
                 
-                # 绘制帧率
-                cv2.putText(frame, f"FPS: {self.fps:.1f}", (10, 30), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+                # 平滑帧率
+                self.metrics.set_dropped_frames(self.cap.dropped_frames)
+                self.fps = self.metrics.frame_done()
+                self.report_startup()
                 
-                # 如果检测到手部
-                if results.multi_hand_landmarks:
-                    for hand_landmarks in results.multi_hand_landmarks:
-                        # 绘制手部关键点和轮廓
-                        frame = self.draw_hand_landmarks(frame, hand_landmarks)
-                        
-                        # 识别手势
-                        gesture_name, confidence = self.recognize_gesture(hand_landmarks)
-                        
-                        # 获取手部边界框
-                        h, w, _ = frame.shape
-                        x_min = w
-                        y_min = h
-                        x_max = 0
-                        y_max = 0
-                        
-                        for landmark in hand_landmarks.landmark:
-                            x, y = int(landmark.x * w), int(landmark.y * h)
-                            if x < x_min:
-                                x_min = x
-                            if y < y_min:
-                                y_min = y
-                            if x > x_max:
-                                x_max = x
-                            if y > y_max:
-                                y_max = y
-                        
-                        # 添加边界框和手势标签
-                        cv2.rectangle(frame, (x_min - 20, y_min - 20), (x_max + 20, y_max + 20), 
-                                     (0, 255, 0), 2)
-                        
-                        # 显示手势名称和置信度
-                        label = f"{gesture_name}: {confidence:.2f}"
-                        cv2.putText(frame, label, (x_min - 20, y_min - 30), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+                # 处理按键
+                if key == ord('q'):
+                    # 按 'q' 键退出
+                    break
+                elif key == ord('s'):
+                    # 按 's' 键保存当前图像
+                    save_path = f"gesture_{int(time.time())}.jpg"
+                    cv2.imwrite(save_path, frame)
+                    print(f"✅ 图像已保存：{save_path}")
+                else:
+                    # 录制模式下按数字键保存训练样本
+                    self.record_sample(key, features)
+        
+        except KeyboardInterrupt:
+            # 捕获 Ctrl+C 退出
+            print()
+            print("🔄 正在退出系统...")
+        
+        # 释放资源
+        self.close()
+        if self.motion_gate is not None:
+            self.motion_gate.print_stats()
+        print_summary(self.metrics)
+        print("✅ 优化后的手势识别系统已关闭")
+    
+    def run_pipelined(self):
+        """以流水线方式运行：采集、颜色转换、MediaPipe推理、渲染各占一个线程，主线程负责显示"""
+        self.print_banner()
+        
+        def capture():
+            with self.metrics.time("capture"):
+                ret, frame = self.cap.read()
+            if not ret:
+                return None
+            # 镜像翻转帧（使显示更自然）
+            return {"frame": cv2.flip(frame, 1)}
+        
+        def preprocess(item):
+            # 画面静止时不转换颜色，推理阶段沿用上一次的结果
+            item["skip"] = self.motion_gate is not None and not self.motion_gate.should_process(item["frame"])
+            if not item["skip"]:
+                # 转换为RGB格式（MediaPipe需要RGB输入）
+                with self.metrics.time("preprocess"):
+                    item["rgb"] = cv2.cvtColor(item["frame"], cv2.COLOR_BGR2RGB)
+            return item
+        
+        def infer(item):
+            if item["skip"] and self.last_results is None:
+                # 门控决定推理的帧在队列中被丢弃，还没有可沿用的结果，补做一次颜色转换和推理
+                item["rgb"] = cv2.cvtColor(item["frame"], cv2.COLOR_BGR2RGB)
+                item["skip"] = False
+            if not item["skip"]:
+                with self.metrics.time("inference"):
+                    self.last_results = self.hands.process(item["rgb"])
+                with self.metrics.time("postprocess"):
+                    self.last_features = self.analyze_results(item["frame"], self.last_results)
+            item["results"], item["features"] = self.last_results, self.last_features
+            # 录制会话（在渲染阶段绘制之前）
+            self.record_frame(item["frame"], item["features"])
+            return item
+        
+        def render(item):
+            with self.metrics.time("render"):
+                item["output"] = self.draw_results(item["frame"], item["results"], item["features"])
+            return item
+        
+        pipeline = Pipeline(capture, [
+            ("preprocess", preprocess),
+            ("infer", infer),
+            ("render", render)
+        ]).start()
+        
+        try:
+            while True:
+                item = pipeline.get()
+                if item is None:
+                    print("无法读取摄像头帧")
+                    break
                 
                 # 显示帧
-                cv2.imshow("优化后的实时手势识别", frame)
+                with self.metrics.time("display"):
+                    cv2.imshow("优化后的实时手势识别", item["output"])
+                    key = cv2.waitKey(1) & 0xFF
+                
+                # 平滑帧率（以显示的帧为准），丢帧包括采集缓冲区和流水线队列丢弃的帧
+                self.metrics.set_dropped_frames(self.cap.dropped_frames +
+                                                sum(s["dropped"] for s in pipeline.stats()))
+                self.fps = self.metrics.frame_done()
+                self.report_startup()
                 
                 # 处理按键
-                key = cv2.waitKey(1) & 0xFF
                 if key == ord('q'):
                     # 按 'q' 键退出
                     break
                 elif key == ord('s'):
                     # 按 's' 键保存当前图像
                     save_path = f"gesture_{int(time.time())}.jpg"
-                    cv2.imwrite(save_path, frame)
+                    cv2.imwrite(save_path, item["output"])
                     print(f"✅ 图像已保存：{save_path}")
+                else:
+                    # 录制模式下按数字键保存训练样本
+                    self.record_sample(key, item["features"])
         
         except KeyboardInterrupt:
             # 捕获 Ctrl+C 退出
             print()
             print("🔄 正在退出系统...")
+        finally:
+            pipeline.stop()
         
         # 释放资源
-        self.cap.release()
-        cv2.destroyAllWindows()
-        self.hands.close()
+        self.close()
+        pipeline.print_stats()
+        if self.motion_gate is not None:
+            self.motion_gate.print_stats()
+        print_summary(self.metrics)
         print("✅ 优化后的手势识别系统已关闭")
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="优化后的实时手势识别系统")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="流水线模式：采集、预处理、推理、渲染在不同线程中并行执行")
+    parser.add_argument("--motion-threshold", type=float, default=None,
+                        help="运动门控：缩略图中变化像素比例低于该值（如 0.01）时跳过推理，沿用上次结果")
+    parser.add_argument("--motion-refresh", type=int, default=30,
+                        help="运动门控下每 N 帧强制推理一次（0 表示不强制）")
+    parser.add_argument("--classifier", default=None,
+                        help="关键点手势分类器权重（landmark_classifier.py 训练生成的 .npz），不指定时使用规则判断")
+    parser.add_argument("--record-samples", default=None,
+                        help="录制训练样本的 .npz 文件，运行时按数字键 0~7 保存当前手势为对应类别")
+    parser.add_argument("--record", default=None,
+                        help="会话录制目录：后台写入视频、每帧的关键点、识别结果和时间戳")
+    parser.add_argument("--record-interval", type=int, default=1,
+                        help="录制时每 N 帧保存一帧图像（0 表示只录制关键点和识别结果）")
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="启动时不用空白帧预热模型（第一帧的推理会明显变慢）")
+    add_capture_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    
+    # 启动时间线：模块导入、打开摄像头与加载模型（并行）、预热，直到首帧识别完成
+    timeline = StartupTimeline()
+    timeline.add("导入模块", PROCESS_START, IMPORTS_DONE)
+    
     try:
         # 创建手势识别器实例
-        recognizer = OptimizedHandGestureRecognizer()
+        recognizer = OptimizedHandGestureRecognizer(target_fps=args.target_fps,
+                                                    capture_config=CaptureConfig.from_args(args),
+                                                    motion_threshold=args.motion_threshold,
+                                                    motion_refresh=args.motion_refresh,
+                                                    classifier_path=args.classifier,
+                                                    samples_path=args.record_samples,
+                                                    record_path=args.record,
+                                                    record_interval=args.record_interval,
+                                                    warmup=not args.no_warmup,
+                                                    timeline=timeline)
+        # 启动指标导出（Prometheus 接口 / JSON 文件）
+        exporters = start_exporters(recognizer.metrics, args.metrics_port, args.metrics_json,
+                                    args.metrics_interval)
         # 运行实时识别
-        recognizer.run()
+        try:
+            if args.pipeline:
+                recognizer.run_pipelined()
+            else:
+                recognizer.run()
+        finally:
+            for exporter in exporters:
+                exporter.stop()
     except Exception as e:
         print(f"❌ 发生错误: {e}")
         print()
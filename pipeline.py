@@ -0,0 +1,162 @@
+import queue
+import threading
+import time
+
+"""
+多阶段流水线执行器
+采集 → 预处理 → 推理 → 渲染 各阶段分别运行在独立线程中，阶段之间用有界队列连接，
+显示阶段在主线程中从输出队列取结果（OpenCV窗口需要在主线程中操作）。
+整体吞吐量由最慢的阶段决定，而不是所有阶段耗时之和
+"""
+
+# 队列满时的处理策略
+DROP_OLDEST = "drop_oldest"  # 丢弃队列中最旧的数据，保证下游处理最新帧
+BLOCK = "block"              # 阻塞上游阶段（反压），不丢帧
+
+
+class PipelineStage:
+    def __init__(self, name, func, drop_policy=DROP_OLDEST):
+        """name 为阶段名称，func(item) 返回处理后的数据，返回 None 表示丢弃该数据"""
+        self.name = name
+        self.func = func
+        self.drop_policy = drop_policy
+
+        # 统计信息
+        self.processed = 0
+        self.dropped = 0
+        self.busy_time = 0.0
+
+
+class Pipeline:
+    def __init__(self, source, stages, queue_size=2, drop_policy=DROP_OLDEST):
+        """source() 返回下一个数据（返回 None 表示结束）；stages 为 PipelineStage 或 (名称, 函数) 列表"""
+        self.source = PipelineStage("capture", source, drop_policy)
+        self.stages = [stage if isinstance(stage, PipelineStage) else PipelineStage(stage[0], stage[1], drop_policy)
+                       for stage in stages]
+
+        # 每个阶段的输出队列，最后一个队列由主线程消费
+        all_stages = [self.source] + self.stages
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in all_stages]
+
+        self.stop_event = threading.Event()
+        self.error = None
+        self.threads = []
+
+    def _put(self, stage, output_queue, item):
+        """按阶段的丢帧策略把数据放入输出队列"""
+        # 结束标记不能丢弃，总是以阻塞方式放入
+        drop_oldest = stage.drop_policy == DROP_OLDEST and item is not None
+        while not self.stop_event.is_set():
+            try:
+                if drop_oldest:
+                    output_queue.put_nowait(item)
+                else:
+                    output_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if drop_oldest:
+                    # 下游处理不过来，丢弃队列中最旧的数据
+                    try:
+                        output_queue.get_nowait()
+                        stage.dropped += 1
+                    except queue.Empty:
+                        pass
+
+    def _get(self, input_queue):
+        """从输入队列取数据，流水线停止时返回 None"""
+        while not self.stop_event.is_set():
+            try:
+                return input_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return None
+
+    def _run_source(self):
+        try:
+            while not self.stop_event.is_set():
+                start = time.perf_counter()
+                item = self.source.func()
+                self.source.busy_time += time.perf_counter() - start
+                if item is None:
+                    break
+                self.source.processed += 1
+                self._put(self.source, self.queues[0], item)
+        except Exception as e:
+            self.error = e
+        # 向下游传递结束标记
+        self._put(self.source, self.queues[0], None)
+
+    def _run_stage(self, index):
+        stage = self.stages[index]
+        input_queue = self.queues[index]
+        output_queue = self.queues[index + 1]
+        try:
+            while True:
+                item = self._get(input_queue)
+                if item is None:
+                    break
+                start = time.perf_counter()
+                result = stage.func(item)
+                stage.busy_time += time.perf_counter() - start
+                stage.processed += 1
+                if result is not None:
+                    self._put(stage, output_queue, result)
+        except Exception as e:
+            self.error = e
+            self.stop_event.set()
+        self._put(stage, output_queue, None)
+
+    def start(self):
+        """启动所有阶段的工作线程"""
+        self.threads = [threading.Thread(target=self._run_source, name="capture", daemon=True)]
+        for i, stage in enumerate(self.stages):
+            self.threads.append(threading.Thread(target=self._run_stage, args=(i,), name=stage.name, daemon=True))
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def get(self, timeout=None):
+        """在主线程中获取最后一个阶段的输出，流水线结束或超时时返回 None，工作线程出错时抛出异常"""
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            try:
+                item = self.queues[-1].get(timeout=0.1)
+            except queue.Empty:
+                item = None
+                if not self.stop_event.is_set() and (deadline is None or time.time() < deadline):
+                    continue
+            if self.error is not None:
+                raise self.error
+            return item
+
+    def __iter__(self):
+        while True:
+            item = self.get()
+            if item is None:
+                return
+            yield item
+
+    def stop(self):
+        """停止所有工作线程"""
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+
+    def stats(self):
+        """返回各阶段的处理数、丢弃数和平均耗时（毫秒）"""
+        stats = []
+        for stage in [self.source] + self.stages:
+            avg_ms = stage.busy_time / stage.processed * 1000 if stage.processed else 0.0
+            stats.append({
+                "stage": stage.name,
+                "processed": stage.processed,
+                "dropped": stage.dropped,
+                "avg_ms": avg_ms
+            })
+        return stats
+
+    def print_stats(self):
+        """打印各阶段统计信息"""
+        print("📊 流水线各阶段统计：")
+        for s in self.stats():
+            print(f"   - {s['stage']:<12} 处理 {s['processed']:>6} | 丢弃 {s['dropped']:>6} | 平均 {s['avg_ms']:.2f} ms")
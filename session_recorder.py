@@ -0,0 +1,238 @@
+import json
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+"""
+会话录制
+识别循环只把帧（可按间隔抽取）、MediaPipe 关键点、检测框和时间戳放入队列，由后台线程写入磁盘：
+帧写入压缩视频（frames.mp4），每帧信息、关键点和检测框以固定结构的记录追加写入二进制文件，
+可以直接用 np.memmap 读取（格式见 meta.json）。视频编码跟不上时只丢弃图像，不阻塞识别循环，
+关键点和检测框记录始终保留。
+用于收集训练数据和复现现场问题
+"""
+
+# 每帧一条记录：帧序号、时间戳、在视频中的帧序号（该帧未写入视频时为 -1）
+FRAME_DTYPE = np.dtype([("frame", "<i8"), ("timestamp", "<f8"), ("video_frame", "<i8")])
+# 每只手一条记录：帧序号、该帧中的第几只手、21 个关键点 (x, y, z)
+LANDMARK_DTYPE = np.dtype([("frame", "<i8"), ("hand", "<i4"), ("points", "<f4", (21, 3))])
+# 每个检测框一条记录：帧序号、类别ID、置信度、边界框 (x1, y1, x2, y2)
+BOX_DTYPE = np.dtype([("frame", "<i8"), ("class_id", "<i4"), ("confidence", "<f4"), ("bbox", "<i4", (4,))])
+
+RECORD_FILES = {
+    "frames": ("frames.bin", FRAME_DTYPE),
+    "landmarks": ("landmarks.bin", LANDMARK_DTYPE),
+    "boxes": ("boxes.bin", BOX_DTYPE)
+}
+
+
+def dtype_to_json(dtype):
+    """记录结构 -> 可写入JSON的描述（可用 np.dtype(...) 还原）"""
+    return [[name, dtype.fields[name][0].base.str, list(dtype.fields[name][0].shape)] for name in dtype.names]
+
+
+def dtype_from_json(description):
+    return np.dtype([(name, base, tuple(shape)) for name, base, shape in description])
+
+
+class SessionRecorder:
+    def __init__(self, path, fps=30.0, frame_interval=1, fourcc="mp4v", queue_size=64, source=None):
+        """path 为会话目录；frame_interval 为每隔多少帧写入一帧图像（关键点和检测框每帧都记录），
+        0 表示不保存图像；queue_size 为等待编码的图像队列长度"""
+        self.path = path
+        self.fps = fps
+        self.frame_interval = frame_interval
+        self.fourcc = fourcc
+        self.source = source
+        os.makedirs(path, exist_ok=True)
+
+        self.files = {name: open(os.path.join(path, filename), "wb") for name, (filename, _) in RECORD_FILES.items()}
+        self.writer = None
+        self.frame_size = None
+
+        # 统计信息
+        self.frames = 0
+        self.video_frames = 0
+        self.dropped = 0
+        self.counts = {name: 0 for name in RECORD_FILES}
+        self.start_time = time.time()
+
+        # 先写入一次 meta.json，程序异常退出时已写入的记录仍可读取
+        self.write_meta()
+
+        # 图像队列有界（编码慢时丢弃图像），记录队列中的元素很小，不设上限
+        self.frame_queue = queue.Queue(maxsize=queue_size)
+        self.record_queue = queue.Queue()
+        self.threads = [threading.Thread(target=self._video_loop, daemon=True),
+                        threading.Thread(target=self._record_loop, daemon=True)]
+        for thread in self.threads:
+            thread.start()
+
+    def record(self, frame, timestamp=None, landmarks=None, detections=None):
+        """（识别循环中调用）记录一帧：frame 为原始帧（绘制前），landmarks 为 (手数, 21, 3) 数组，
+        detections 为检测结果字典列表（class_id、confidence、bbox）；图像因队列满被丢弃时返回 False"""
+        index = self.frames
+        self.frames += 1
+
+        # 视频中的帧序号在这里分配，与图像入队顺序一致
+        video_frame = -1
+        saved = True
+        if self.frame_interval and index % self.frame_interval == 0:
+            if self.frame_queue.full():
+                self.dropped += 1
+                saved = False
+            else:
+                # 识别循环随后会在帧上绘制，先复制一份
+                self.frame_queue.put_nowait(frame.copy())
+                video_frame = self.video_frames
+                self.video_frames += 1
+
+        self.record_queue.put((index, time.time() if timestamp is None else timestamp, video_frame,
+                               landmarks, detections))
+        return saved
+
+    def _open_writer(self, frame):
+        h, w = frame.shape[:2]
+        self.frame_size = (w, h)
+        self.writer = cv2.VideoWriter(os.path.join(self.path, "frames.mp4"),
+                                      cv2.VideoWriter_fourcc(*self.fourcc), self.fps, (w, h))
+        if not self.writer.isOpened():
+            print(f"⚠️  无法创建视频文件（编码 {self.fourcc}），只录制关键点和检测框")
+
+    def _append(self, name, records):
+        self.files[name].write(records.tobytes())
+        self.counts[name] += len(records)
+
+    def _video_loop(self):
+        """（后台线程）把图像编码写入视频"""
+        while True:
+            frame = self.frame_queue.get()
+            if frame is None:
+                break
+            if self.writer is None:
+                self._open_writer(frame)
+            if (frame.shape[1], frame.shape[0]) != self.frame_size:
+                # 分辨率变化时缩放到视频尺寸，保持视频帧序号连续
+                frame = cv2.resize(frame, self.frame_size)
+            self.writer.write(frame)
+
+    def _record_loop(self):
+        """（后台线程）追加写入帧信息、关键点和检测框记录"""
+        while True:
+            item = self.record_queue.get()
+            if item is None:
+                break
+            index, timestamp, video_frame, landmarks, detections = item
+
+            record = np.zeros(1, dtype=FRAME_DTYPE)
+            record[0] = (index, timestamp, video_frame)
+            self._append("frames", record)
+
+            if landmarks is not None and len(landmarks):
+                records = np.zeros(len(landmarks), dtype=LANDMARK_DTYPE)
+                records["frame"] = index
+                records["hand"] = np.arange(len(landmarks))
+                records["points"] = np.asarray(landmarks, dtype=np.float32).reshape(-1, 21, 3)
+                self._append("landmarks", records)
+
+            if detections:
+                records = np.zeros(len(detections), dtype=BOX_DTYPE)
+                records["frame"] = index
+                records["class_id"] = [d["class_id"] for d in detections]
+                records["confidence"] = [d["confidence"] for d in detections]
+                records["bbox"] = [d["bbox"] for d in detections]
+                self._append("boxes", records)
+
+    def write_meta(self):
+        meta = {
+            "created": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.start_time)),
+            "source": None if self.source is None else str(self.source),
+            "fps": self.fps,
+            "frame_interval": self.frame_interval,
+            "frame_size": self.frame_size,
+            "video": "frames.mp4",
+            "frames": self.counts["frames"],
+            "video_frames": self.video_frames,
+            "dropped": self.dropped,
+            "files": {name: {"file": filename, "dtype": dtype_to_json(dtype), "count": self.counts[name]}
+                      for name, (filename, dtype) in RECORD_FILES.items()}
+        }
+        with open(os.path.join(self.path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    def close(self):
+        """写完队列中剩余的记录后关闭文件，写入 meta.json"""
+        self.frame_queue.put(None)
+        self.record_queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        if self.writer is not None:
+            self.writer.release()
+        for f in self.files.values():
+            f.close()
+        self.write_meta()
+        print(f"📼 会话已录制到 {self.path}：{self.counts['frames']} 帧（视频 {self.video_frames} 帧），"
+              f"{self.counts['landmarks']} 组关键点，{self.counts['boxes']} 个检测框"
+              + (f"，编码不及时丢弃 {self.dropped} 帧图像" if self.dropped else ""))
+
+
+class Session:
+    """读取录制的会话：frames、landmarks、boxes 为只读内存映射的结构化数组"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        for name, info in self.meta["files"].items():
+            dtype = dtype_from_json(info["dtype"])
+            file_path = os.path.join(path, info["file"])
+            # 记录数按文件大小计算（录制异常中断时 meta.json 中的计数不完整）
+            count = os.path.getsize(file_path) // dtype.itemsize if os.path.exists(file_path) else 0
+            if count:
+                records = np.memmap(file_path, dtype=dtype, mode="r", shape=(count,))
+            else:
+                records = np.zeros(0, dtype=dtype)
+            setattr(self, name, records)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def _select(self, records, frame_index):
+        # 记录按帧序号顺序追加，用二分查找定位
+        start, end = np.searchsorted(records["frame"], [frame_index, frame_index + 1])
+        return records[start:end]
+
+    def frame_landmarks(self, frame_index):
+        """某一帧所有手的关键点 (手数, 21, 3)"""
+        return np.asarray(self._select(self.landmarks, frame_index)["points"])
+
+    def frame_boxes(self, frame_index):
+        """某一帧的检测框记录"""
+        return self._select(self.boxes, frame_index)
+
+    def iter_frames(self):
+        """按顺序生成 (帧记录, 图像)，未写入视频的帧图像为 None"""
+        cap = None
+        video_path = os.path.join(self.path, self.meta.get("video") or "frames.mp4")
+        if os.path.exists(video_path):
+            cap = cv2.VideoCapture(video_path)
+        try:
+            for record in self.frames:
+                image = None
+                if record["video_frame"] >= 0 and cap is not None:
+                    ret, image = cap.read()
+                    if not ret:
+                        image = None
+                yield record, image
+        finally:
+            if cap is not None:
+                cap.release()
+
+
+def session_path(path, index, count):
+    """多个视频源时每个视频源录制到 path 下的子目录"""
+    return path if count <= 1 else os.path.join(path, f"source_{index}")
@@ -0,0 +1,300 @@
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from batch_process import RECOGNIZERS, create_recognizer
+from benchmark_suite import build_stages, git_commit, machine_info, summarize
+from session_recorder import Session
+
+"""
+会话回放
+把录制的会话（session_recorder.py 录制的目录，或普通视频文件）逐帧送入任意一个识别器，
+可以全速回放（每帧都处理，结果可复现），也可以按录制时的时间回放（处理不及时的帧像实时采集一样被丢弃）。
+统计吞吐量、各阶段延迟分位数，以及与录制结果（或另外提供的标注）逐类别的一致率；
+用 --diff 对比两次回放，可以直接看出代码或模型的改动是否变慢、是否变得不准确
+"""
+
+# 手势类别映射
+gesture_classes = {
+    0: "数字1",
+    1: "数字2",
+    2: "数字3",
+    3: "数字4",
+    4: "数字5",
+    5: "剪刀",
+    6: "锤头",
+    7: "布"
+}
+
+# 没有检测到手势时的类别
+NO_GESTURE = -1
+
+
+def load_labels(path):
+    """读取 batch_process.py 输出格式的 JSONL 标注，返回 {帧序号: 检测结果列表}"""
+    labels = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                labels[int(record["frame"])] = record["detections"]
+    return labels
+
+
+def iter_session_frames(path):
+    """生成 (帧序号, 时间戳秒, 图像, 录制时的检测结果)：path 为会话目录或视频文件"""
+    if os.path.isdir(path):
+        session = Session(path)
+        for record, image in session.iter_frames():
+            if image is None:
+                continue
+            index = int(record["frame"])
+            reference = [{"class_id": int(box["class_id"]), "confidence": float(box["confidence"]),
+                          "bbox": [int(v) for v in box["bbox"]]} for box in session.frame_boxes(index)]
+            yield index, float(record["timestamp"]), image, reference
+        return
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"无法打开视频: {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    index = 0
+    try:
+        while True:
+            ret, image = cap.read()
+            if not ret:
+                break
+            yield index, index / fps, image, None
+            index += 1
+    finally:
+        cap.release()
+
+
+def top_class(detections):
+    """置信度最高的检测结果的类别，没有检测结果时为 NO_GESTURE"""
+    if not detections:
+        return NO_GESTURE
+    return int(max(detections, key=lambda d: d["confidence"])["class_id"])
+
+
+def replay(path, recognizer_name, model_path=None, realtime=False, labels=None, warmup=5):
+    """回放一个会话，返回报告字典；realtime 为 True 时按录制时的时间送帧"""
+    recognizer = create_recognizer(recognizer_name, model_path)
+    stages = build_stages(recognizer_name, recognizer)
+    frames = iter_session_frames(path)
+
+    stage_latencies = {stage_name: [] for stage_name, _ in stages}
+    end_to_end = []
+    predictions = []
+    references = []
+    dropped = 0
+
+    def process(index, image, reference):
+        frame_start = time.perf_counter()
+        item = {"frame": image}
+        for stage_name, func in stages:
+            stage_start = time.perf_counter()
+            item = func(item)
+            stage_latencies[stage_name].append((time.perf_counter() - stage_start) * 1000)
+        end_to_end.append((time.perf_counter() - frame_start) * 1000)
+        if labels is not None:
+            reference = labels.get(index)
+        predictions.append([index, top_class(item["detections"])])
+        references.append(None if reference is None else top_class(reference))
+
+    pending = next(frames, None)
+    if pending is None:
+        raise ValueError(f"会话中没有可回放的图像: {path}")
+
+    # 预热（模型初始化、缓冲区分配等不计入统计）
+    for _ in range(warmup):
+        item = {"frame": pending[2]}
+        for _, func in stages:
+            item = func(item)
+
+    first_timestamp = pending[1]
+    start_time = time.perf_counter()
+    for next_frame in frames:
+        if realtime:
+            # 像实时采集一样：处理完上一帧时更新的帧已经到达，则丢弃当前帧
+            if time.perf_counter() - start_time >= next_frame[1] - first_timestamp:
+                dropped += 1
+                pending = next_frame
+                continue
+            delay = pending[1] - first_timestamp - (time.perf_counter() - start_time)
+            if delay > 0:
+                time.sleep(delay)
+        process(pending[0], pending[2], pending[3])
+        pending = next_frame
+    process(pending[0], pending[2], pending[3])
+    elapsed = time.perf_counter() - start_time
+
+    return {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": git_commit(),
+        "machine": machine_info(),
+        "session": os.path.abspath(path),
+        "recognizer": recognizer_name,
+        "model": model_path,
+        "mode": "realtime" if realtime else "max",
+        "frames": len(end_to_end),
+        "dropped": dropped,
+        "elapsed_s": elapsed,
+        "throughput_fps": len(end_to_end) / elapsed if elapsed > 0 else 0.0,
+        "end_to_end": summarize(end_to_end),
+        "stages": {stage_name: summarize(values) for stage_name, values in stage_latencies.items()},
+        "agreement": agreement(predictions, references),
+        "predictions": predictions
+    }
+
+
+def agreement(predictions, references):
+    """逐帧比较识别结果与录制结果（置信度最高的类别），返回总体和各类别的一致率"""
+    pairs = [(pred, ref) for (_, pred), ref in zip(predictions, references) if ref is not None]
+    if not pairs:
+        return None
+    pred = np.array([p for p, _ in pairs])
+    ref = np.array([r for _, r in pairs])
+    per_class = {}
+    for class_id in [NO_GESTURE] + list(gesture_classes):
+        ref_count = int((ref == class_id).sum())
+        pred_count = int((pred == class_id).sum())
+        if not ref_count and not pred_count:
+            continue
+        agreed = int(((ref == class_id) & (pred == class_id)).sum())
+        per_class[class_name(class_id)] = {
+            "reference": ref_count,
+            "predicted": pred_count,
+            "agreed": agreed,
+            "recall": agreed / ref_count if ref_count else None,
+            "precision": agreed / pred_count if pred_count else None
+        }
+    return {"frames": len(pairs), "overall": float((pred == ref).mean()), "per_class": per_class}
+
+
+def class_name(class_id):
+    return "无手势" if class_id == NO_GESTURE else gesture_classes.get(class_id, f"类别 {class_id}")
+
+
+def format_ratio(value):
+    return "-" if value is None else f"{value:.1%}"
+
+
+def print_report(report):
+    """打印吞吐量、延迟和一致率"""
+    e2e = report["end_to_end"]
+    print()
+    print(f"🎬 {report['recognizer']} | {report['mode']} 回放 {report['frames']} 帧"
+          + (f"（丢弃 {report['dropped']} 帧）" if report["dropped"] else "")
+          + f" | 吞吐 {report['throughput_fps']:.1f} 帧/秒")
+    print(f"{'阶段':<16}{'平均(ms)':>10}{'P50(ms)':>10}{'P95(ms)':>10}{'P99(ms)':>10}")
+    print("-" * 56)
+    for stage_name, s in [("端到端", e2e)] + list(report["stages"].items()):
+        print(f"{stage_name:<16}{s['mean_ms']:>10.2f}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}")
+
+    result = report["agreement"]
+    if result is None:
+        print("（没有录制结果或标注，不计算一致率）")
+        return
+    print()
+    print(f"📊 与录制结果一致率 {result['overall']:.1%}（{result['frames']} 帧）")
+    print(f"{'类别':<10}{'录制':>8}{'识别':>8}{'一致':>8}{'召回率':>10}{'精确率':>10}")
+    for name, c in result["per_class"].items():
+        print(f"{name:<10}{c['reference']:>8}{c['predicted']:>8}{c['agreed']:>8}"
+              f"{format_ratio(c['recall']):>10}{format_ratio(c['precision']):>10}")
+    print()
+
+
+def print_diff(old, new, slower_threshold=0.05):
+    """对比两次回放：吞吐量、延迟、一致率和逐帧识别结果的变化"""
+    print(f"📊 回放对比：{old['recognizer']}@{old.get('commit')} → {new['recognizer']}@{new.get('commit')}")
+    if old.get("session") != new.get("session"):
+        print("⚠️  两次回放的会话不同")
+    if old.get("machine") != new.get("machine"):
+        print("⚠️  两次回放在不同的机器或库版本上运行，性能结果仅供参考")
+    if old.get("mode") != new.get("mode"):
+        print("⚠️  两次回放的模式不同")
+
+    def change(label, old_value, new_value, higher_is_better):
+        ratio = (new_value - old_value) / old_value if old_value else 0.0
+        worse = -ratio if higher_is_better else ratio
+        mark = "❌" if worse > slower_threshold else ("✅" if worse < -slower_threshold else "  ")
+        print(f"{mark} {label:<14}{old_value:>10.2f} → {new_value:<10.2f}({ratio:+.1%})")
+
+    print()
+    change("吞吐(帧/秒)", old["throughput_fps"], new["throughput_fps"], True)
+    for key in ("p50_ms", "p95_ms", "p99_ms"):
+        change(f"端到端 {key[:3].upper()}(ms)", old["end_to_end"][key], new["end_to_end"][key], False)
+    for stage_name, s in new["stages"].items():
+        if stage_name in old["stages"]:
+            change(f"{stage_name} P50", old["stages"][stage_name]["p50_ms"], s["p50_ms"], False)
+
+    old_result, new_result = old.get("agreement"), new.get("agreement")
+    if old_result and new_result:
+        print()
+        delta = new_result["overall"] - old_result["overall"]
+        mark = "❌" if delta < -0.005 else ("✅" if delta > 0.005 else "  ")
+        print(f"{mark} 一致率 {old_result['overall']:.1%} → {new_result['overall']:.1%}（{delta:+.1%}）")
+        for name in sorted(set(old_result["per_class"]) | set(new_result["per_class"])):
+            old_recall = old_result["per_class"].get(name, {}).get("recall")
+            new_recall = new_result["per_class"].get(name, {}).get("recall")
+            if old_recall != new_recall:
+                print(f"   {name:<10}召回率 {format_ratio(old_recall)} → {format_ratio(new_recall)}")
+
+    # 逐帧对比识别结果（全速回放时两次处理的帧相同）
+    old_predictions = dict((index, cls) for index, cls in old["predictions"])
+    changed = [(index, old_predictions[index], cls) for index, cls in new["predictions"]
+               if index in old_predictions and old_predictions[index] != cls]
+    print()
+    print(f"🔍 识别结果变化的帧：{len(changed)}/{len(new['predictions'])}")
+    for index, old_class, new_class in changed[:10]:
+        print(f"   第 {index} 帧：{class_name(old_class)} → {class_name(new_class)}")
+    if len(changed) > 10:
+        print(f"   ... 另有 {len(changed) - 10} 帧")
+    print()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="回放录制的会话，评测识别器的吞吐量、延迟和一致率")
+    parser.add_argument("session", nargs="?", help="会话目录（session_recorder.py 录制）或视频文件")
+    parser.add_argument("--recognizer", choices=RECOGNIZERS, default="yolo", help="回放使用的识别器")
+    parser.add_argument("--model", default=None, help="YOLO模型文件路径")
+    parser.add_argument("--realtime", action="store_true",
+                        help="按录制时的时间送帧（处理不及时的帧被丢弃），默认全速回放每一帧")
+    parser.add_argument("--labels", default=None,
+                        help="标注文件（batch_process.py 的 JSONL 格式），默认与会话中录制的检测结果比较")
+    parser.add_argument("--warmup", type=int, default=5, help="预热次数（不计入统计）")
+    parser.add_argument("-o", "--output", default="replay.json", help="回放结果JSON文件")
+    parser.add_argument("--diff", nargs=2, metavar=("OLD", "NEW"), default=None, help="对比两次回放的结果JSON")
+    args = parser.parse_args()
+
+    if args.diff:
+        reports = []
+        for path in args.diff:
+            with open(path, "r", encoding="utf-8") as f:
+                reports.append(json.load(f))
+        print_diff(*reports)
+        return
+    if not args.session:
+        parser.error("需要指定会话目录或视频文件（或使用 --diff）")
+
+    labels = load_labels(args.labels) if args.labels else None
+    try:
+        report = replay(args.session, args.recognizer, args.model, args.realtime, labels, args.warmup)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+
+    print_report(report)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"📋 结果已保存：{args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import cv2
+import numpy as np
+
+"""
+快速肤色分割
+在缩小的图像上完成 HSV 阈值、腐蚀膨胀和高斯模糊，所有中间结果写入预先分配的缓冲区（dst=），
+形态学核只创建一次；输出的是缩小后的掩码，只把找到的轮廓坐标放大回原始分辨率
+"""
+
+
+class FastSkinSegmenter:
+    def __init__(self, lower_skin, upper_skin, scale=0.5, kernel_size=5, iterations=2):
+        """lower_skin/upper_skin 为HSV阈值，scale 为分割和形态学处理使用的缩放比例"""
+        self.lower_skin = np.asarray(lower_skin, dtype=np.uint8)
+        self.upper_skin = np.asarray(upper_skin, dtype=np.uint8)
+        self.scale = scale
+        self.iterations = iterations
+
+        # 核大小随缩放比例缩小（保持奇数），使缩小后的形态学效果与原分辨率接近
+        size = max(3, int(round(kernel_size * scale)) | 1)
+        self.kernel = np.ones((size, size), np.uint8)
+        self.blur_size = (size, size)
+
+        # 缓冲区在第一次处理帧时按帧尺寸分配
+        self.frame_shape = None
+
+    def _allocate(self, frame_shape):
+        """按帧尺寸分配所有中间缓冲区"""
+        h, w = frame_shape[:2]
+        small_w = max(int(round(w * self.scale)), 1)
+        small_h = max(int(round(h * self.scale)), 1)
+
+        self.frame_shape = frame_shape
+        self.small_size = (small_w, small_h)
+        self.small = np.empty((small_h, small_w, 3), np.uint8)
+        self.hsv = np.empty((small_h, small_w, 3), np.uint8)
+        self.mask = np.empty((small_h, small_w), np.uint8)
+        self.work_mask = np.empty((small_h, small_w), np.uint8)
+
+        # 轮廓坐标从缩小的掩码映射回原始分辨率的比例
+        self.inverse_scale = np.array([w / small_w, h / small_h], dtype=np.float32)
+
+    def segment(self, frame):
+        """返回缩小后的肤色掩码（尺寸为原帧的 scale 倍）
+
+        返回的数组是内部缓冲区，下一次调用时会被覆盖，需要保留时请复制
+        """
+        if frame.shape != self.frame_shape:
+            self._allocate(frame.shape)
+
+        # 缩小后在HSV空间做阈值
+        small = frame
+        if self.scale != 1:
+            cv2.resize(frame, self.small_size, dst=self.small, interpolation=cv2.INTER_LINEAR)
+            small = self.small
+        cv2.cvtColor(small, cv2.COLOR_BGR2HSV, dst=self.hsv)
+        cv2.inRange(self.hsv, self.lower_skin, self.upper_skin, dst=self.work_mask)
+
+        # 形态学操作，去除噪声
+        cv2.erode(self.work_mask, self.kernel, dst=self.mask, iterations=self.iterations)
+        cv2.dilate(self.mask, self.kernel, dst=self.work_mask, iterations=self.iterations)
+
+        # 高斯模糊
+        cv2.GaussianBlur(self.work_mask, self.blur_size, 0, dst=self.mask)
+        return self.mask
+
+    def scale_contour(self, contour):
+        """把缩小掩码上的轮廓坐标放大回原始分辨率"""
+        if self.scale == 1:
+            return contour
+        return (contour * self.inverse_scale).astype(np.int32)
+
+    def scale_area(self, area):
+        """把原始分辨率下的面积阈值换算到缩小的掩码上"""
+        return area / float(self.inverse_scale[0] * self.inverse_scale[1])
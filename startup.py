@@ -0,0 +1,98 @@
+import threading
+import time
+from contextlib import contextmanager
+
+"""
+启动时间线
+记录启动过程中各阶段（导入模块、打开摄像头、加载模型、预热、首帧识别）的开始和结束时间，
+在后台线程中并行执行的阶段各自计时，首帧识别完成后以时间轴的形式输出，便于找出启动慢的原因。
+BackgroundTask 在后台线程中执行耗时的初始化（如导入 ultralytics/torch 并加载模型），与打开摄像头同时进行
+"""
+
+# 时间线的起点：本模块被导入的时刻（入口脚本最先导入本模块，之后的模块导入都计入时间线）
+PROCESS_START = time.perf_counter()
+
+
+class StartupTimeline:
+    def __init__(self, origin=None):
+        """origin 为时间线起点（perf_counter 时间），默认为本模块被导入的时刻"""
+        self.origin = PROCESS_START if origin is None else origin
+        # 阶段：(名称, 开始秒, 结束秒, 线程名)；时间点：(名称, 秒)
+        self.phases = []
+        self.marks = []
+        self.lock = threading.Lock()
+
+    def add(self, name, start, end):
+        """记录一个阶段，start/end 为 perf_counter 时间"""
+        with self.lock:
+            self.phases.append((name, start - self.origin, end - self.origin, threading.current_thread().name))
+
+    @contextmanager
+    def phase(self, name):
+        """计时一个阶段：with timeline.phase("打开视频源"): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter())
+
+    def mark(self, name):
+        """记录一个时间点（如首帧识别完成）"""
+        with self.lock:
+            self.marks.append((name, time.perf_counter() - self.origin))
+
+    def to_dict(self):
+        return {
+            "phases": [{"name": name, "start_ms": start * 1000, "end_ms": end * 1000, "thread": thread}
+                       for name, start, end, thread in self.phases],
+            "marks": [{"name": name, "time_ms": t * 1000} for name, t in self.marks]
+        }
+
+    def print_report(self, width=40):
+        """以时间轴的形式输出各阶段（同一时间段内的多个阶段为并行执行）"""
+        if not self.phases and not self.marks:
+            return
+        total = max([end for _, _, end, _ in self.phases] + [t for _, t in self.marks])
+        scale = width / total if total > 0 else 0
+
+        print()
+        print(f"⏱️  启动时间线（从导入模块开始，共 {total * 1000:.0f} ms）：")
+        print(f"  {'阶段':<12}{'开始(ms)':>10}{'结束(ms)':>10}{'耗时(ms)':>10}")
+        for name, start, end, thread in sorted(self.phases, key=lambda phase: phase[1]):
+            begin = int(start * scale)
+            length = max(int(end * scale) - begin, 1)
+            bar = " " * begin + "█" * length + " " * max(width - begin - length, 0)
+            where = "" if thread == "MainThread" else f" （后台线程 {thread}）"
+            print(f"  {name:<12}{start * 1000:>10.0f}{end * 1000:>10.0f}{(end - start) * 1000:>10.0f}  |{bar}|{where}")
+        for name, t in self.marks:
+            print(f"  ▶ {name}: {t * 1000:.0f} ms")
+        print()
+
+
+class BackgroundTask:
+    def __init__(self, func, *args, name=None, timeline=None):
+        """在后台线程中执行 func(*args)；给定 timeline 时把执行时间记录为名为 name 的阶段"""
+        self.func = func
+        self.args = args
+        self.timeline = timeline
+        self.result_value = None
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            self.result_value = self.func(*self.args)
+        except BaseException as e:
+            self.error = e
+        finally:
+            if self.timeline is not None:
+                self.timeline.add(self.thread.name, start, time.perf_counter())
+
+    def result(self):
+        """等待执行完成并返回结果；后台线程中的异常在这里重新抛出"""
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.result_value
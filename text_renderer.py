@@ -0,0 +1,78 @@
+import math
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+"""
+缓存文字掩码的文字渲染器
+用PIL把整个字符串光栅化为灰度alpha掩码（与PIL直接在图像上绘制的排版完全相同，包括字距调整和亚像素位置），
+按字符串缓存；绘制时只在文字所在区域（ROI）用NumPy按PIL相同的公式做alpha混合，
+避免每次绘制都把整帧在 BGR/RGB/PIL/numpy 之间来回转换，输出与PIL路径逐像素一致
+"""
+
+
+class GlyphAtlasRenderer:
+    def __init__(self, font, preload=(), cache_size=1024):
+        """初始化渲染器并预先光栅化 preload 中的字符串（如手势名称）"""
+        self.font = font
+
+        # 行高：所有掩码至少为这个高度，保证基线对齐
+        try:
+            ascent, descent = font.getmetrics()
+            self.line_height = ascent + descent
+        except AttributeError:
+            # 位图默认字体没有 getmetrics，用包围盒估计行高
+            self.line_height = font.getbbox("Ag")[3] + 2
+
+        # 字符串缓存（LRU）：字符串 -> (alpha掩码, 相对绘制位置的水平偏移)
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+
+        for text in preload:
+            self.render(text)
+
+    def _rasterize(self, text):
+        """用PIL光栅化整个字符串，返回 (alpha掩码, 水平偏移)；左侧超出起点的字形（负偏移）也完整保留"""
+        left, _, right, bottom = self.font.getbbox(text)
+        offset = min(int(math.floor(left)), 0)
+        width = max(int(math.ceil(right)) - offset, 1)
+        height = max(self.line_height, int(math.ceil(bottom)))
+        img = Image.new("L", (width, height), 0)
+        ImageDraw.Draw(img).text((-offset, 0), text, font=self.font, fill=255)
+        return np.asarray(img, dtype=np.uint8), offset
+
+    def render(self, text):
+        """返回整个字符串的alpha掩码和水平偏移 (掩码, 偏移)"""
+        item = self.cache.get(text)
+        if item is not None:
+            self.cache.move_to_end(text)
+            return item
+
+        item = self._rasterize(text)
+        # 加入缓存，超出容量时淘汰最久未使用的字符串
+        self.cache[text] = item
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return item
+
+    def draw_text(self, frame, text, position, color=(0, 255, 0)):
+        """在BGR帧的 position（左上角）处绘制文字，color 为BGR颜色"""
+        mask, offset = self.render(text)
+        mask_h, mask_w = mask.shape
+        frame_h, frame_w = frame.shape[:2]
+        x, y = position
+        x += offset
+
+        # 裁剪到帧范围内
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + mask_w, frame_w), min(y + mask_h, frame_h)
+        if x1 <= x0 or y1 <= y0:
+            return frame
+
+        # 只对文字区域做alpha混合，整数运算与PIL的 BLEND/DIV255 宏相同
+        alpha = mask[y0 - y:y1 - y, x0 - x:x1 - x, np.newaxis].astype(np.uint32)
+        roi = frame[y0:y1, x0:x1]
+        tmp = roi * (255 - alpha) + np.array(color, dtype=np.uint32) * alpha + 128
+        roi[...] = (((tmp >> 8) + tmp) >> 8).astype(np.uint8)
+        return frame
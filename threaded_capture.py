@@ -0,0 +1,221 @@
+import copy
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from capture_config import CaptureConfig
+
+"""
+后台线程摄像头采集
+在独立线程中持续读取摄像头帧，只保留最新的几帧（丢弃最旧帧），
+使摄像头I/O与模型推理并行，推理始终使用最新的画面。
+视频文件的解码速度远快于实时，丢帧会使结果无法复现，因此改为不丢帧：缓冲区满时采集线程等待，按顺序读取每一帧
+"""
+
+
+def is_file_source(source, config=None):
+    """视频源是否为本地视频文件（摄像头索引、流地址和 GStreamer 管道之外的字符串）"""
+    if not isinstance(source, str) or "://" in source:
+        return False
+    return config is None or config.backend != "gstreamer"
+
+
+class ThreadedCapture:
+    def __init__(self, source=0, width=640, height=480, buffer_size=2, config=None, lossless=None):
+        """打开视频源并启动后台采集线程，config 为 CaptureConfig（默认按 width/height 自动协商格式）；
+        lossless 为 True 时不丢帧（按顺序读取每一帧），默认只对视频文件启用"""
+        self.source = source
+
+        # 采集后端、像素格式、分辨率和驱动缓冲区必须在采集线程启动前设置
+        self.config = config if config is not None else CaptureConfig(width, height)
+        self.cap = self.config.open(source)
+
+        # 环形缓冲区：元素为 (帧, 采集时间戳, 序号)，满时自动丢弃最旧的帧；
+        # 不丢帧模式下缓冲区满时采集线程等待读取者取走帧
+        self.lossless = is_file_source(source, self.config) if lossless is None else lossless
+        self.buffer_size = buffer_size
+        self.buffer = deque(maxlen=None if self.lossless else buffer_size)
+        self.condition = threading.Condition()
+
+        # 帧序号统计
+        self.seq = 0
+        self.last_read_seq = 0
+        self.dropped_frames = 0
+
+        # 运行中请求切换的分辨率，由采集线程在两次读取之间应用
+        self.requested_resolution = None
+
+        self.running = True
+        self.finished = False
+        self.thread = threading.Thread(target=self._reader, daemon=True)
+        self.thread.start()
+
+    def _reader(self):
+        """采集线程：循环读取帧并写入环形缓冲区"""
+        while self.running:
+            if self.requested_resolution is not None:
+                self._apply_resolution()
+            ret, frame = self.cap.read()
+            timestamp = time.time()
+            if not ret:
+                break
+
+            with self.condition:
+                if self.lossless:
+                    self.condition.wait_for(lambda: len(self.buffer) < self.buffer_size or not self.running)
+                    if not self.running:
+                        break
+                self.seq += 1
+                self.buffer.append((frame, timestamp, self.seq))
+                self.condition.notify_all()
+
+        # 视频源结束或读取失败，唤醒等待中的读取者
+        with self.condition:
+            self.finished = True
+            self.condition.notify_all()
+
+    def set_resolution(self, width, height):
+        """请求切换摄像头分辨率（在采集线程中应用）；视频文件、流地址和 GStreamer 管道不支持，返回 False"""
+        if not isinstance(self.source, int) or self.config.backend == "gstreamer":
+            return False
+        with self.condition:
+            self.requested_resolution = (width, height)
+        return True
+
+    def _apply_resolution(self):
+        """（采集线程）按请求的分辨率重新协商摄像头格式"""
+        with self.condition:
+            width, height = self.requested_resolution
+            self.requested_resolution = None
+        # 多个视频源可能共用同一个配置对象，修改前先复制
+        self.config = copy.copy(self.config)
+        self.config.width, self.config.height = width, height
+        self.config.configure_camera(self.cap)
+        self.config.log_delivered(self.cap, self.source)
+
+    def _has_new_frame(self):
+        if self.lossless:
+            return bool(self.buffer)
+        return bool(self.buffer) and self.buffer[-1][2] > self.last_read_seq
+
+    def wait(self, timeout=None):
+        """等待新帧到达（不取出），有新帧时返回 True"""
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: self._has_new_frame() or self.finished or not self.running,
+                timeout
+            ) and self._has_new_frame()
+
+    def read_latest(self, timeout=5.0):
+        """获取最新的一帧（不丢帧模式下为下一帧），返回 (帧, 采集时间戳, 序号)；没有新帧时返回 None"""
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self._has_new_frame() or self.finished or not self.running,
+                timeout
+            )
+            if not self._has_new_frame():
+                return None
+
+            if self.lossless:
+                frame, timestamp, seq = self.buffer.popleft()
+                self.last_read_seq = seq
+                # 唤醒等待缓冲区空位的采集线程
+                self.condition.notify_all()
+                return frame, timestamp, seq
+
+            frame, timestamp, seq = self.buffer[-1]
+            # 统计两次读取之间被跳过的帧
+            if self.last_read_seq > 0:
+                self.dropped_frames += seq - self.last_read_seq - 1
+            self.last_read_seq = seq
+            return frame, timestamp, seq
+
+    def read(self):
+        """与 cv2.VideoCapture.read 兼容的接口，返回 (ret, frame)"""
+        item = self.read_latest()
+        if item is None:
+            return False, None
+        return True, item[0]
+
+    def isOpened(self):
+        # 不丢帧模式下视频读完后，缓冲区中剩余的帧仍可读取
+        return self.cap.isOpened() and (not self.finished or (self.lossless and bool(self.buffer)))
+
+    def get(self, prop_id):
+        return self.cap.get(prop_id)
+
+    def release(self):
+        """停止采集线程并释放摄像头"""
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        if self.thread.is_alive():
+            self.thread.join(timeout=1.0)
+        self.cap.release()
+
+
+class FixtureCapture:
+    """用预先录制的帧代替摄像头，接口与 ThreadedCapture 相同，
+    可作为 source 传给各识别器，在没有摄像头的环境中测试和评测"""
+
+    def __init__(self, frames, repeat=1):
+        """frames 为BGR帧列表，repeat 为循环播放的次数"""
+        self.frames = list(frames)
+        self.total = len(self.frames) * repeat
+
+        # 与 ThreadedCapture 相同的统计字段
+        self.seq = 0
+        self.last_read_seq = 0
+        self.dropped_frames = 0
+        self.finished = self.total == 0
+
+    def wait(self, timeout=None):
+        """预先录制的帧总是立即可用"""
+        return not self.finished
+
+    def read_latest(self, timeout=5.0):
+        """按顺序返回下一帧 (帧, 时间戳, 序号)，播放结束后返回 None"""
+        if self.finished:
+            return None
+        frame = self.frames[self.seq % len(self.frames)]
+        self.seq += 1
+        self.last_read_seq = self.seq
+        if self.seq >= self.total:
+            self.finished = True
+        return frame, time.time(), self.seq
+
+    def read(self):
+        item = self.read_latest()
+        if item is None:
+            return False, None
+        return True, item[0]
+
+    def isOpened(self):
+        return not self.finished
+
+    def get(self, prop_id):
+        if not self.frames:
+            return 0
+        h, w = self.frames[0].shape[:2]
+        if prop_id == cv2.CAP_PROP_FRAME_WIDTH:
+            return w
+        if prop_id == cv2.CAP_PROP_FRAME_HEIGHT:
+            return h
+        if prop_id == cv2.CAP_PROP_FRAME_COUNT:
+            return self.total
+        return 0
+
+    def release(self):
+        self.finished = True
+
+
+def open_capture(source, width=640, height=480, config=None):
+    """打开视频源：None 表示不打开，已有采集对象（如 FixtureCapture）直接使用，
+    其余（摄像头索引、视频文件、流地址、GStreamer 管道）按 config 创建 ThreadedCapture"""
+    if source is None:
+        return None
+    if hasattr(source, "read_latest"):
+        return source
+    return ThreadedCapture(source, width=width, height=height, config=config)
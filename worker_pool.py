@@ -0,0 +1,203 @@
+import multiprocessing as mp
+import os
+import queue
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+"""
+多进程推理池
+启动 N 个工作进程，每个进程各自加载一个识别器，绕开 GIL，前后处理与推理都能用满多个核心。
+帧像素放在共享内存的环形槽位中（父进程写入一次，工作进程直接按槽位映射为数组读取，不经过 pickle），
+进程之间只传递 (序号, 槽位, 形状) 这样的小索引，结果按提交顺序返回。
+每个工作进程内的计算线程数默认限制为 1，N 个进程不会各自用满所有核心而互相争抢
+"""
+
+# 等待结果时检查工作进程是否存活的间隔（秒）
+POLL_INTERVAL = 0.5
+
+
+def limit_threads(threads):
+    """限制本进程内 OpenMP/MKL、OpenCV 的计算线程数（在导入 torch 之前调用，torch 导入后再设置一次）"""
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[name] = str(threads)
+    import cv2
+    cv2.setNumThreads(threads)
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+
+
+def worker_main(recognizer_name, model_path, tasks, results, threads=1):
+    """工作进程：加载识别器，循环处理任务队列中的槽位，直到收到 None；threads 为 None 时不限制线程数"""
+    if threads:
+        limit_threads(threads)
+    # 在子进程中导入，避免父进程加载模型
+    from batch_process import create_recognizer
+
+    try:
+        recognizer = create_recognizer(recognizer_name, model_path)
+    except Exception as e:
+        results.put((None, None, None, f"识别器加载失败: {e}"))
+        return
+    if threads:
+        # 识别器可能刚导入 torch
+        limit_threads(threads)
+
+    # 已映射的共享内存（父进程扩容时会换成新的共享内存）
+    shm = None
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            seq, shm_name, slot, slot_bytes, shape = task
+            if shm is None or shm.name != shm_name:
+                if shm is not None:
+                    shm.close()
+                shm = shared_memory.SharedMemory(name=shm_name)
+            frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=slot * slot_bytes)
+            try:
+                results.put((seq, slot, recognizer.process_frame(frame), None))
+            except Exception as e:
+                results.put((seq, slot, None, str(e)))
+            finally:
+                # 释放对共享内存的引用，否则无法 close
+                del frame
+    finally:
+        if shm is not None:
+            shm.close()
+
+
+class WorkerPool:
+    def __init__(self, recognizer_name="yolo", model_path=None, workers=None, slots_per_worker=4,
+                 threads_per_worker=1):
+        """workers 为工作进程数（默认CPU核心数），每个进程最多同时占用 slots_per_worker 个共享内存槽位；
+        threads_per_worker 为每个进程的计算线程数（None 表示不限制，各进程默认都会使用所有核心）"""
+        self.recognizer_name = recognizer_name
+        self.workers = workers or mp.cpu_count()
+        self.num_slots = self.workers * slots_per_worker
+
+        # 使用 spawn 启动，避免 fork 复制父进程中的线程和模型状态
+        context = mp.get_context("spawn")
+        self.tasks = context.Queue()
+        self.results = context.Queue()
+        self.processes = [context.Process(target=worker_main, daemon=True,
+                                          args=(recognizer_name, model_path, self.tasks, self.results,
+                                                threads_per_worker))
+                          for _ in range(self.workers)]
+        for process in self.processes:
+            process.start()
+
+        # 共享内存在收到第一帧时按帧大小创建
+        self.shm = None
+        self.slot_bytes = 0
+        self.free_slots = []
+
+        # 已提交但结果尚未返回的任务数，以及按序号暂存的乱序结果
+        self.in_flight = 0
+        self.next_seq = 0
+        self.next_result = 0
+        self.pending = {}
+
+    def ensure_capacity(self, nbytes):
+        """槽位放不下当前帧时（首帧或分辨率变大），等待所有任务完成后重新分配共享内存"""
+        if nbytes <= self.slot_bytes:
+            return
+        while self.in_flight:
+            self.collect()
+        self.release_memory()
+        self.slot_bytes = nbytes
+        self.shm = shared_memory.SharedMemory(create=True, size=nbytes * self.num_slots)
+        self.free_slots = list(range(self.num_slots))
+
+    def submit(self, frame):
+        """把帧写入一个空闲槽位并提交给工作进程，返回任务序号；没有空闲槽位时先等待结果"""
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        self.ensure_capacity(frame.nbytes)
+        while not self.free_slots:
+            self.collect()
+
+        slot = self.free_slots.pop()
+        view = np.ndarray(frame.shape, dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+        view[...] = frame
+        del view
+
+        seq = self.next_seq
+        self.next_seq += 1
+        self.in_flight += 1
+        self.tasks.put((seq, self.shm.name, slot, self.slot_bytes, frame.shape))
+        return seq
+
+    def collect(self, timeout=None):
+        """取回一个结果并释放其槽位；等待期间有工作进程异常退出（如内存不足被杀死）时抛出 RuntimeError"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = POLL_INTERVAL if deadline is None else min(POLL_INTERVAL, max(deadline - time.monotonic(), 0))
+            try:
+                seq, slot, detections, error = self.results.get(timeout=wait)
+                break
+            except queue.Empty:
+                self.check_workers()
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise RuntimeError("工作进程长时间没有返回结果")
+        if seq is None:
+            raise RuntimeError(error)
+        if error:
+            raise RuntimeError(f"第 {seq} 帧处理失败: {error}")
+        self.in_flight -= 1
+        self.free_slots.append(slot)
+        self.pending[seq] = detections
+
+    def check_workers(self):
+        """工作进程意外退出时，它正在处理的帧不会再返回结果，抛出 RuntimeError 而不是一直等待"""
+        dead = [process for process in self.processes if not process.is_alive()]
+        if dead:
+            codes = ", ".join(str(process.exitcode) for process in dead)
+            raise RuntimeError(f"{len(dead)} 个工作进程意外退出（退出码 {codes}），"
+                               f"{self.in_flight} 帧未返回结果")
+
+    def ready_results(self):
+        """按提交顺序取出已经返回的结果"""
+        while self.next_result in self.pending:
+            yield self.pending.pop(self.next_result)
+            self.next_result += 1
+
+    def imap(self, frames):
+        """流式处理帧序列，按输入顺序生成每帧的检测结果（所有工作进程保持忙碌）"""
+        for frame in frames:
+            self.submit(frame)
+            yield from self.ready_results()
+        while self.next_result < self.next_seq:
+            self.collect()
+            yield from self.ready_results()
+
+    def process_frames(self, frames):
+        """与识别器的 process_frames 接口相同：一组帧（如多个视频源的当前帧）并行处理，返回结果列表"""
+        return list(self.imap(frames))
+
+    def process_frame(self, frame):
+        return self.process_frames([frame])[0]
+
+    def release_memory(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def close(self):
+        """通知工作进程退出，释放共享内存"""
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.release_memory()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,7 +1,12 @@
+import argparse
 import cv2
 import numpy as np
 from ultralytics import YOLO
 import time
+from threaded_capture import open_capture
+from capture_config import CaptureConfig, add_capture_arguments
+from gesture_state import GestureStateMachine, print_gesture_event
+from metrics import FrameMetrics, add_metrics_arguments, print_summary, start_exporters
 
 # 手势类别映射
 gesture_classes = {
@@ -16,28 +21,25 @@ gesture_classes = {
 }
 
 class YOLOHandGestureRecognizer:
-    def __init__(self, model_path='yolov8n.pt'):
-        """初始化基于YOLOv8的手势识别器"""
+    def __init__(self, model_path='yolov8n.pt', source=0, target_fps=None, capture_config=None,
+                 stable_frames=5, stable_interval=2):
+        """初始化基于YOLOv8的手势识别器
+        
+        实时识别时同一手势连续 stable_frames 帧后确认，之后每 stable_interval 帧才运行一次检测
+        """
         # 加载YOLOv8模型
         self.model = YOLO(model_path)
         print(f"✅ 已加载YOLOv8模型: {model_path}")
         
-        # 打开摄像头
-        self.cap = cv2.VideoCapture(0)
-        if not self.cap.isOpened():
-            raise Exception("无法打开摄像头")
-        
-        # 设置摄像头分辨率
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+        # 打开摄像头（后台线程采集，只保留最新帧），source 为 None 时不打开摄像头，也可以传入 FixtureCapture 等采集对象
+        self.cap = open_capture(source, width=640, height=480, config=capture_config)
         
-        # 用于计算帧率
-        self.prev_time = 0
+        # 各阶段延迟指标和平滑帧率（target_fps 为告警用的目标帧率）
+        self.metrics = FrameMetrics(target_fps=target_fps)
         self.fps = 0
         
-        # 用于存储之前的手势
-        self.prev_gesture = None
-        self.gesture_count = 0
+        # 手势状态机：去抖（prev_gesture / gesture_count），手势稳定时降低检测频率
+        self.gesture_state = GestureStateMachine(stable_frames, stable_interval)
         
         print("✅ 基于YOLOv8的手势识别系统已初始化")
     
@@ -49,6 +51,31 @@ class YOLOHandGestureRecognizer:
         results = self.model(frame, conf=0.5, verbose=False)
         return results
     
+    def parse_results(self, results):
+        """将检测结果转换为字典列表，每个字典包含类别、名称、置信度和边界框"""
+        detections = []
+        for result in results:
+            boxes = result.boxes
+            for box in boxes:
+                cls = int(box.cls[0])
+                x1, y1, x2, y2 = map(int, box.xyxy[0])
+                detections.append({
+                    "class_id": cls,
+                    "gesture": gesture_classes.get(cls, f"类别 {cls}"),
+                    "confidence": float(box.conf[0]),
+                    "bbox": [x1, y1, x2, y2]
+                })
+        return detections
+    
+    def process_frames(self, frames):
+        """无界面批量处理：一次批量推理，返回每帧的检测结果列表"""
+        batch_results = self.detect_gestures(frames)
+        return [self.parse_results([result]) for result in batch_results]
+    
+    def process_frame(self, frame):
+        """无界面处理单帧，返回检测结果列表"""
+        return self.process_frames([frame])[0]
+    
     def draw_results(self, frame, results):
         """在帧上绘制检测结果"""
         # 解析检测结果
@@ -102,34 +129,47 @@ class YOLOHandGestureRecognizer:
         try:
             while True:
                 # 读取帧
-                ret, frame = self.cap.read()
+                with self.metrics.time("capture"):
+                    ret, frame = self.cap.read()
+                    if ret:
+                        # 镜像翻转帧（使显示更自然）
+                        frame = cv2.flip(frame, 1)
                 if not ret:
                     print("无法读取摄像头帧")
                     break
                 
-                # 镜像翻转帧（使显示更自然）
-                frame = cv2.flip(frame, 1)
-                
-                # 检测手势
-                results = self.detect_gestures(frame)
-                
-                # 计算帧率
-                current_time = time.time()
-                self.fps = 1 / (current_time - self.prev_time) if (current_time - self.prev_time) > 0 else 0
-                self.prev_time = current_time
+                # 手势稳定且画面没有变化时跳过检测，沿用上一次的结果
+                if self.gesture_state.should_run(frame):
+                    # 检测手势
+                    with self.metrics.time("inference"):
+                        results = self.detect_gestures(frame)
+                    
+                    # 以置信度最高的检测结果更新手势状态，输出去抖后的手势事件
+                    with self.metrics.time("postprocess"):
+                        detections = self.parse_results(results)
+                        top = max(detections, key=lambda d: d["confidence"]) if detections else None
+                        event = self.gesture_state.update(frame, top["gesture"] if top else None)
+                    if event is not None:
+                        print_gesture_event(event)
                 
-                # 绘制检测结果
-                frame = self.draw_results(frame, results)
-                
-                # 绘制帧率
-                cv2.putText(frame, f"FPS: {self.fps:.1f}", (10, 30), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+                with self.metrics.time("render"):
+                    # 绘制检测结果
+                    frame = self.draw_results(frame, results)
+                    
+                    # 绘制帧率
+                    cv2.putText(frame, f"FPS: {self.fps:.1f}", (10, 30), 
+                               cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
                 
                 # 显示帧
-                cv2.imshow("基于YOLOv8的实时手势识别", frame)
+                with self.metrics.time("display"):
+                    cv2.imshow("基于YOLOv8的实时手势识别", frame)
+                    key = cv2.waitKey(1) & 0xFF
+                
+                # 平滑帧率
+                self.metrics.set_dropped_frames(self.cap.dropped_frames)
+                self.fps = self.metrics.frame_done()
                 
                 # 处理按键
-                key = cv2.waitKey(1) & 0xFF
                 if key == ord('q'):
                     # 按 'q' 键退出
                     break
@@ -147,15 +187,35 @@ class YOLOHandGestureRecognizer:
         # 释放资源
         self.cap.release()
         cv2.destroyAllWindows()
+        self.gesture_state.print_stats()
+        print_summary(self.metrics)
         print("✅ 基于YOLOv8的手势识别系统已关闭")
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="基于YOLOv8的实时手势识别系统")
+    parser.add_argument("--stable-frames", type=int, default=5, help="连续多少帧相同才确认手势")
+    parser.add_argument("--stable-interval", type=int, default=2,
+                        help="手势稳定后每 N 帧运行一次检测（1 表示每帧检测）")
+    add_capture_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    
     try:
         # 创建手势识别器实例
-        recognizer = YOLOHandGestureRecognizer()
+        recognizer = YOLOHandGestureRecognizer(target_fps=args.target_fps,
+                                               capture_config=CaptureConfig.from_args(args),
+                                               stable_frames=args.stable_frames,
+                                               stable_interval=args.stable_interval)
+        # 启动指标导出（Prometheus 接口 / JSON 文件）
+        exporters = start_exporters(recognizer.metrics, args.metrics_port, args.metrics_json,
+                                    args.metrics_interval)
         # 运行实时识别
-        recognizer.run()
+        try:
+            recognizer.run()
+        finally:
+            for exporter in exporters:
+                exporter.stop()
     except Exception as e:
         print(f"❌ 发生错误: {e}")
         print()